@@ -0,0 +1,77 @@
+"""
+Microbenchmark of `CardMLMCollator` against `transformers.DataCollatorForLanguageModeling` on serialized
+cards, e.g.
+
+    python benchmarks/collator.py --tokenizer bert-base-uncased --batch-size 64
+"""
+
+import argparse
+import time
+
+from transformers import AutoTokenizer, DataCollatorForLanguageModeling
+
+from mtglearn.card import Card
+from mtglearn.datasets import load_cards
+from mtglearn.mlm.collator import CardMLMCollator
+
+
+def throughput(collator, batches, repeat: int) -> float:
+    """Collated sequences per second, best of `repeat` passes over `batches`."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for batch in batches:
+            collator(batch)
+        best = min(best, time.perf_counter() - start)
+    return sum(map(len, batches)) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokenizer", default="bert-base-uncased")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--n-cards", type=int, default=10_000)
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+    cards = load_cards(as_dataset=True)[: args.n_cards]
+    encodings = tokenizer(
+        Card.serialize_batch(cards),
+        truncation=True,
+        max_length=args.max_length,
+        return_special_tokens_mask=True,
+    )
+    features = [
+        {"input_ids": ids, "special_tokens_mask": mask}
+        for ids, mask in zip(encodings["input_ids"], encodings["special_tokens_mask"])
+    ]
+    batches = [
+        features[i : i + args.batch_size]
+        for i in range(0, len(features), args.batch_size)
+    ]
+
+    collators = {
+        "DataCollatorForLanguageModeling": DataCollatorForLanguageModeling(
+            tokenizer, mlm_probability=0.15
+        ),
+        "CardMLMCollator": CardMLMCollator(
+            tokenizer, mlm_probability=0.15, max_length=args.max_length
+        ),
+        "CardMLMCollator (whole fields)": CardMLMCollator(
+            tokenizer,
+            mlm_probability=0.15,
+            whole_field_probability=0.1,
+            max_length=args.max_length,
+        ),
+    }
+    baseline = None
+    for name, collator in collators.items():
+        rate = throughput(collator, batches, args.repeat)
+        baseline = baseline or rate
+        print(f"{name:>32}: {rate:10.0f} sequences/s ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
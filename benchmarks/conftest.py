@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+import json
+import os
+import tracemalloc
+
+import pyarrow as pa
+import pytest
+
+from mtglearn.datasets import cards, seventeenlands
+from mtglearn.datasets.report import peak_rss
+
+# benchmarks/ is on the path, as the rootdir of this conftest
+from synthetic import generate_all_stats, write_all_printings
+
+# corpus sizes (in cards) to benchmark, e.g. MTGLEARN_BENCH_SIZES=1000,10000,100000
+SIZES = [
+    int(size) for size in os.getenv("MTGLEARN_BENCH_SIZES", "1000,10000").split(",")
+]
+
+
+def pytest_generate_tests(metafunc):
+    if "n_cards" in metafunc.fixturenames:
+        metafunc.parametrize("n_cards", SIZES)
+
+
+@pytest.fixture(scope="session")
+def corpora(tmp_path_factory):
+    """Synthetic AllPrintings files by size, generated once per session."""
+    paths = {}
+
+    def corpus(n_cards):
+        if n_cards not in paths:
+            path = tmp_path_factory.mktemp("corpora") / f"AllPrintings-{n_cards}.json"
+            paths[n_cards] = write_all_printings(str(path), n_cards)
+        return paths[n_cards]
+
+    return corpus
+
+
+@pytest.fixture
+def all_printings_path(corpora, n_cards):
+    return corpora(n_cards)
+
+
+@pytest.fixture
+def cache_home(tmp_path, monkeypatch):
+    cache_home = str(tmp_path / "mtglearn")
+    monkeypatch.setattr(cards, "MTGLEARN_CACHE_HOME", cache_home)
+    monkeypatch.setattr(cards, "CARDS_DATASET_CACHE", os.path.join(cache_home, "cards"))
+    monkeypatch.setattr(
+        cards, "CARD_STATS_DATASET_CACHE", os.path.join(cache_home, "card_stats")
+    )
+    monkeypatch.setattr(
+        cards, "SEVENTEENLANDS_CACHE", os.path.join(cache_home, "seventeenlands")
+    )
+    return cache_home
+
+
+@pytest.fixture
+def cached_cards(all_printings_path, cache_home):
+    cards._process_raw_cards(all_printings_path)
+    return all_printings_path
+
+
+@pytest.fixture
+def stub_seventeenlands(all_printings_path, monkeypatch):
+    """Serve synthetic 17lands payloads for every printing of the corpus, without any network."""
+    with open(all_printings_path) as f:
+        payloads = generate_all_stats(json.load(f))
+
+    def get_raw_stats(session, printing, stats_format, *args):
+        return payloads[printing]
+
+    monkeypatch.setattr(seventeenlands, "_get_raw_stats", get_raw_stats)
+    monkeypatch.setattr(cards, "PRINTINGS_WITH_STATS", set(payloads))
+    return payloads
+
+
+@contextmanager
+def memory_high_water():
+    """
+    Measure the peak python heap (tracemalloc) and arrow memory pool allocations of the code in the block,
+    yielding a dict that is filled in when it exits. Memory-mapped data isn't counted, as it isn't allocated.
+    """
+    memory = {}
+    pool = pa.proxy_memory_pool(pa.default_memory_pool())
+    default_pool = pa.default_memory_pool()
+    pa.set_memory_pool(pool)
+    tracemalloc.start()
+    try:
+        yield memory
+    finally:
+        _, memory["python_peak_bytes"] = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        pa.set_memory_pool(default_pool)
+        memory["arrow_peak_bytes"] = pool.max_memory()
+        # the process-wide high-water mark, which only says something about the largest benchmark
+        memory["peak_rss_bytes"] = peak_rss()
+
+
+@pytest.fixture
+def measure(benchmark):
+    """
+    Benchmark `fn(*args)`, and record its memory high-water marks (from one more, separate, call, since
+    tracing memory slows it down) in the benchmark's `extra_info`, which is saved with the results.
+
+    `setup` is called before every call (untimed), for benchmarks that need a fresh state.
+    """
+
+    def measure(fn, *args, setup=None, rounds=None):
+        if setup is None and rounds is None:
+            result = benchmark(fn, *args)
+        else:
+
+            def setup_args():
+                if setup is not None:
+                    setup()
+                return args, {}
+
+            result = benchmark.pedantic(fn, setup=setup_args, rounds=rounds or 5)
+        if setup is not None:
+            setup()
+        with memory_high_water() as memory:
+            fn(*args)
+        benchmark.extra_info.update(memory)
+        return result
+
+    return measure
@@ -0,0 +1,126 @@
+"""
+A deterministic synthetic MTGJSON AllPrintings file and 17lands payloads, shaped like the real ones, so the
+pipeline can be benchmarked offline at any size.
+"""
+
+from typing import Dict, List
+import json
+import random
+
+CARDS_PER_PRINTING = 250
+
+TYPES = ["Creature", "Instant", "Sorcery", "Enchantment", "Artifact", "Land"]
+TYPE_WEIGHTS = [45, 15, 12, 12, 8, 8]
+RARITIES = ["common", "uncommon", "rare", "mythic"]
+RARITY_WEIGHTS = [50, 30, 15, 5]
+COLORS = "WUBRG"
+WORDS = (
+    "target creature player opponent card graveyard library hand battlefield token counter "
+    "damage life spell ability turn upkeep combat attack block flying trample haste vigilance "
+    "deathtouch lifelink reach flash draw discard sacrifice exile return destroy create each "
+    "you your its gets until end of this that another whenever when may control"
+).split()
+SYLLABLES = "ka ri to mel vor an the drak sil wyn gor el ith bra mon zu lo ven".split()
+
+
+def _name(rng: random.Random) -> str:
+    words = rng.randint(1, 3)
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+        for _ in range(words)
+    )
+
+
+def _mana_cost(rng: random.Random):
+    n_colored = rng.choices([0, 1, 2, 3], [10, 50, 30, 10])[0]
+    generic = rng.choices(range(7), [20, 25, 20, 15, 10, 5, 5])[0]
+    symbols = ([f"{{{generic}}}"] if generic else []) + [
+        f"{{{rng.choice(COLORS)}}}" for _ in range(n_colored)
+    ]
+    return "".join(symbols), generic + n_colored
+
+
+def _text(rng: random.Random) -> str:
+    sentences = []
+    # most cards have a line or two of rules text, a few have a lot
+    for _ in range(rng.choices([0, 1, 2, 3, 5], [10, 40, 30, 15, 5])[0]):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 18)))
+        sentences.append(sentence.capitalize() + ".")
+    return "\n".join(sentences)
+
+
+def generate_card(rng: random.Random) -> dict:
+    card_type = rng.choices(TYPES, TYPE_WEIGHTS)[0]
+    name = _name(rng)
+    if rng.random() < 0.03:
+        name = f"{name} // {_name(rng)}"
+    card = {
+        "name": name,
+        "types": [card_type],
+        "rarity": rng.choices(RARITIES, RARITY_WEIGHTS)[0],
+        "artist": _name(rng),
+        "identifiers": {"scryfallId": f"{rng.getrandbits(128):032x}"},
+        "foreignData": [
+            {"language": language, "name": _name(rng)}
+            for language in rng.sample(["German", "French", "Japanese"], 2)
+        ],
+    }
+    if card_type != "Land":
+        card["manaCost"], card["manaValue"] = _mana_cost(rng)
+        card["text"] = _text(rng)
+    if card_type == "Creature":
+        card["power"] = str(rng.randint(0, 6))
+        card["toughness"] = str(rng.randint(1, 6))
+    return card
+
+
+def generate_all_printings(
+    n_cards: int, seed: int = 0, cards_per_printing: int = CARDS_PER_PRINTING
+) -> dict:
+    """A synthetic AllPrintings.json payload with `n_cards` cards in printings of `cards_per_printing`."""
+    rng = random.Random(seed)
+    data = {}
+    for i, start in enumerate(range(0, n_cards, cards_per_printing)):
+        code = f"S{i:03d}"
+        n = min(cards_per_printing, n_cards - start)
+        data[code] = {
+            "name": f"Synthetic {i}",
+            "code": code,
+            "cards": [generate_card(rng) for _ in range(n)],
+        }
+    return {"meta": {"version": "synthetic", "date": "1993-08-05"}, "data": data}
+
+
+def write_all_printings(path: str, n_cards: int, seed: int = 0) -> str:
+    with open(path, "w") as f:
+        json.dump(generate_all_printings(n_cards, seed), f)
+    return path
+
+
+def generate_stats(cards: List[dict], seed: int = 0) -> List[dict]:
+    """A 17lands card_ratings payload for the given raw cards (keyed by front face name, like 17lands)."""
+    rng = random.Random(seed)
+    stats = []
+    for card in cards:
+        seen = rng.randint(100, 100_000)
+        stats.append(
+            {
+                "name": card["name"].split(" // ")[0],
+                "rarity": card["rarity"],
+                "seen_count": seen,
+                "avg_seen": round(rng.uniform(1, 14), 2),
+                "pick_count": rng.randint(0, seen),
+                "avg_pick": round(rng.uniform(1, 14), 2),
+                "game_count": rng.randint(0, seen * 3),
+                "win_rate": round(rng.uniform(0.4, 0.65), 4),
+            }
+        )
+    return stats
+
+
+def generate_all_stats(all_printings: dict, seed: int = 0) -> Dict[str, List[dict]]:
+    """17lands payloads for every printing of a synthetic AllPrintings payload."""
+    return {
+        code: generate_stats(printing["cards"], seed)
+        for code, printing in all_printings["data"].items()
+    }
@@ -0,0 +1,109 @@
+import os
+import random
+import shutil
+
+import pytest
+
+from mtglearn.augmentation import augment_batch
+from mtglearn.card import Card
+from mtglearn.datasets import CardFile, CardNameIndex, cards, load_cards
+from mtglearn.datasets.cardfile import CARD_FILE_NAME
+from mtglearn.datasets.names import NAME_INDEX_FILE_NAME
+from mtglearn.datasets.cards import _join_cards_with_stats, _process_raw_cards
+from mtglearn.datasets.seventeenlands import fetch_all_stats
+
+LOAD_MODES = {
+    "dataframe": {},
+    "dataframe_zero_copy": {"zero_copy": True},
+    "dataset": {"as_dataset": True},
+    "attrs": {"as_attrs": True},
+    "attrs_compact": {"as_attrs": True, "compact": True},
+    "attrs_lazy": {"as_attrs": True, "lazy": True},
+}
+
+
+def test_process_raw_cards_cold(measure, all_printings_path, cache_home):
+    def clear_cache():
+        shutil.rmtree(cards.CARDS_DATASET_CACHE, ignore_errors=True)
+
+    measure(_process_raw_cards, all_printings_path, setup=clear_cache, rounds=3)
+
+
+def test_process_raw_cards_warm(measure, cached_cards):
+    # every printing is hashed, but none has changed
+    measure(_process_raw_cards, cached_cards)
+
+
+@pytest.mark.parametrize("mode", LOAD_MODES)
+def test_load_cards(measure, cached_cards, mode):
+    measure(lambda: load_cards(**LOAD_MODES[mode]))
+
+
+def test_load_cards_with_stats_cached(measure, cached_cards, stub_seventeenlands):
+    load_cards(as_dataset=True, with_stats=True)
+    measure(lambda: load_cards(as_dataset=True, with_stats=True))
+
+
+def test_join_cards_with_stats(measure, cached_cards, stub_seventeenlands):
+    dataset = load_cards(as_dataset=True)
+    stats = fetch_all_stats(stub_seventeenlands)
+    measure(_join_cards_with_stats, dataset, stats)
+
+
+def test_card_file_lookup(measure, cached_cards):
+    card_file = CardFile(os.path.join(cards.CARDS_DATASET_CACHE, CARD_FILE_NAME))
+    names = random.Random(0).sample(list(card_file), 100)
+    measure(lambda: [card_file.get_card(name) for name in names])
+
+
+def test_name_index_build(measure, cached_cards):
+    card_file = CardFile(os.path.join(cards.CARDS_DATASET_CACHE, CARD_FILE_NAME))
+    measure(CardNameIndex.build, card_file)
+
+
+def test_name_index_load(measure, cached_cards):
+    # built (and saved) on first use
+    CardFile(os.path.join(cards.CARDS_DATASET_CACHE, CARD_FILE_NAME)).name_index
+    measure(
+        CardNameIndex.load,
+        os.path.join(cards.CARDS_DATASET_CACHE, NAME_INDEX_FILE_NAME),
+    )
+
+
+def test_name_index_resolve(measure, cached_cards):
+    index = CardFile(os.path.join(cards.CARDS_DATASET_CACHE, CARD_FILE_NAME)).name_index
+    rng = random.Random(0)
+    # exact, case-folded, prefix and misspelled names
+    queries = [
+        query
+        for name in rng.sample(index.names, 25)
+        for query in (name, name.upper(), name[:4], name[:-2] + "xx")
+    ]
+    measure(lambda: [index.resolve(query) for query in queries])
+
+
+def test_card_str(measure, cached_cards):
+    card_objects = load_cards(as_attrs=True)
+    measure(lambda: [str(card) for card in card_objects])
+
+
+def test_card_serialize_batch(measure, cached_cards):
+    columns = load_cards(as_dataset=True)[:]
+    measure(Card.serialize_batch, columns)
+
+
+def test_augmentation(measure, cached_cards):
+    # the map of `preprocess_dataset` (ops/components/prepare_data.py), without the kubeflow component
+    dataset = load_cards(as_dataset=True)
+
+    def preprocess():
+        return dataset.map(
+            lambda batch, indices: {"card": augment_batch(batch, 2, 0, indices)},
+            batched=True,
+            with_indices=True,
+            remove_columns=dataset.column_names,
+            load_from_cache_file=False,
+            keep_in_memory=True,
+        )
+
+    measure(preprocess)
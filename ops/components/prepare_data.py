@@ -1,46 +1,31 @@
 from kfp.v2.dsl import Output, Dataset
 
 
-def preprocess_dataset(seed: int, n_duplicates: int, dataset: Output[Dataset]):
+def preprocess_dataset(
+    seed: int,
+    n_duplicates: int,
+    dataset: Output[Dataset],
+    num_proc: int = None,
+    batch_size: int = 1000,
+):
     from mtglearn.datasets import load_cards
-    from mtglearn.datasets.cards import Card
-    import attrs
-    import cattrs
-    import random
+    from mtglearn.augmentation import augment_batch
 
-    cards = load_cards(as_dataset=True, shuffle=True, seed=seed)
+    cards = load_cards(as_dataset=True)
 
-    rng = random.Random(seed)
-
-    def preprocess_card(batch):
-
-        preprocessed_batch = {"card": []}
-
-        # convert from dict of lists to list of dicts
-        batch = [dict(zip(batch, _)) for _ in zip(*batch.values())]
-
-        for card in batch:
-
-            # count the number of non-empty fields
-            fields = [k for k, v in card.items() if v]
-            n_fields = len(fields)
-            preprocessed_batch["card"].append(str(cattrs.structure(card, Card)))
-            for _ in range(n_duplicates - 1):
-                # n_fields - 1 because we always want to keep `name`
-                n_fields_to_drop = rng.randint(0, n_fields - 1)
-                candidate_fields = list(set(card.keys()).difference({"name"}))
-                fields_to_keep = ["name"] + rng.sample(
-                    candidate_fields, n_fields_to_drop
-                )
-                # modified card, with missing values
-                mcard = cattrs.structure({k: card[k] for k in fields_to_keep}, Card)
-                preprocessed_batch["card"].append(str(mcard))
-
-        return preprocessed_batch
+    def preprocess_cards(batch, indices):
+        # each card's random stream is derived from (seed, index), so the output is identical
+        # whatever num_proc and batch_size are
+        return {"card": augment_batch(batch, n_duplicates, seed, indices)}
 
     cards = cards.map(
-        preprocess_card, batched=True, batch_size=1, remove_columns=cards.column_names
-    ).shuffle()
+        preprocess_cards,
+        batched=True,
+        batch_size=batch_size,
+        with_indices=True,
+        num_proc=num_proc,
+        remove_columns=cards.column_names,
+    ).shuffle(seed=seed)
 
     for card in cards[:100]["card"]:
         print(card)
@@ -49,5 +34,40 @@ def preprocess_dataset(seed: int, n_duplicates: int, dataset: Output[Dataset]):
         cards.save_to_disk(dataset.path)
 
 
+def prepare_tokenized_shards(
+    seed: int,
+    n_duplicates: int,
+    tokenizer_name: str,
+    max_seq_length: int,
+    shards: Output[Dataset],
+    batch_size: int = 1000,
+):
+    """
+    load_cards -> augmentation -> tokenizer in a single streaming pass, writing length-bucketed shards
+    that `train_mlm` uses directly (pass them as its `train_file`).
+    """
+    from transformers import AutoTokenizer
+    from mtglearn.datasets import load_cards
+    from mtglearn.augmentation import iter_augmented
+    from mtglearn.mlm.shards import write_tokenized_shards
+
+    cards = load_cards(as_dataset=True)
+    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+
+    manifest = write_tokenized_shards(
+        iter_augmented(cards, n_duplicates, seed, batch_size),
+        tokenizer,
+        shards.path,
+        max_seq_length,
+        metadata={
+            "tokenizer_name": tokenizer_name,
+            "seed": seed,
+            "n_duplicates": n_duplicates,
+        },
+    )
+
+    print(manifest)
+
+
 if __name__ == "__main__":
     preprocess_dataset(9129568, 2, None)
@@ -15,6 +15,8 @@ COMET_PROJECT_NAME = os.environ.get("COMET_PROJECT_NAME")
 IMAGE = "python:3.9-slim"
 # IMAGE = "pytorch/pytorch:1.10.0-cuda11.3-cudnn8-runtime"
 
+MTGLEARN_PACKAGE = "git+https://github.com/dconathan/mtglearn.git"
+
 
 @component(
     base_image=IMAGE,
@@ -24,6 +26,7 @@ IMAGE = "python:3.9-slim"
         "torch",
         "google-cloud-secret-manager",
         "comet_ml",
+        MTGLEARN_PACKAGE,
     ],
 )
 def train_mlm(
@@ -34,6 +37,20 @@ def train_mlm(
     learning_rate: float,
     num_train_epochs: float,
     save_steps: int,
+    tokenized_cache_dir: str = None,
+    batching: str = "random",
+    max_tokens_per_batch: int = None,
+    packing: bool = False,
+    block_diagonal_attention: bool = False,
+    fast_collator: bool = False,
+    whole_field_probability: float = 0.0,
+    cpu_profile: bool = False,
+    intra_op_threads: int = None,
+    inter_op_threads: int = None,
+    bf16: bool = None,
+    torch_compile: bool = False,
+    dataloader_num_workers: int = 0,
+    dataloader_prefetch_factor: int = None,
 ):
 
     # grab the COMET_API_KEY secret and set the env variable
@@ -79,7 +96,6 @@ def train_mlm(
     import os
     import sys
     from dataclasses import dataclass, field
-    from itertools import chain
     from typing import Optional
 
     import datasets
@@ -102,6 +118,28 @@ def train_mlm(
     from transformers.utils import check_min_version
     from transformers.utils.versions import require_version
 
+    from mtglearn.mlm.cache import (
+        cached_tokenize,
+        dataset_fingerprint,
+        tokenization_cache_key,
+    )
+    from mtglearn.mlm.collator import CardMLMCollator
+    from mtglearn.mlm.cpu import (
+        cpu_supports_bf16,
+        physical_cpu_count,
+        set_cpu_threads,
+        torch_compile_backend,
+    )
+    from mtglearn.mlm.grouping import group_dataset
+    from mtglearn.mlm.packing import PackedCollator, pack_dataset, position_offset
+    from mtglearn.mlm.sampling import (
+        BATCHING_STRATEGIES,
+        BatchSampler,
+        sequence_lengths,
+    )
+    from mtglearn.mlm.shards import is_shards, load_shards
+    from mtglearn.mlm.throughput import TokenThroughput
+
     logger = logging.getLogger(__name__)
     MODEL_CONFIG_CLASSES = list(MODEL_FOR_MASKED_LM_MAPPING.keys())
     MODEL_TYPES = tuple(conf.model_type for conf in MODEL_CONFIG_CLASSES)
@@ -211,6 +249,13 @@ def train_mlm(
             default=False,
             metadata={"help": "Overwrite the cached training and evaluation sets"},
         )
+        tokenized_cache_dir: Optional[str] = field(
+            default=None,
+            metadata={
+                "help": "A directory (e.g. a mounted volume) to cache tokenized datasets in, keyed by the tokenizer, "
+                "max_seq_length, line_by_line and the input data, so that reruns skip tokenization."
+            },
+        )
         validation_split_percentage: Optional[int] = field(
             default=5,
             metadata={
@@ -234,12 +279,40 @@ def train_mlm(
                 "help": "Ratio of tokens to mask for masked language modeling loss"
             },
         )
+        fast_collator: bool = field(
+            default=False,
+            metadata={
+                "help": "Whether to use mtglearn's CardMLMCollator, which pads and masks batches with numpy, rather "
+                "than DataCollatorForLanguageModeling."
+            },
+        )
+        whole_field_probability: float = field(
+            default=0.0,
+            metadata={
+                "help": "With --fast_collator, the probability of masking the whole value of each card field "
+                "(e.g. an entire mana cost), on top of the token masking."
+            },
+        )
         line_by_line: bool = field(
             default=False,
             metadata={
                 "help": "Whether distinct lines of text in the dataset are to be handled as distinct sequences."
             },
         )
+        packing: bool = field(
+            default=False,
+            metadata={
+                "help": "Whether to bin-pack whole tokenized lines (with their separators) into sequences of "
+                "max_seq_length, rather than padding each line or concatenating and splitting all the texts."
+            },
+        )
+        block_diagonal_attention: bool = field(
+            default=False,
+            metadata={
+                "help": "With --packing, whether to use block-diagonal attention masks (and per-line position "
+                "ids), so that packed lines don't attend to each other."
+            },
+        )
         pad_to_max_length: bool = field(
             default=False,
             metadata={
@@ -247,6 +320,18 @@ def train_mlm(
                 "If False, will pad the samples dynamically when batching to the maximum length in the batch."
             },
         )
+        batching: str = field(
+            default="random",
+            metadata={
+                "help": "How training batches are formed: `random`, `length_grouped` (batches of similarly sized "
+                "sequences) or `token_budget` (similarly sized sequences, capped by --max_tokens_per_batch padded "
+                "tokens rather than a number of rows)."
+            },
+        )
+        max_tokens_per_batch: Optional[int] = field(
+            default=None,
+            metadata={"help": "The maximum padded tokens per `token_budget` batch."},
+        )
         max_train_samples: Optional[int] = field(
             default=None,
             metadata={
@@ -263,6 +348,16 @@ def train_mlm(
         )
 
         def __post_init__(self):
+            if self.batching not in BATCHING_STRATEGIES:
+                raise ValueError(f"--batching must be one of {BATCHING_STRATEGIES}")
+            if self.batching == "token_budget" and self.max_tokens_per_batch is None:
+                raise ValueError(
+                    "--batching token_budget requires --max_tokens_per_batch"
+                )
+            if self.whole_field_probability and not self.fast_collator:
+                raise ValueError("--whole_field_probability requires --fast_collator")
+            if self.block_diagonal_attention and not self.packing:
+                raise ValueError("--block_diagonal_attention requires --packing")
             if (
                 self.dataset_name is None
                 and self.train_file is None
@@ -283,12 +378,80 @@ def train_mlm(
                             "`validation_file` should be a csv, a json or a txt file."
                         )
 
+    class MLMTrainer(Trainer):
+        """
+        A Trainer that can form its training batches with a `BatchSampler` rather than a fixed number of random
+        rows, and that reports the tokens trained on per second.
+        """
+
+        def __init__(self, *args, batch_sampler=None, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.batch_sampler = batch_sampler
+            self.throughput = TokenThroughput()
+
+        def training_step(self, model, inputs, *args, **kwargs):
+            input_ids = inputs["input_ids"]
+            self.throughput.update(
+                int(input_ids.ne(self.tokenizer.pad_token_id).sum()), input_ids.numel()
+            )
+            return super().training_step(model, inputs, *args, **kwargs)
+
+        def log(self, logs, *args, **kwargs):
+            # training logs (rather than evaluation ones) get the throughput since the last log
+            if "loss" in logs:
+                logs.update(self.throughput.interval())
+            super().log(logs, *args, **kwargs)
+
+        def get_train_dataloader(self):
+            if self.batch_sampler is None:
+                return super().get_train_dataloader()
+            from torch.utils.data import DataLoader
+
+            train_dataset = self._remove_unused_columns(
+                self.train_dataset, description="training"
+            )
+            return DataLoader(
+                train_dataset,
+                batch_sampler=self.batch_sampler,
+                collate_fn=self.data_collator,
+                num_workers=self.args.dataloader_num_workers,
+                pin_memory=self.args.dataloader_pin_memory,
+                prefetch_factor=self.args.dataloader_prefetch_factor,
+                persistent_workers=self.args.dataloader_num_workers > 0,
+            )
+
     def main():
 
+        # CPU training: the threads must be set before torch does any parallel work (one intra-op thread per
+        # physical core unless set explicitly), bf16 autocast is only used if the CPU has bf16 instructions
+        # (unless set explicitly), and there is nothing to pin memory for.
+        if intra_op_threads or inter_op_threads or cpu_profile:
+            threads = set_cpu_threads(
+                intra_op_threads or (physical_cpu_count() if cpu_profile else None),
+                inter_op_threads,
+            )
+            print(
+                f"torch intra-op threads: {threads[0]}, inter-op threads: {threads[1]}"
+            )
+        use_bf16 = bool(bf16)
+        pin_memory = True
+        if cpu_profile:
+            import torch
+
+            use_bf16 = cpu_supports_bf16() if bf16 is None else bf16
+            pin_memory = torch.cuda.is_available()
+
         model_args = ModelArguments(model_name_or_path=model_name_or_path)
         data_args = DataTrainingArguments(
             train_file=train_file,
             line_by_line=True,
+            tokenized_cache_dir=tokenized_cache_dir,
+            batching=batching,
+            max_tokens_per_batch=max_tokens_per_batch,
+            packing=packing,
+            block_diagonal_attention=block_diagonal_attention,
+            fast_collator=fast_collator,
+            whole_field_probability=whole_field_probability,
         )
         training_args = TrainingArguments(
             output_dir=output_dir,
@@ -301,6 +464,17 @@ def train_mlm(
             warmup_ratio=0.01,
             save_steps=save_steps,
             disable_tqdm=True,
+            # the packed collator needs each row's sequence_ids, which the model doesn't take
+            remove_unused_columns=not block_diagonal_attention,
+            bf16=use_bf16,
+            torch_compile=torch_compile,
+            # inductor needs a C++ compiler, which slim images don't have
+            torch_compile_backend=torch_compile_backend() if torch_compile else None,
+            dataloader_num_workers=dataloader_num_workers,
+            dataloader_prefetch_factor=(
+                dataloader_prefetch_factor if dataloader_num_workers else None
+            ),
+            dataloader_pin_memory=pin_memory,
         )
 
         # Setup logging
@@ -362,7 +536,15 @@ def train_mlm(
         #
         # In distributed training, the load_dataset function guarantee that only one local process can concurrently
         # download the dataset.
-        if data_args.dataset_name is not None:
+        #
+        # Shards written by `prepare_tokenized_shards` are already tokenized, and are used as is (once the
+        # tokenizer is loaded, to check they were tokenized with it).
+        pretokenized = data_args.train_file is not None and is_shards(
+            data_args.train_file
+        )
+        if pretokenized:
+            pass
+        elif data_args.dataset_name is not None:
             # Downloading and loading a dataset from the hub.
             raw_datasets = load_dataset(
                 data_args.dataset_name,
@@ -475,11 +657,12 @@ def train_mlm(
 
         # Preprocessing the datasets.
         # First we tokenize all the texts.
-        if training_args.do_train:
-            column_names = raw_datasets["train"].column_names
-        else:
-            column_names = raw_datasets["validation"].column_names
-        text_column_name = "text" if "text" in column_names else column_names[0]
+        if not pretokenized:
+            if training_args.do_train:
+                column_names = raw_datasets["train"].column_names
+            else:
+                column_names = raw_datasets["validation"].column_names
+            text_column_name = "text" if "text" in column_names else column_names[0]
 
         if data_args.max_seq_length is None:
             max_seq_length = tokenizer.model_max_length
@@ -497,92 +680,118 @@ def train_mlm(
                 )
             max_seq_length = min(data_args.max_seq_length, tokenizer.model_max_length)
 
-        if data_args.line_by_line:
-            # When using line_by_line, we just tokenize each nonempty line.
-            padding = "max_length" if data_args.pad_to_max_length else False
-
-            def tokenize_function(examples):
-                # Remove empty lines
-                examples[text_column_name] = [
-                    line
-                    for line in examples[text_column_name]
-                    if len(line) > 0 and not line.isspace()
-                ]
-                return tokenizer(
-                    examples[text_column_name],
-                    padding=padding,
-                    truncation=True,
-                    max_length=max_seq_length,
-                    # We use this option because DataCollatorForLanguageModeling (see below) is more efficient when it
-                    # receives the `special_tokens_mask`.
-                    return_special_tokens_mask=True,
-                )
-
-            with training_args.main_process_first(desc="dataset map tokenization"):
-                tokenized_datasets = raw_datasets.map(
-                    tokenize_function,
-                    batched=True,
-                    num_proc=data_args.preprocessing_num_workers,
-                    remove_columns=[text_column_name],
-                    load_from_cache_file=not data_args.overwrite_cache,
-                    desc="Running tokenizer on dataset line_by_line",
-                )
-        else:
-            # Otherwise, we tokenize every text, then concatenate them together before splitting them in smaller parts.
-            # We use `return_special_tokens_mask=True` because DataCollatorForLanguageModeling (see below) is more
-            # efficient when it receives the `special_tokens_mask`.
-            def tokenize_function(examples):
-                return tokenizer(
-                    examples[text_column_name], return_special_tokens_mask=True
-                )
-
-            with training_args.main_process_first(desc="dataset map tokenization"):
-                tokenized_datasets = raw_datasets.map(
-                    tokenize_function,
-                    batched=True,
-                    num_proc=data_args.preprocessing_num_workers,
-                    remove_columns=column_names,
-                    load_from_cache_file=not data_args.overwrite_cache,
-                    desc="Running tokenizer on every text in dataset",
+        # Packing bin-packs whole lines over each entire split, so nothing is dropped at batch edges.
+        def pack_datasets(tokenized_datasets):
+            with training_args.main_process_first(desc="packing lines"):
+                return datasets.DatasetDict(
+                    {
+                        split: pack_dataset(dataset, max_seq_length)
+                        for split, dataset in tokenized_datasets.items()
+                    }
                 )
 
-            # Main data processing function that will concatenate all texts from our dataset and generate chunks of
-            # max_seq_length.
-            def group_texts(examples):
-                # Concatenate all texts.
-                concatenated_examples = {
-                    k: list(chain(*examples[k])) for k in examples.keys()
-                }
-                total_length = len(concatenated_examples[list(examples.keys())[0]])
-                # We drop the small remainder, we could add padding if the model supported it instead of this drop, you can
-                # customize this part to your needs.
-                if total_length >= max_seq_length:
-                    total_length = (total_length // max_seq_length) * max_seq_length
-                # Split by chunks of max_len.
-                result = {
-                    k: [
-                        t[i : i + max_seq_length]
-                        for i in range(0, total_length, max_seq_length)
+        def tokenize_datasets():
+            if data_args.line_by_line or data_args.packing:
+                # When using line_by_line, we just tokenize each nonempty line.
+                padding = "max_length" if data_args.pad_to_max_length else False
+
+                def tokenize_function(examples):
+                    # Remove empty lines
+                    examples[text_column_name] = [
+                        line
+                        for line in examples[text_column_name]
+                        if len(line) > 0 and not line.isspace()
                     ]
-                    for k, t in concatenated_examples.items()
-                }
-                return result
-
-            # Note that with `batched=True`, this map processes 1,000 texts together, so group_texts throws away a
-            # remainder for each of those groups of 1,000 texts. You can adjust that batch_size here but a higher value
-            # might be slower to preprocess.
-            #
-            # To speed up this part, we use multiprocessing. See the documentation of the map method for more information:
-            # https://huggingface.co/docs/datasets/package_reference/main_classes.html#datasets.Dataset.map
-
-            with training_args.main_process_first(desc="grouping texts together"):
-                tokenized_datasets = tokenized_datasets.map(
-                    group_texts,
-                    batched=True,
-                    num_proc=data_args.preprocessing_num_workers,
-                    load_from_cache_file=not data_args.overwrite_cache,
-                    desc=f"Grouping texts in chunks of {max_seq_length}",
+                    return tokenizer(
+                        examples[text_column_name],
+                        padding=padding,
+                        truncation=True,
+                        max_length=max_seq_length,
+                        # We use this option because DataCollatorForLanguageModeling (see below) is more efficient when it
+                        # receives the `special_tokens_mask`.
+                        return_special_tokens_mask=True,
+                    )
+
+                with training_args.main_process_first(desc="dataset map tokenization"):
+                    tokenized_datasets = raw_datasets.map(
+                        tokenize_function,
+                        batched=True,
+                        num_proc=data_args.preprocessing_num_workers,
+                        remove_columns=[text_column_name],
+                        load_from_cache_file=not data_args.overwrite_cache,
+                        desc="Running tokenizer on dataset line_by_line",
+                    )
+            else:
+                # Otherwise, we tokenize every text, then concatenate them together before splitting them in smaller parts.
+                # We use `return_special_tokens_mask=True` because DataCollatorForLanguageModeling (see below) is more
+                # efficient when it receives the `special_tokens_mask`.
+                def tokenize_function(examples):
+                    return tokenizer(
+                        examples[text_column_name], return_special_tokens_mask=True
+                    )
+
+                with training_args.main_process_first(desc="dataset map tokenization"):
+                    tokenized_datasets = raw_datasets.map(
+                        tokenize_function,
+                        batched=True,
+                        num_proc=data_args.preprocessing_num_workers,
+                        remove_columns=column_names,
+                        load_from_cache_file=not data_args.overwrite_cache,
+                        desc="Running tokenizer on every text in dataset",
+                    )
+
+                # Concatenate all texts from our dataset and generate chunks of max_seq_length. The grouping works on
+                # the arrow buffers directly (no python object per token), and carries the tokens that don't fill a
+                # chunk over to the next batch, so only the very end of each split makes a last, shorter chunk.
+                with training_args.main_process_first(desc="grouping texts together"):
+                    tokenized_datasets = datasets.DatasetDict(
+                        {
+                            split: group_dataset(dataset, max_seq_length)
+                            for split, dataset in tokenized_datasets.items()
+                        }
+                    )
+
+            if data_args.packing:
+                tokenized_datasets = pack_datasets(tokenized_datasets)
+            return tokenized_datasets
+
+        if pretokenized:
+            shards, _ = load_shards(
+                data_args.train_file,
+                tokenizer_name=model_args.tokenizer_name
+                or model_args.model_name_or_path,
+                max_seq_length=max_seq_length,
+            )
+            tokenized_datasets = shards.train_test_split(
+                test_size=data_args.validation_split_percentage / 100,
+                seed=training_args.seed,
+                keep_in_memory=True,
+            )
+            tokenized_datasets["validation"] = tokenized_datasets.pop("test")
+            # shards hold whole lines, so they pack like freshly tokenized ones
+            if data_args.packing:
+                tokenized_datasets = pack_datasets(tokenized_datasets)
+        else:
+            # Tokenized datasets are cached by content, so reruns with the same tokenizer and data skip
+            # tokenization.
+            tokenization_key = None
+            if data_args.tokenized_cache_dir is not None:
+                tokenization_key = tokenization_cache_key(
+                    model_args.tokenizer_name or model_args.model_name_or_path,
+                    model_args.model_revision,
+                    max_seq_length,
+                    data_args.line_by_line,
+                    dataset_fingerprint(raw_datasets),
+                    pad_to_max_length=data_args.pad_to_max_length,
+                    packing=data_args.packing,
                 )
+            tokenized_datasets = cached_tokenize(
+                data_args.tokenized_cache_dir,
+                tokenization_key,
+                tokenize_datasets,
+                overwrite=data_args.overwrite_cache,
+                save=training_args.process_index == 0,
+            )
 
         if training_args.do_train:
             if "train" not in tokenized_datasets:
@@ -605,20 +814,62 @@ def train_mlm(
             and training_args.fp16
             and not data_args.pad_to_max_length
         )
-        data_collator = DataCollatorForLanguageModeling(
-            tokenizer=tokenizer,
-            mlm_probability=data_args.mlm_probability,
-            pad_to_multiple_of=8 if pad_to_multiple_of_8 else None,
-        )
+        if data_args.fast_collator:
+            data_collator = CardMLMCollator(
+                tokenizer,
+                mlm_probability=data_args.mlm_probability,
+                whole_field_probability=data_args.whole_field_probability,
+                max_length=max_seq_length,
+                pad_to_max_length=data_args.pad_to_max_length,
+                pad_to_multiple_of=8 if pad_to_multiple_of_8 else None,
+                seed=training_args.seed,
+            )
+        else:
+            data_collator = DataCollatorForLanguageModeling(
+                tokenizer=tokenizer,
+                mlm_probability=data_args.mlm_probability,
+                pad_to_multiple_of=8 if pad_to_multiple_of_8 else None,
+            )
+        if data_args.block_diagonal_attention:
+            offset = position_offset(config)
+            if offset is None:
+                logger.warning(
+                    f"Unknown position ids convention for {config.model_type} models, packed cards will not restart their positions"
+                )
+            data_collator = PackedCollator(data_collator, position_offset=offset)
+
+        # Group training batches by length (or cap them by tokens) so less of each batch is padding
+        batch_sampler = None
+        padding_metrics = {}
+        if training_args.do_train and data_args.batching != "random":
+            batch_sampler = BatchSampler(
+                sequence_lengths(train_dataset),
+                data_args.batching,
+                batch_size=(
+                    training_args.per_device_train_batch_size
+                    if data_args.batching == "length_grouped"
+                    else None
+                ),
+                max_tokens=data_args.max_tokens_per_batch,
+                seed=training_args.seed,
+            )
+            padding_metrics = batch_sampler.padding_metrics(
+                batch_size=training_args.per_device_train_batch_size
+            )
+            logger.info(
+                f"padding efficiency: {padding_metrics['random_padding_efficiency']:.3f} with random batches, "
+                f"{padding_metrics['padding_efficiency']:.3f} with {data_args.batching} batches"
+            )
 
         # Initialize our Trainer
-        trainer = Trainer(
+        trainer = MLMTrainer(
             model=model,
             args=training_args,
             train_dataset=train_dataset if training_args.do_train else None,
             eval_dataset=eval_dataset if training_args.do_eval else None,
             tokenizer=tokenizer,
             data_collator=data_collator,
+            batch_sampler=batch_sampler,
         )
 
         # Training
@@ -638,6 +889,8 @@ def train_mlm(
                 else len(train_dataset)
             )
             metrics["train_samples"] = min(max_train_samples, len(train_dataset))
+            metrics.update(padding_metrics)
+            metrics.update(trainer.throughput.total())
 
             trainer.log_metrics("train", metrics)
             trainer.save_metrics("train", metrics)
@@ -0,0 +1,100 @@
+from typing import Any, Iterator, List, Mapping, Sequence, Tuple
+
+import attrs
+import numpy as np
+
+from .card import Card
+
+# fields that may be dropped from a card. `name` is always kept
+CANDIDATE_FIELDS = tuple(f.name for f in attrs.fields(Card) if f.name != "name")
+
+
+def count_fields(batch: Mapping[str, Sequence[Any]]) -> np.ndarray:
+    """The number of non-empty Card fields of each card in a column-wise batch."""
+    counts = np.zeros(len(batch["name"]), dtype=np.int64)
+    for f in attrs.fields(Card):
+        counts += np.fromiter((bool(v) for v in batch[f.name]), bool, len(counts))
+    return counts
+
+
+def row_uniforms(
+    seed: int, indices: Sequence[int], shape: Tuple[int, ...]
+) -> np.ndarray:
+    """
+    Draw uniform [0, 1) floats of the given `shape` for each row, from an independent stream per row derived
+    from `seed` and the row's index (as a `SeedSequence` spawn key).
+
+    The draws for a row only depend on (seed, index), not on which batch or process the row ends up in.
+    Returns an array of shape (len(indices), *shape).
+    """
+    draws = np.empty((len(indices),) + tuple(shape))
+    for i, index in enumerate(indices):
+        seed_sequence = np.random.SeedSequence(seed, spawn_key=(index,))
+        draws[i] = np.random.Generator(np.random.PCG64(seed_sequence)).random(shape)
+    return draws
+
+
+def draw_field_masks(
+    n_fields: np.ndarray, n_copies: int, seed: int, indices: Sequence[int]
+) -> np.ndarray:
+    """
+    For each card, draw `n_copies` masks over `CANDIDATE_FIELDS` for which fields to keep, using the card's
+    random stream (see `row_uniforms`).
+
+    Each mask keeps a uniformly random number of fields, between 0 and the card's number of non-empty
+    fields - 1, chosen uniformly at random without replacement. Returns a boolean array of shape
+    (n_cards, n_copies, len(CANDIDATE_FIELDS)).
+    """
+    draws = row_uniforms(seed, indices, (n_copies, len(CANDIDATE_FIELDS) + 1))
+    n_keep = (draws[..., 0] * np.maximum(n_fields, 1)[:, None]).astype(np.int64)
+    # the rank of each field in a random permutation, so keeping ranks < n_keep samples without replacement
+    ranks = draws[..., 1:].argsort(-1).argsort(-1)
+    return ranks < n_keep[..., None]
+
+
+def render_masked(
+    batch: Mapping[str, Sequence[Any]], masks: np.ndarray
+) -> List[List[str]]:
+    """
+    Render each card of a column-wise batch once per mask in `masks` (as drawn by `draw_field_masks`),
+    with the masked out fields removed. Returns one list of strings per copy.
+    """
+    rendered = []
+    for copy in range(masks.shape[1]):
+        columns = {"name": batch["name"]}
+        for i, field in enumerate(CANDIDATE_FIELDS):
+            columns[field] = [
+                value if keep else None
+                for value, keep in zip(batch[field], masks[:, copy, i].tolist())
+            ]
+        rendered.append(Card.serialize_batch(columns))
+    return rendered
+
+
+def augment_batch(
+    batch: Mapping[str, Sequence[Any]],
+    n_duplicates: int,
+    seed: int,
+    indices: Sequence[int],
+) -> List[str]:
+    """
+    Field-dropout augmentation of a column-wise batch of cards: each card is rendered `n_duplicates`
+    times, first in full and then with random subsets of its fields dropped.
+
+    `indices` are the cards' positions in the whole dataset, which key their random streams, so the output
+    for a given `seed` is the same however the dataset is split into batches or processes.
+    Each card's strings are contiguous in the output.
+    """
+    masks = draw_field_masks(count_fields(batch), n_duplicates - 1, seed, indices)
+    rendered = [Card.serialize_batch(batch)] + render_masked(batch, masks)
+    return [card for copies in zip(*rendered) for card in copies]
+
+
+def iter_augmented(
+    cards, n_duplicates: int, seed: int, batch_size: int = 1000
+) -> Iterator[List[str]]:
+    """Stream `augment_batch` over a dataset of cards, yielding one list of strings per batch."""
+    for start in range(0, len(cards), batch_size):
+        batch = cards[start : start + batch_size]
+        indices = range(start, start + len(batch["name"]))
+        yield augment_batch(batch, n_duplicates, seed, indices)
@@ -1,4 +1,5 @@
-from typing import List, Optional
+from typing import Any, Callable, List, Mapping, Optional, Sequence, Tuple
+from operator import attrgetter
 import re
 
 import attrs
@@ -6,6 +7,87 @@ from attrs import frozen
 import cattrs
 
 
+_UNDERSCORES = re.compile(r"_+")
+# joins rendered cards in a batch so they can be normalized in a single pass. it is neither whitespace nor
+# an underscore, so normalization never crosses cards
+_BATCH_SEPARATOR = "\x00"
+
+
+def _normalize(s: str) -> str:
+    r"""
+    Equivalent to `re.sub(r"\s+|_+", " ", s)`, but several times faster: whitespace runs are collapsed
+    with str.split/join (which split on the same characters as \s), and the regex only looks for underscores.
+    """
+    collapsed = " ".join(s.split())
+    if not collapsed:
+        return " " if s else ""
+    if s[0].isspace():
+        collapsed = " " + collapsed
+    if s[-1].isspace():
+        collapsed += " "
+    if "_" in collapsed:
+        collapsed = _UNDERSCORES.sub(" ", collapsed)
+    return collapsed
+
+
+def _make_serializers(cls) -> Tuple[Callable[[Any], str], Callable[[Any], List[str]]]:
+    """
+    Build the functions that render instances of (and column batches for) attrs class `cls` into the
+    canonical string representation, looking the fields up once rather than on every call.
+    """
+    names = tuple(f.name for f in attrs.fields(cls) if f.repr)
+    getter = attrgetter(*names)
+    # normalize the field names up front (e.g. `mana_cost: ` -> `mana cost: `), so most cards have nothing
+    # left to normalize. this gives the same result as long as names don't start or end with underscores
+    prefixes = {
+        name: (
+            _normalize(name) + ": "
+            if re.fullmatch(r"[^\W_]+(_[^\W_]+)*", name)
+            else name + ": "
+        )
+        for name in names
+    }
+
+    def serialize(obj) -> str:
+        fields = []
+        for name, value in zip(names, getter(obj)):
+            if isinstance(value, list):
+                value = " ".join(value)
+            if value:
+                fields.append(f"{prefixes[name]}{value}")
+        return _normalize(" | ".join(fields))
+
+    def serialize_batch(columns) -> List[str]:
+        # arrow tables/record batches
+        if hasattr(columns, "column_names"):
+            columns = {
+                name: columns.column(name).to_pylist()
+                for name in names
+                if name in columns.column_names
+            }
+        present = [name for name in names if columns.get(name) is not None]
+        if not present:
+            raise ValueError(f"no {cls.__name__} fields in batch")
+
+        rows = [[] for _ in columns[present[0]]]
+        for name in present:
+            prefix = prefixes[name]
+            for fields, value in zip(rows, columns[name]):
+                if isinstance(value, list):
+                    value = " ".join(value)
+                if value:
+                    fields.append(f"{prefix}{value}")
+
+        rendered = _BATCH_SEPARATOR.join(" | ".join(fields) for fields in rows)
+        serialized = _normalize(rendered).split(_BATCH_SEPARATOR)
+        if len(serialized) != len(rows):
+            # a value contained the separator, normalize card by card
+            serialized = [_normalize(" | ".join(fields)) for fields in rows]
+        return serialized
+
+    return serialize, serialize_batch
+
+
 @frozen(slots=False)
 class Card:
     # fields from mtgjson
@@ -27,15 +109,18 @@ class Card:
         """Canonical string representation of a card:
 
         field1_name: field1_value | field2_name: field2_value | ..."""
-        fields = []
-        for f in attrs.fields(Card):
-            if f.repr:
-                value = getattr(self, f.name)
-                if isinstance(value, list):
-                    value = " ".join(value)
-                if value:
-                    fields.append((f.name, value))
-        return re.sub(r"\s+|_+", " ", " | ".join(f"{k}: {v}" for k, v in fields))
+        return _serialize_card(self)
+
+    @staticmethod
+    def serialize_batch(columns: Mapping[str, Sequence[Any]]) -> List[str]:
+        """
+        Render a batch of cards, given column-wise (e.g. a dict of lists or an arrow table), into the same
+        strings as `str(card)` for each card. Missing columns are treated as empty fields.
+        """
+        return _serialize_card_batch(columns)
+
+
+_serialize_card, _serialize_card_batch = _make_serializers(Card)
 
 
 @frozen(slots=False)
@@ -67,3 +152,27 @@ class CardStats:
 @frozen(slots=False)
 class CardWithStats(Card, CardStats):
     pass
+
+
+def _make_compact(cls):
+    """
+    A `__slots__`-based copy of attrs class `cls`, with the same fields and string representation.
+
+    Instances don't have a per-object `__dict__`, so they use a fraction of the memory.
+    """
+    compact = attrs.make_class(
+        f"Compact{cls.__name__}",
+        {
+            f.name: attrs.field(default=f.default, type=f.type, metadata=f.metadata)
+            for f in attrs.fields(cls)
+        },
+        frozen=True,
+        slots=True,
+    )
+    compact.__str__ = cls.__str__
+    return compact
+
+
+CompactCard = _make_compact(Card)
+CompactCardStats = _make_compact(CardStats)
+CompactCardWithStats = _make_compact(CardWithStats)
@@ -1,5 +1,8 @@
 import os
-from datasets.config import XDG_CACHE_HOME
+
+# the same default as `datasets.config.XDG_CACHE_HOME`, without importing datasets
+DEFAULT_XDG_CACHE_HOME = "~/.cache"
+XDG_CACHE_HOME = os.getenv("XDG_CACHE_HOME", DEFAULT_XDG_CACHE_HOME)
 
 DEFAULT_MTGLEARN_CACHE_HOME = os.path.join(XDG_CACHE_HOME, "mtglearn")
 MTGLEARN_CACHE_HOME = os.path.expanduser(
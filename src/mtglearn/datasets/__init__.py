@@ -1 +1,25 @@
-from .cards import load_cards
+from .report import LoadReport, Stage
+from .cardfile import CardFile
+
+__all__ = [
+    "CardFile",
+    "CardNameIndex",
+    "LoadReport",
+    "NameMatch",
+    "Stage",
+    "load_cards",
+]
+
+
+def __getattr__(name):
+    # load_cards needs datasets, pyarrow and pandas, so they are only imported on first use
+    if name == "load_cards":
+        from .cards import load_cards
+
+        return load_cards
+    # and the name index needs numpy
+    if name in ("CardNameIndex", "NameMatch"):
+        from . import names
+
+        return getattr(names, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,138 @@
+from typing import Iterable, Mapping, Optional
+import json
+import os
+import logging
+
+import pyarrow as pa
+from datasets import Dataset, Features, concatenate_datasets
+from datasets.arrow_writer import ArrowWriter
+
+from .files import atomic_path, atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+MANIFEST_FILENAME = "manifest.json"
+PARTITIONS_DIRNAME = "printings"
+
+
+def partition_path(cache_dir: str, printing: str) -> str:
+    return os.path.join(cache_dir, PARTITIONS_DIRNAME, f"{printing}.arrow")
+
+
+def read_manifest(cache_dir: str, features: Features) -> Optional[dict]:
+    """
+    Read the manifest of a printing-partitioned cache, which maps each printing to the content hash of its
+    raw data and its number of rows (in the order the printings were written).
+
+    Returns None if there is no manifest, or it was written for different features.
+    """
+    filename = os.path.join(cache_dir, MANIFEST_FILENAME)
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename) as f:
+            manifest = json.load(f)
+    except Exception as e:
+        logger.error(f"could not read manifest {filename}: {e}")
+        return None
+    if manifest.get("features") != features.to_dict():
+        logger.info(f"cached partitions in {cache_dir} have stale features")
+        return None
+    return manifest
+
+
+def write_manifest(cache_dir: str, features: Features, printings: Mapping[str, dict]):
+    os.makedirs(os.path.join(cache_dir, PARTITIONS_DIRNAME), exist_ok=True)
+    filename = os.path.join(cache_dir, MANIFEST_FILENAME)
+    manifest = {"features": features.to_dict(), "printings": dict(printings)}
+    with atomic_write(filename) as f:
+        json.dump(manifest, f)
+
+    # remove partitions of printings that no longer exist
+    partitions_dir = os.path.join(cache_dir, PARTITIONS_DIRNAME)
+    for partition in os.listdir(partitions_dir):
+        if partition[: -len(".arrow")] not in printings:
+            os.remove(os.path.join(partitions_dir, partition))
+
+
+def write_partition(cache_dir: str, printing: str, table: pa.Table, features: Features):
+    filename = partition_path(cache_dir, printing)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with atomic_path(filename) as tmp_path:
+        writer = ArrowWriter(features=features, path=tmp_path)
+        writer.write_table(table)
+        writer.finalize()
+
+
+def load_partitions(
+    cache_dir: str, features: Features, printings: Optional[Iterable[str]] = None
+) -> Optional[Dataset]:
+    """
+    Load (memory-mapped) the cached partitions of the given printings, or all of them if `printings` is None.
+
+    Returns None if the cache is missing or stale.
+    """
+    manifest = read_manifest(cache_dir, features)
+    if manifest is None:
+        return None
+
+    if printings is None:
+        printings = list(manifest["printings"])
+    else:
+        wanted = set(printings)
+        printings = [p for p in manifest["printings"] if p in wanted]
+
+    datasets = []
+    for printing in printings:
+        if manifest["printings"][printing]["num_rows"]:
+            datasets.append(Dataset.from_file(partition_path(cache_dir, printing)))
+
+    logger.debug(f"loaded {len(datasets)} cached partitions from {cache_dir}!")
+
+    if not datasets:
+        return Dataset.from_dict({k: [] for k in features}, features=features)
+
+    return concatenate_datasets(datasets)
+
+
+def _stats_info_path(stats_cache: str) -> str:
+    return stats_cache.rstrip(os.sep) + ".json"
+
+
+def read_stats_info(stats_cache: str) -> Optional[dict]:
+    """
+    Read how the joined stats cache at `stats_cache` was built: its `stats_formats`, `stats_join` and the
+    `unmatched_names` of the cards without stats. Returns None if unknown.
+    """
+    filename = _stats_info_path(stats_cache)
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"could not read {filename}: {e}")
+        return None
+
+
+def remove_stats_info(stats_cache: str):
+    # before rewriting the cache, so a crash in between leaves it unknown rather than wrongly described
+    if os.path.exists(_stats_info_path(stats_cache)):
+        os.remove(_stats_info_path(stats_cache))
+
+
+def write_stats_info(
+    stats_cache: str,
+    stats_formats: Iterable[str],
+    stats_join: str,
+    unmatched_names: Iterable[str],
+):
+    filename = _stats_info_path(stats_cache)
+    info = {
+        "stats_formats": sorted(stats_formats),
+        "stats_join": stats_join,
+        "unmatched_names": list(unmatched_names),
+    }
+    with atomic_write(filename) as f:
+        json.dump(info, f)
@@ -0,0 +1,388 @@
+"""
+A compact, versioned binary file of cards, with a name index, for looking cards up by name through `mmap`
+without loading (or importing) `datasets`.
+
+Layout (little-endian):
+
+    header   magic, version, number of cards, number of names, then the offsets of the sections below
+    fields   json list of [field name, kind] pairs, kind being "str", "int" or "list" (of strings)
+    index    one (name offset, name length, first record, number of records) entry per unique name,
+             sorted by the utf-8 bytes of the name
+    records  one fixed-width record per card, sorted by name, with for each field either a heap
+             (offset, length) pair, or an int64
+    heap     utf-8 strings. list values are stored joined by `LIST_SEPARATOR`
+"""
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+import json
+import mmap
+import os
+import struct
+import typing
+
+import attrs
+
+from ..card import Card
+from ..config import MTGLEARN_CACHE_HOME
+from .files import atomic_write
+
+if TYPE_CHECKING:
+    from .names import CardNameIndex, NameMatch
+
+MAGIC = b"MTGCARDS"
+FORMAT_VERSION = 1
+CARD_FILE_NAME = "cards.mtgcards"
+# where the ingest step of `load_cards` writes it
+DEFAULT_CARD_FILE = os.path.join(MTGLEARN_CACHE_HOME, "cards", CARD_FILE_NAME)
+
+LIST_SEPARATOR = "\x1f"
+# stands for None in an int field, or as the length of a string field
+NULL_INT = -(2**63)
+NULL_LENGTH = 2**32 - 1
+
+_HEADER = struct.Struct("<8sIII4xQQQQ")
+_INDEX_ENTRY = struct.Struct("<IIII")
+
+
+def _field_kind(field: attrs.Attribute) -> str:
+    args = typing.get_args(field.type)
+    type_ = next((a for a in args if a is not type(None)), field.type)
+    if type_ is int:
+        return "int"
+    if typing.get_origin(type_) is list:
+        return "list"
+    return "str"
+
+
+def _record_struct(kinds: Sequence[str]) -> struct.Struct:
+    return struct.Struct("<" + "".join("q" if k == "int" else "II" for k in kinds))
+
+
+# how many records are built in memory at a time
+RECORDS_CHUNK_SIZE = 64 * 1024
+
+
+def _arrow_type(kind: str):
+    import pyarrow as pa
+
+    return {"int": pa.int64(), "str": pa.string(), "list": pa.list_(pa.string())}[kind]
+
+
+def _heap_strings(column, kind: str, heap_size: int):
+    """
+    Lay the strings of a column (of list values joined by `LIST_SEPARATOR`) out in the heap as they are in
+    its arrow buffers, from `heap_size` bytes in. Returns each row's heap offset and length, and the buffers
+    to write to the heap.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if kind == "list":
+        column = pc.binary_join(column, LIST_SEPARATOR)
+    offsets_type = np.int64 if pa.types.is_large_string(column.type) else np.int32
+    row_offsets, row_lengths, heap = [], [], []
+    for chunk in column.chunks:
+        _, offsets, data = chunk.buffers()
+        offsets = np.frombuffer(offsets, dtype=offsets_type)[
+            chunk.offset : chunk.offset + len(chunk) + 1
+        ].astype(np.int64)
+        is_null = chunk.is_null().to_numpy(zero_copy_only=False)
+        row_offsets.append(np.where(is_null, 0, offsets[:-1] - offsets[0] + heap_size))
+        row_lengths.append(np.where(is_null, NULL_LENGTH, np.diff(offsets)))
+        if offsets[-1] > offsets[0]:
+            heap.append(data[offsets[0] : offsets[-1]])
+            heap_size += offsets[-1] - offsets[0]
+    # as stored in the records
+    return (
+        np.concatenate(row_offsets).astype(np.uint32),
+        np.concatenate(row_lengths).astype(np.uint32),
+        heap,
+    )
+
+
+def write_card_file(path: str, columns, cls: type = Card) -> int:
+    """
+    Write cards, given column-wise (an arrow table or a dict of lists with the fields of `cls`), to a card
+    file at `path`. Returns the number of cards written.
+
+    The heap is written straight from the columns' arrow buffers, and the records a chunk at a time, so this
+    holds little more than a few integers per card in memory.
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    fields = [(f.name, _field_kind(f)) for f in attrs.fields(cls)]
+    if not hasattr(columns, "column_names"):
+        columns = pa.table(
+            {
+                name: pa.array(columns[name], type=_arrow_type(kind))
+                for name, kind in fields
+                if name in columns
+            }
+        )
+    n_cards = columns.num_rows
+
+    # cards sorted by name (by utf-8 bytes, as arrow sorts strings), then printing
+    sort_keys = {
+        name: pc.fill_null(columns.column(name), "")
+        for name in ("name", "printing")
+        if name in columns.column_names
+    }
+    order = pc.sort_indices(
+        pa.table(sort_keys), sort_keys=[(name, "ascending") for name in sort_keys]
+    ).to_numpy()
+
+    # int fields are stored in the records, and string fields in the heap
+    values = {}
+    heap = []
+    heap_size = 0
+    for name, kind in fields:
+        if name not in columns.column_names:
+            continue
+        column = columns.column(name)
+        if kind == "int":
+            values[name] = pc.fill_null(column.cast(pa.int64()), NULL_INT).to_numpy()
+        else:
+            offsets, lengths, buffers = _heap_strings(column, kind, heap_size)
+            values[name] = (offsets, lengths)
+            heap.extend(buffers)
+            heap_size += sum(buffer.size for buffer in buffers)
+
+    # an index entry per run of cards with the same name (cards without one are indexed under ""), pointing
+    # at the name of the run's first card
+    sorted_names = sort_keys["name"].take(order)
+    is_start = np.ones(n_cards, dtype=bool)
+    is_start[1:] = pc.not_equal(sorted_names[1:], sorted_names[:-1]).to_numpy()
+    starts = np.flatnonzero(is_start)
+    del sorted_names, is_start
+    name_offsets, name_lengths = values["name"]
+    first_cards = order[starts]
+    index = np.empty(
+        len(starts),
+        dtype=[
+            ("offset", "<u4"),
+            ("length", "<u4"),
+            ("first", "<u4"),
+            ("count", "<u4"),
+        ],
+    )
+    index["offset"] = name_offsets[first_cards]
+    index["length"] = np.where(
+        name_lengths[first_cards] == NULL_LENGTH, 0, name_lengths[first_cards]
+    )
+    index["first"] = starts
+    index["count"] = np.diff(starts, append=n_cards)
+    index_bytes = index.tobytes()
+
+    # records as a structured array, with the layout of `_record_struct`
+    record = np.dtype(
+        [
+            (
+                (name, "<i8")
+                if kind == "int"
+                else (name, [("offset", "<u4"), ("length", "<u4")])
+            )
+            for name, kind in fields
+        ]
+    )
+
+    fields_bytes = json.dumps(fields).encode()
+    fields_offset = _HEADER.size
+    index_offset = fields_offset + len(fields_bytes)
+    records_offset = index_offset + len(index_bytes)
+    heap_offset = records_offset + n_cards * record.itemsize
+    header = _HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        n_cards,
+        len(index),
+        fields_offset,
+        index_offset,
+        records_offset,
+        heap_offset,
+    )
+
+    with atomic_write(path, "wb") as f:
+        for section in (header, fields_bytes, index_bytes):
+            f.write(section)
+        for start in range(0, n_cards, RECORDS_CHUNK_SIZE):
+            rows = order[start : start + RECORDS_CHUNK_SIZE]
+            records = np.empty(len(rows), dtype=record)
+            for name, kind in fields:
+                if kind == "int":
+                    records[name] = values[name][rows] if name in values else NULL_INT
+                elif name in values:
+                    offsets, lengths = values[name]
+                    records[name]["offset"] = offsets[rows]
+                    records[name]["length"] = lengths[rows]
+                else:
+                    records[name]["offset"] = 0
+                    records[name]["length"] = NULL_LENGTH
+            f.write(records.tobytes())
+        for buffer in heap:
+            f.write(buffer)
+    return n_cards
+
+
+class CardFile(Mapping[str, List[Any]]):
+    """
+    Random access to a card file by name, through `mmap`: opening it only reads the header, and a lookup is a
+    binary search over the name index plus decoding the card's record.
+
+    As a mapping, maps each name to the cards with that name (one per printing, sorted by printing).
+    `get_card` returns a single one, and `resolve` finds names from what a user typed, through a
+    `CardNameIndex` loaded (or built) on first use.
+    """
+
+    def __init__(self, path: str = DEFAULT_CARD_FILE, cls: type = Card):
+        self.path = path
+        self.cls = cls
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.n_cards,
+            self.n_names,
+            fields_offset,
+            self._index_offset,
+            self._records_offset,
+            self._heap_offset,
+        ) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a card file")
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"{path} is a version {version} card file, only version {FORMAT_VERSION} is supported"
+            )
+
+        fields = json.loads(self._mmap[fields_offset : self._index_offset])
+        self.fields = [name for name, _ in fields]
+        self._kinds = [kind for _, kind in fields]
+        missing = {f.name for f in attrs.fields(cls)} - set(self.fields)
+        if missing:
+            raise ValueError(
+                f"{path} has no {sorted(missing)} fields for {cls.__name__}"
+            )
+        self._record = _record_struct(self._kinds)
+        self._name_index = None
+
+    @property
+    def name_index(self) -> "CardNameIndex":
+        """The index of the names in this file, saved next to it (see `CardNameIndex.for_card_file`)."""
+        if self._name_index is None:
+            from .names import CardNameIndex
+
+            self._name_index = CardNameIndex.for_card_file(self)
+        return self._name_index
+
+    def resolve(self, query: str, limit: int = 10) -> List["NameMatch"]:
+        """The names `query` most likely means (see `CardNameIndex.resolve`)."""
+        return self.name_index.resolve(query, limit=limit)
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self) -> "CardFile":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _string(self, offset: int, length: int) -> Optional[str]:
+        if length == NULL_LENGTH:
+            return None
+        start = self._heap_offset + offset
+        return self._mmap[start : start + length].decode()
+
+    def _index_entry(self, i: int) -> Tuple[int, int, int, int]:
+        return _INDEX_ENTRY.unpack_from(
+            self._mmap, self._index_offset + i * _INDEX_ENTRY.size
+        )
+
+    def _name(self, i: int) -> bytes:
+        offset, length, _, _ = self._index_entry(i)
+        start = self._heap_offset + offset
+        return self._mmap[start : start + length]
+
+    def _find(self, name: bytes) -> int:
+        """The position in the index of the first name >= `name`."""
+        lo, hi = 0, self.n_names
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name(mid) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _read(self, position: int):
+        unpacked = self._record.unpack_from(
+            self._mmap, self._records_offset + position * self._record.size
+        )
+        values = {}
+        i = 0
+        for name, kind in zip(self.fields, self._kinds):
+            if kind == "int":
+                value = unpacked[i]
+                values[name] = None if value == NULL_INT else value
+                i += 1
+            else:
+                value = self._string(unpacked[i], unpacked[i + 1])
+                if kind == "list" and value is not None:
+                    value = value.split(LIST_SEPARATOR) if value else []
+                values[name] = value
+                i += 2
+        return self.cls(**{f.name: values[f.name] for f in attrs.fields(self.cls)})
+
+    def _records(self, name: str) -> range:
+        encoded = name.encode()
+        i = self._find(encoded)
+        if i == self.n_names or self._name(i) != encoded:
+            return range(0)
+        _, _, first, count = self._index_entry(i)
+        return range(first, first + count)
+
+    def __getitem__(self, name: str) -> List[Any]:
+        records = self._records(name)
+        if not records:
+            raise KeyError(name)
+        return [self._read(position) for position in records]
+
+    def get_card(self, name: str, printing: Optional[str] = None) -> Optional[Any]:
+        """A card named `name` (of `printing`, if set), or None if there is none."""
+        for position in self._records(name):
+            card = self._read(position)
+            if printing is None or card.printing == printing:
+                return card
+        return None
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and bool(self._records(name))
+
+    def __len__(self) -> int:
+        return self.n_names
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self.n_names):
+            yield self._name(i).decode()
+
+    def iter_cards(self) -> Iterable[Any]:
+        """Every card in the file, in name order."""
+        for position in range(self.n_cards):
+            yield self._read(position)
+
+    def __repr__(self) -> str:
+        return f"CardFile({self.path!r}, num_cards={self.n_cards}, num_names={self.n_names})"
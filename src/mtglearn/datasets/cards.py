@@ -1,24 +1,59 @@
-from typing import List, Mapping, Optional
+from typing import Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import json
-from collections import defaultdict
 import random
 import re
 import os
-from functools import lru_cache
-from types import MappingProxyType
 import logging
+import time
 
-import attrs
 from attrs import define
 import cattrs
-from cattrs.gen import make_dict_unstructure_fn, make_dict_structure_fn, override
-import requests
+from cattrs.gen import make_dict_structure_fn
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pandas as pd
 from datasets.utils.file_utils import cached_path
-from datasets import Features, Value, Dataset, Sequence, load_from_disk
+from datasets.table import InMemoryTable
+from datasets import (
+    Features,
+    Value,
+    Dataset,
+    Sequence,
+    load_from_disk,
+)
 
 from ..config import MTGLEARN_CACHE_HOME
-from ..card import Card, CardStats, CardWithStats
-from .utils import type2features
+from ..card import (
+    Card,
+    CardStats,
+    CardWithStats,
+    CompactCard,
+    CompactCardWithStats,
+)
+from .utils import type2features, ColumnarBuilder
+from .mtgjson import iter_printings
+from .sequence import CardSequence
+from .report import LoadReport, file_size, files_size
+from .cardfile import CARD_FILE_NAME, write_card_file
+from .seventeenlands import (
+    DEFAULT_STATS_FORMATS,
+    DEFAULT_TTL,
+    fetch_all_stats,
+    stats_to_table,
+)
+from .cache import (
+    load_partitions,
+    partition_path,
+    read_manifest,
+    read_stats_info,
+    remove_stats_info,
+    write_manifest,
+    write_partition,
+    write_stats_info,
+)
 
 
 logger = logging.getLogger(__name__)
@@ -27,76 +62,317 @@ logger = logging.getLogger(__name__)
 RAW_DATA_URL = "https://mtgjson.com/api/v5/AllPrintings.json"
 CARDS_DATASET_CACHE = os.path.join(MTGLEARN_CACHE_HOME, "cards")
 CARD_STATS_DATASET_CACHE = os.path.join(MTGLEARN_CACHE_HOME, "card_stats")
+SEVENTEENLANDS_CACHE = os.path.join(MTGLEARN_CACHE_HOME, "seventeenlands")
 
 PRINTINGS_WITH_STATS = {"VOW"}
 BASIC_LANDS = {"Plains", "Mountain", "Swamp", "Island", "Forest"}
 
 
-@lru_cache(2 ** 8)
-def _get_seventeenlands_stats(
-    printing: str, stats_format: str = "PremierDraft"
-) -> Mapping[str, CardStats]:
-    logger.info(f"getting 17lands stats for {printing}...")
-    if printing not in PRINTINGS_WITH_STATS:
-        return None
-    endpoint = f"https://www.17lands.com/card_ratings/data?expansion={printing}&format={stats_format}"
-    response = requests.get(endpoint)
-    raw_seventeenlands_stats = response.json()
-    if not raw_seventeenlands_stats:
-        raise ValueError(f"17lands returned no stats for {printing} {stats_format}")
+def _join_cards_with_stats(
+    dataset: Dataset,
+    stats: Mapping[Tuple[str, str], Mapping[str, CardStats]],
+    how: str = "left",
+) -> Tuple[Dataset, List[str]]:
+    """
+    Join cards with the output of `fetch_all_stats` using an arrow hash join on (printing, front face name),
+    producing one row per card per stats format.
 
-    seventeenlands_stats = cattrs.structure(raw_seventeenlands_stats, List[CardStats])
-    # mapping proxy type is immutable, for cache purposes
-    return MappingProxyType({c.name: c for c in seventeenlands_stats})
+    With how="left", cards without stats are kept with empty stats; with how="inner" they are dropped.
+    Returns the joined dataset and the (sorted, unique) names of cards without stats.
+    """
+    if how not in ("left", "inner"):
+        raise ValueError(f"'how' must be 'left' or 'inner', not {how!r}")
 
+    cards = dataset.with_format("arrow")[:]
+    stats_table = stats_to_table(stats)
 
-def _join_card_with_stats(card):
+    # only join the keys (which can't be nested types) with row numbers, and then gather the actual columns.
     # seveenlands cards are keyed by their front side
-    seventeenlands_key = card["name"].split(" // ")[0]
-    stats = _get_seventeenlands_stats(card["printing"])[seventeenlands_key]
-    card.update(cattrs.unstructure(stats))
-    return card
+    front_face = pc.list_element(
+        pc.split_pattern(cards["name"], " // ", max_splits=1), 0
+    )
+    card_keys = pa.table(
+        {
+            "printing": cards["printing"],
+            "name": front_face,
+            "_row": pa.array(np.arange(cards.num_rows)),
+        }
+    )
+    stats_keys = pa.table(
+        {
+            "printing": stats_table["printing"],
+            "name": stats_table["name"],
+            "_stats_row": pa.array(np.arange(stats_table.num_rows)),
+        }
+    )
+    joined = card_keys.join(
+        stats_keys, keys=["printing", "name"], join_type="left outer"
+    )
 
+    unmatched = pc.is_null(joined["_stats_row"])
+    unmatched_names = sorted(
+        set(cards["name"].take(pc.filter(joined["_row"], unmatched)).to_pylist())
+    )
+    if unmatched_names:
+        logger.warning(
+            f"no 17lands stats for {len(unmatched_names)} cards: {unmatched_names}"
+        )
+    if how == "inner":
+        joined = joined.filter(pc.invert(unmatched))
+
+    # hash joins don't preserve order
+    joined = joined.sort_by([("_row", "ascending"), ("_stats_row", "ascending")])
+    cards = cards.take(joined["_row"])
+    stats_table = stats_table.take(joined["_stats_row"])
+
+    schema = type2features(CardWithStats).arrow_schema
+    joined = pa.Table.from_arrays(
+        [
+            cards[name] if name in cards.column_names else stats_table[name]
+            for name in schema.names
+        ],
+        schema=schema,
+    )
 
-def _process_raw_cards():
+    return Dataset(InMemoryTable(joined)), unmatched_names
+
+
+def _convert_printing(printing_name: str, raw_cards: List[dict]) -> pa.Table:
+    # raw mtgjson cards go straight into arrow columns (renamed according to field aliases),
+    # without going through intermediate Card objects
+    builder = ColumnarBuilder(Card)
+    batches = []
+    for raw_card in raw_cards:
+        raw_card["printing"] = printing_name
+        batch = builder.append(raw_card)
+        if batch is not None:
+            batches.append(batch)
+    batch = builder.flush()
+    if batch is not None:
+        batches.append(batch)
+    return pa.Table.from_batches(batches, schema=builder.schema)
+
+
+def _convert_raw_printing(printing_name: str, raw_printing: str) -> pa.Table:
+    return _convert_printing(printing_name, json.loads(raw_printing)["cards"])
+
+
+def _convert_printings(
+    printings: Iterable[Tuple[str, str]], num_proc: Optional[int] = None
+) -> Iterator[Tuple[str, pa.Table]]:
+    """
+    Convert each printing, given as its raw JSON text, to an arrow table, yielding (printing_name, table)
+    pairs in order, optionally sharded across `num_proc` processes.
+    """
+    if not num_proc or num_proc <= 1:
+        for printing_name, raw_printing in printings:
+            yield printing_name, _convert_raw_printing(printing_name, raw_printing)
+        return
+
+    with ProcessPoolExecutor(num_proc) as executor:
+        # only keep a bounded number of printings in flight, so memory stays bounded too.
+        # the workers decode the JSON as well, which is most of the work
+        pending = deque()
+        for printing_name, raw_printing in printings:
+            future = executor.submit(_convert_raw_printing, printing_name, raw_printing)
+            pending.append((printing_name, future))
+            if len(pending) >= 2 * num_proc:
+                printing_name, future = pending.popleft()
+                yield printing_name, future.result()
+        while pending:
+            printing_name, future = pending.popleft()
+            yield printing_name, future.result()
+
+
+def _process_raw_cards(
+    path: Optional[str] = None,
+    num_proc: Optional[int] = None,
+    force_download: bool = False,
+    report: Optional[LoadReport] = None,
+) -> Dataset:
+
+    if report is None:
+        report = LoadReport()
+
+    if path is None:
+        with report.stage("download") as stage:
+            started = int(time.time())
+            path = cached_path(
+                RAW_DATA_URL,
+                cache_dir=MTGLEARN_CACHE_HOME,
+                ignore_url_params=True,
+                use_etag=False,
+                force_download=force_download,
+            )
+            # a file that was already cached is older than this call
+            if os.path.getmtime(path) >= started:
+                stage.cache = "miss"
+                stage.bytes_written = file_size(path)
+            else:
+                stage.cache = "hit"
+
+    features = type2features(Card)
+
+    # the cache is partitioned by printing, along with a hash of each printing's raw data,
+    # so only new or changed printings need to be converted again
+    manifest = read_manifest(CARDS_DATASET_CACHE, features)
+    cached = manifest["printings"] if manifest is not None else {}
+    printings = {}
+
+    def changed_printings():
+        for printing_name, raw_printing, digest in iter_printings(
+            path, with_digests=True, raw=True
+        ):
+            cached_printing = cached.get(printing_name)
+            if (
+                cached_printing is not None
+                and cached_printing["hash"] == digest
+                and os.path.exists(partition_path(CARDS_DATASET_CACHE, printing_name))
+            ):
+                printings[printing_name] = cached_printing
+            else:
+                printings[printing_name] = {"hash": digest}
+                yield printing_name, raw_printing
+
+    with report.stage("convert") as stage:
+        n_converted = n_rows = n_bytes = 0
+        for printing_name, table in _convert_printings(changed_printings(), num_proc):
+            # stream one printing at a time to disk, so memory stays bounded by the largest printings
+            # rather than the size of AllPrintings.json
+            write_partition(CARDS_DATASET_CACHE, printing_name, table, features)
+            printings[printing_name]["num_rows"] = table.num_rows
+            n_converted += 1
+            n_rows += table.num_rows
+            n_bytes += file_size(partition_path(CARDS_DATASET_CACHE, printing_name))
+
+        logger.info(f"converted {n_converted} of {len(printings)} printings")
+
+        write_manifest(CARDS_DATASET_CACHE, features, printings)
+
+        # every printing is hashed, but a hit when none of them had to be converted
+        stage.cache = "miss" if n_converted else "hit"
+        stage.rows = n_rows
+        stage.bytes_read = file_size(path)
+        stage.bytes_written = n_bytes
+
+    dataset = load_partitions(CARDS_DATASET_CACHE, features)
+    # the files derived from the dataset are stale if a printing was converted, but also if one was removed
+    changed = n_converted > 0 or printings.keys() != cached.keys()
+
+    # a compact file of the same cards, to look them up by name without loading the dataset. Its name index
+    # is built on the first name lookup (see `CardFile.name_index`), not here
+    card_file = os.path.join(CARDS_DATASET_CACHE, CARD_FILE_NAME)
+    with report.stage("card_file") as stage:
+        if changed or not os.path.exists(card_file):
+            stage.cache = "miss"
+            stage.rows = write_card_file(card_file, dataset.with_format("arrow")[:])
+            stage.bytes_written = file_size(card_file)
+        else:
+            stage.cache = "hit"
 
-    # make a custom cattrs "structure" function that renames fields according to field aliases
-    rename = {}
+    return dataset
 
-    for field in attrs.fields(Card):
-        if "alias" in field.metadata:
-            rename[field.name] = override(rename=field.metadata["alias"])
 
-    fromdict = make_dict_structure_fn(Card, cattrs.Converter(), **rename)
+def _as_set(values: Union[str, Iterable[str]]) -> Set[str]:
+    return {values} if isinstance(values, str) else set(values)
 
-    todict = make_dict_unstructure_fn(Card, cattrs.Converter())
 
-    path = cached_path(
-        RAW_DATA_URL,
-        cache_dir=MTGLEARN_CACHE_HOME,
-        ignore_url_params=True,
-        use_etag=False,
-    )
+def _value_set(values: Union[str, Iterable[str]]) -> pa.Array:
+    return pa.array(sorted(_as_set(values)), pa.string())
+
+
+def _filter_cards(
+    dataset: Dataset,
+    printings: Optional[Iterable[str]] = None,
+    exclude_names: Optional[Iterable[str]] = None,
+    types: Optional[Iterable[str]] = None,
+    rarity: Optional[Iterable[str]] = None,
+) -> Dataset:
+    """
+    Filter cards with vectorized arrow compute kernels, in a single pass over the selected columns.
 
-    raw_dataset = defaultdict(list)
+    Keeps cards in any of `printings`, not named any of `exclude_names`, with any of `types`, and of any of
+    `rarity`. Unset filters are ignored. The result is an indices mapping over the (memory-mapped) dataset,
+    so no cache file is rewritten.
+    """
+    if printings is None and exclude_names is None and types is None and rarity is None:
+        return dataset
 
-    with open(path) as f:
-        raw_data = json.load(f)["data"]
+    table = dataset.with_format("arrow")[:]
+    mask = pa.array(np.ones(table.num_rows, dtype=bool))
+
+    if printings is not None:
+        mask = pc.and_(mask, pc.is_in(table["printing"], _value_set(printings)))
+    if exclude_names is not None:
+        excluded = pc.is_in(table["name"], _value_set(exclude_names))
+        mask = pc.and_(mask, pc.invert(excluded))
+    if rarity is not None:
+        mask = pc.and_(mask, pc.is_in(table["rarity"], _value_set(rarity)))
+    if types is not None:
+        # a card matches if any of its types match
+        card_types = table["types"].combine_chunks()
+        matching = pc.is_in(pc.list_flatten(card_types), _value_set(types))
+        matching_rows = pc.filter(pc.list_parent_indices(card_types), matching)
+        rows = pa.array(np.arange(table.num_rows))
+        mask = pc.and_(mask, pc.is_in(rows, matching_rows))
+
+    indices = np.flatnonzero(mask.fill_null(False).to_numpy(zero_copy_only=False))
+    return dataset.select(indices)
+
+
+def _load_cards_dataset(
+    printings: Optional[Iterable[str]] = None,
+    refresh_cards: bool = False,
+    num_proc: Optional[int] = None,
+    report: Optional[LoadReport] = None,
+) -> Dataset:
+    """Load cached cards, only reading the partitions of `printings` (if set), and process them if needed."""
+    features = type2features(Card)
+
+    if report is None:
+        report = LoadReport()
 
-    for printing_name, printing_data in raw_data.items():
-        for raw_card in printing_data["cards"]:
-            raw_card["printing"] = printing_name
-            card = fromdict(raw_card)
-            for k, v in todict(card).items():
-                raw_dataset[k].append(v)
+    if refresh_cards:
+        # re-download, but only re-process printings that have changed
+        _process_raw_cards(num_proc=num_proc, force_download=True, report=report)
+
+    if printings is not None:
+        printings = _as_set(printings)
+
+    def load(cache):
+        with report.stage("load_partitions") as stage:
+            dataset = load_partitions(CARDS_DATASET_CACHE, features, printings)
+            stage.cache = cache if dataset is not None else "miss"
+            if dataset is not None:
+                stage.rows = len(dataset)
+                stage.bytes_read = files_size(
+                    f["filename"] for f in dataset.cache_files
+                )
+        return dataset
 
-    dataset = Dataset.from_dict(raw_dataset, features=type2features(Card))
+    # try to load the Dataset object from cache
+    dataset = load("hit")
 
-    dataset.save_to_disk(CARDS_DATASET_CACHE)
+    # if None, download and process
+    if dataset is None:
+        _process_raw_cards(num_proc=num_proc, report=report)
+        dataset = load("miss")
 
     return dataset
 
 
+def _to_arrow_backed_pandas(dataset: Dataset) -> pd.DataFrame:
+    """
+    Convert a dataset to a dataframe whose columns are `pd.ArrowDtype`s wrapping the dataset's arrow buffers,
+    instead of copying them into numpy/object arrays.
+
+    For a memory-mapped dataset this is zero-copy (the data stays in the page cache, shared between
+    processes), except that filtered datasets gather their selected rows once.
+    """
+    table = dataset.with_format("arrow")[:]
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
 def _try_load(filename: str) -> Optional[Dataset]:
     if os.path.exists(filename):
         try:
@@ -115,6 +391,19 @@ def load_cards(
     with_stats=False,
     refresh_cards=False,
     refresh_stats=False,
+    num_proc=None,
+    stats_formats=DEFAULT_STATS_FORMATS,
+    stats_ttl=DEFAULT_TTL,
+    stats_join="left",
+    printings=None,
+    exclude_names=None,
+    types=None,
+    rarity=None,
+    zero_copy=False,
+    lazy=False,
+    compact=False,
+    cache_size=1024,
+    report=None,
 ):
 
     if sum([as_attrs, as_dataframe, as_dataset]) > 1:
@@ -126,49 +415,114 @@ def load_cards(
     if not (as_attrs or as_dataset):
         as_dataframe = True
 
-    # try to load the Dataset object from cache
-    if refresh_cards:
-        dataset = None
-    else:
-        dataset = _try_load(CARDS_DATASET_CACHE)
+    # a single format rather than an iterable of its characters
+    stats_formats = sorted(_as_set(stats_formats))
 
-    # if None, download and process
-    if dataset is None:
-        dataset = _process_raw_cards()
+    # each stage's timing, size, memory and cache use is recorded in the report
+    if report is None:
+        report = LoadReport()
+
+    # if with_stats, start from the (smaller) joined stats cache instead
+    if not with_stats:
+        dataset = _load_cards_dataset(printings, refresh_cards, num_proc, report)
 
     # if with_stats, grab from cache or load from 17lands
     if with_stats:
 
-        if refresh_stats:
+        if refresh_stats or refresh_cards:
             card_stats = None
         else:
-            card_stats = _try_load(CARD_STATS_DATASET_CACHE)
+            with report.stage("stats_cache") as stage:
+                card_stats = _try_load(CARD_STATS_DATASET_CACHE)
+                # the cache is only valid if it was built for the same formats and join
+                info = read_stats_info(CARD_STATS_DATASET_CACHE)
+                if (
+                    info is None
+                    or info["stats_join"] != stats_join
+                    or set(info["stats_formats"]) != set(stats_formats)
+                ):
+                    card_stats = None
+                stage.cache = "miss" if card_stats is None else "hit"
+                if card_stats is not None:
+                    stage.rows = len(card_stats)
+                    stage.bytes_read = file_size(CARD_STATS_DATASET_CACHE)
+                    stage.unmatched_names = info["unmatched_names"]
 
         # if None, download and process/join with dataset
         if card_stats is None:
-            # filter out cards that won't have stats
-            dataset = dataset.filter(lambda c: c["printing"] in PRINTINGS_WITH_STATS)
-            dataset = dataset.filter(lambda c: c["name"] not in BASIC_LANDS)
-            card_stats = dataset.map(
-                _join_card_with_stats, features=type2features(CardWithStats)
+            # prefetch all the stats concurrently before joining. cached responses are reused for
+            # `stats_ttl` seconds, and always revalidated if refresh_stats
+            with report.stage("fetch_stats") as stage:
+                stats = fetch_all_stats(
+                    PRINTINGS_WITH_STATS,
+                    stats_formats,
+                    cache_dir=SEVENTEENLANDS_CACHE,
+                    ttl=0 if refresh_stats else stats_ttl,
+                )
+                stage.rows = sum(len(s) for s in stats.values())
+            # only read cards that will have stats
+            dataset = _load_cards_dataset(
+                PRINTINGS_WITH_STATS, refresh_cards, num_proc, report
             )
-            # save to cache
-            card_stats.save_to_disk(CARD_STATS_DATASET_CACHE)
+            with report.stage("join_stats") as stage:
+                dataset = _filter_cards(dataset, exclude_names=BASIC_LANDS)
+                card_stats, unmatched_names = _join_cards_with_stats(
+                    dataset, stats, how=stats_join
+                )
+                stage.rows = len(card_stats)
+                stage.unmatched_names = unmatched_names
+            # save to cache, along with how it was built
+            with report.stage("save_stats") as stage:
+                remove_stats_info(CARD_STATS_DATASET_CACHE)
+                card_stats.save_to_disk(CARD_STATS_DATASET_CACHE)
+                write_stats_info(
+                    CARD_STATS_DATASET_CACHE,
+                    stats_formats,
+                    stats_join,
+                    unmatched_names,
+                )
+                stage.rows = len(card_stats)
+                stage.bytes_written = file_size(CARD_STATS_DATASET_CACHE)
 
         dataset = card_stats
 
+    with report.stage("filter") as stage:
+        dataset = _filter_cards(
+            dataset,
+            printings=printings,
+            exclude_names=exclude_names,
+            types=types,
+            rarity=rarity,
+        )
+        stage.rows = len(dataset)
+
     # if as_dataset, we are done
     if as_dataset:
-        return dataset
+        cards = dataset
 
     # convert dataset to pandas dataframe
-    if as_dataframe:
-        return dataset.to_pandas()
-
-    # convert to attrs objects. with_stats=False if we are at this point
-    if as_attrs:
-        if with_stats:
-            fromdict = make_dict_structure_fn(CardWithStats, cattrs.Converter())
-        else:
-            fromdict = make_dict_structure_fn(Card, cattrs.Converter())
-        return [fromdict(c) for c in dataset]
+    elif as_dataframe:
+        with report.stage("to_pandas") as stage:
+            if zero_copy:
+                cards = _to_arrow_backed_pandas(dataset)
+            else:
+                cards = dataset.to_pandas()
+            stage.rows = len(cards)
+
+    # convert to attrs objects
+    else:
+        with report.stage("to_attrs") as stage:
+            if with_stats:
+                cls = CompactCardWithStats if compact else CardWithStats
+            else:
+                cls = CompactCard if compact else Card
+            # build cards on access instead of all up front
+            if lazy:
+                cards = CardSequence(dataset, cls, cache_size=cache_size)
+            else:
+                fromdict = make_dict_structure_fn(cls, cattrs.Converter())
+                cards = [fromdict(c) for c in dataset]
+            stage.rows = len(cards)
+
+    logger.debug(f"load_cards stages:\n{report}")
+    return cards
@@ -0,0 +1,28 @@
+from typing import IO, Iterator
+from contextlib import contextmanager
+import os
+import uuid
+
+
+@contextmanager
+def atomic_path(path: str) -> Iterator[str]:
+    """
+    A temporary path to write a file to, moved onto `path` once it is written: a crash never leaves a
+    half-written file behind. The temporary path is unique, so concurrent writers of `path` (e.g. two
+    processes ingesting at once) don't write over each other's file, and the last one wins.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w") -> Iterator[IO]:
+    """Open a file to write to `path` through `atomic_path`."""
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, mode) as f:
+            yield f
@@ -0,0 +1,202 @@
+from typing import Iterator, Tuple
+import hashlib
+import json
+import re
+
+# how many characters to read from the raw file at a time
+CHUNK_SIZE = 1024 * 1024
+
+_WHITESPACE = re.compile(r"\s*")
+# what can follow a number or literal, so that it can't go on in the next chunk
+_SCALAR_END = re.compile(r"[\s,:\]}]")
+_DECODER = json.JSONDecoder()
+
+
+def _skip_pattern(depth: int) -> str:
+    """
+    A pattern skipping over strings, other characters and complete arrays/objects nested up to `depth` deep,
+    so the regex engine walks over most of a value in one match rather than a python loop.
+
+    Each alternative starts with a different character and a run of other characters is only ever followed
+    by a string or a bracket, so there is a single way to match any text, and failing to find the end of a
+    truncated value backtracks in linear time (without the possessive quantifiers of python 3.11+).
+    """
+    string = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+    other = r'[^"\[\]{}]*'
+    pattern = f"{other}(?:{string}{other})*"
+    for _ in range(depth):
+        pattern = f"{other}(?:(?:{string}|[\\[{{]{pattern}[\\]}}]){other})*"
+    return pattern
+
+
+# whatever can be skipped, then the opening or closing bracket that could not
+_SKIP = re.compile(_skip_pattern(5) + r"(?:([\[{])|([\]}]))?")
+
+
+def _container_end(buffer: str, pos: int):
+    """
+    The end of the array or object starting at `pos`, found by only tracking brackets outside of strings
+    (faster than decoding it), or None if it doesn't end within `buffer`.
+    """
+    # past the opening bracket, so the skipping stops at the closing one
+    depth = 1
+    pos += 1
+    while True:
+        match = _SKIP.match(buffer, pos)
+        pos = match.end()
+        if match.group(1):
+            depth += 1
+        elif match.group(2):
+            depth -= 1
+            if depth == 0:
+                return pos
+        else:
+            # the end of the buffer, or of what is in it of a string
+            return None
+
+
+class _ChunkedReader:
+    """
+    A minimal incremental JSON tokenizer over a text file.
+
+    Only the part of the file that hasn't been consumed yet is kept in memory, so walking the top-level
+    objects of a huge file only ever holds one value (e.g. one printing) at a time.
+    """
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read_more(self, size: int):
+        # drop whatever has already been consumed before growing the buffer
+        self.buffer = self.buffer[self.pos :]
+        self.pos = 0
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
+
+    def _skip_whitespace(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return
+            self._read_more(self.chunk_size)
+
+    def peek(self) -> str:
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise ValueError("unexpected end of JSON input")
+        return self.buffer[self.pos]
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                f"expected {char!r} but found {found!r} at offset {self.pos}"
+            )
+        self.pos += 1
+
+    def value(self, raw: bool = False):
+        """
+        Decode the next complete JSON value, reading more of the file until it fits in the buffer.
+
+        If `raw`, return a (value, raw_text) tuple instead.
+        """
+        self._skip_whitespace()
+        size = self.chunk_size
+        while True:
+            # strings, arrays and objects can't be decoded until they are complete, but a number or literal
+            # decodes from any prefix (e.g. `12.` of `12.5`), so only decode it once what follows is read
+            if (
+                self.eof
+                or self.buffer[self.pos] in '"[{'
+                or _SCALAR_END.search(self.buffer, self.pos)
+            ):
+                try:
+                    value, end = _DECODER.raw_decode(self.buffer, self.pos)
+                    start, self.pos = self.pos, end
+                    if raw:
+                        return value, self.buffer[start:end]
+                    return value
+                except json.JSONDecodeError:
+                    if self.eof:
+                        raise
+            # read geometrically more so that huge values are decoded in amortized linear time
+            self._read_more(size)
+            size *= 2
+
+    def raw_value(self) -> str:
+        """
+        The raw text of the next JSON value, without decoding it if it is an array or object (for whoever
+        uses it to decode it, possibly in another process).
+        """
+        if self.peek() not in "[{":
+            return self.value(raw=True)[1]
+        size = self.chunk_size
+        while True:
+            end = _container_end(self.buffer, self.pos)
+            if end is not None:
+                start, self.pos = self.pos, end
+                return self.buffer[start:end]
+            if self.eof:
+                raise ValueError("unexpected end of JSON input")
+            self._read_more(size)
+            size *= 2
+
+    def iter_object(self) -> Iterator[Tuple[str, "_ChunkedReader"]]:
+        """Walk the keys of a JSON object. The caller must consume each value before advancing."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key, self
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+
+def iter_printings(
+    path: str,
+    chunk_size: int = CHUNK_SIZE,
+    with_digests: bool = False,
+    raw: bool = False,
+) -> Iterator[Tuple]:
+    """
+    Incrementally yield (printing_name, printing_data) pairs from an mtgjson AllPrintings.json file.
+
+    Unlike `json.load(f)["data"]`, only a single printing is decoded and held in memory at a time.
+
+    If `with_digests`, yield (printing_name, printing_data, digest) triples instead, where `digest` is
+    a sha256 hash of the printing's raw JSON, used to tell which printings changed between downloads.
+
+    If `raw`, yield each printing's raw JSON text rather than decoding it, so that it can be decoded
+    elsewhere, e.g. in a worker process.
+    """
+    with open(path, encoding="utf-8") as f:
+        reader = _ChunkedReader(f, chunk_size=chunk_size)
+        for key, _ in reader.iter_object():
+            if key != "data":
+                # skip over `meta` and anything else at the top level
+                reader.value()
+                continue
+            for printing_name, _ in reader.iter_object():
+                if raw:
+                    printing_data = raw_text = reader.raw_value()
+                elif with_digests:
+                    printing_data, raw_text = reader.value(raw=True)
+                else:
+                    printing_data = reader.value()
+                if with_digests:
+                    digest = hashlib.sha256(raw_text.encode("utf-8")).hexdigest()
+                    yield printing_name, printing_data, digest
+                else:
+                    yield printing_name, printing_data
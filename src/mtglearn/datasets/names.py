@@ -0,0 +1,287 @@
+"""
+An index of card names, to resolve names as typed by users: exactly, case-insensitively, by the name of one of
+their faces (`Delver of Secrets` for `Delver of Secrets // Insectile Aberration`), by prefix, or fuzzily by
+trigram similarity.
+"""
+
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+from bisect import bisect_left, bisect_right
+import os
+import unicodedata
+
+from attrs import frozen
+import numpy as np
+
+from ..config import MTGLEARN_CACHE_HOME
+from .files import atomic_write
+
+if TYPE_CHECKING:
+    from .cardfile import CardFile
+
+FACE_SEPARATOR = " // "
+NAME_INDEX_VERSION = 2
+NAME_INDEX_FILE_NAME = "names.npz"
+# where `CardNameIndex.for_card_file` saves the index of the card file `load_cards` writes
+DEFAULT_NAME_INDEX = os.path.join(MTGLEARN_CACHE_HOME, "cards", NAME_INDEX_FILE_NAME)
+
+
+def fold(name: str) -> str:
+    """The key names are matched on: case-folded, without accents and with whitespace collapsed."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return " ".join(
+        "".join(c for c in decomposed if not unicodedata.combining(c)).split()
+    )
+
+
+def faces(name: str) -> List[str]:
+    """The names of the faces of a card, e.g. both halves of `Fire // Ice`."""
+    return name.split(FACE_SEPARATOR)
+
+
+def trigrams(key: str) -> List[str]:
+    """The distinct trigrams of a (folded) name, padded like postgres' pg_trgm so short words still have some."""
+    padded = f"  {key} "
+    return sorted({padded[i : i + 3] for i in range(len(padded) - 2)})
+
+
+@frozen
+class NameMatch:
+    name: str
+    # "exact", "casefold", "face", "prefix" or "fuzzy"
+    kind: str
+    # trigram similarity for fuzzy matches, 1.0 otherwise
+    score: float = 1.0
+
+
+def _file_stamp(path: str) -> List[int]:
+    """What tells a file apart from the one it replaced: its inode, size and modification time."""
+    stat = os.stat(path)
+    return [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+def _join(strings: List[str]) -> np.ndarray:
+    return np.frombuffer("\n".join(strings).encode(), dtype=np.uint8)
+
+
+def _split(array: np.ndarray) -> List[str]:
+    joined = array.tobytes().decode()
+    return joined.split("\n") if joined else []
+
+
+class CardNameIndex:
+    """
+    Resolves card names over all printings. Build one from names with `build`, `save` it and `load` it back:
+    the folded keys of the names and their faces and the trigram postings are stored, so loading is only
+    reading arrays (and splitting strings).
+
+    `for_card_file` loads, or builds, the index of the names of a card file.
+    """
+
+    def __init__(
+        self,
+        names: List[str],
+        keys: List[str],
+        key_ids: np.ndarray,
+        key_is_face: np.ndarray,
+        trigram_keys: List[str],
+        postings_offsets: np.ndarray,
+        postings: np.ndarray,
+        card_file_stamp: Optional[List[int]] = None,
+    ):
+        # sorted, so names are looked up by bisection
+        self.names = names
+        # the sorted folded keys of the names and of the faces of multi-faced names, with the name each is of
+        self._keys = keys
+        self._key_ids = key_ids
+        self._key_is_face = key_is_face
+        self._trigram_ids = {trigram: i for i, trigram in enumerate(trigram_keys)}
+        self._postings_offsets = postings_offsets
+        self._postings = postings
+        self._n_trigrams = np.bincount(postings, minlength=len(names))
+        # the card file the index was built from (see `for_card_file`)
+        self.card_file_stamp = card_file_stamp
+
+    @classmethod
+    def build(cls, names: Iterable[str]) -> "CardNameIndex":
+        """Index the distinct, non-empty `names`."""
+        names = sorted({name for name in names if name})
+        keys = []
+        postings_by_trigram: Dict[str, List[int]] = {}
+        for i, name in enumerate(names):
+            key = fold(name)
+            keys.append((key, i, False))
+            if FACE_SEPARATOR in name:
+                keys.extend((fold(face), i, True) for face in faces(name))
+            for trigram in trigrams(key):
+                postings_by_trigram.setdefault(trigram, []).append(i)
+        keys.sort()
+
+        trigram_keys = sorted(postings_by_trigram)
+        lengths = [len(postings_by_trigram[t]) for t in trigram_keys]
+        postings_offsets = np.zeros(len(trigram_keys) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=postings_offsets[1:])
+        postings = np.fromiter(
+            (i for t in trigram_keys for i in postings_by_trigram[t]),
+            dtype=np.int32,
+            count=int(postings_offsets[-1]),
+        )
+        return cls(
+            names,
+            [key for key, _, _ in keys],
+            np.fromiter((i for _, i, _ in keys), dtype=np.int32, count=len(keys)),
+            np.fromiter((f for _, _, f in keys), dtype=bool, count=len(keys)),
+            trigram_keys,
+            postings_offsets,
+            postings,
+        )
+
+    @classmethod
+    def for_card_file(
+        cls, card_file: "CardFile", path: Optional[str] = None
+    ) -> "CardNameIndex":
+        """
+        The index of the names in `card_file`, loaded from `path` (next to the card file by default) if it was
+        built from this very card file, or built from it and saved there otherwise, e.g. on first use or after
+        the card file was written again.
+        """
+        if path is None:
+            path = os.path.join(os.path.dirname(card_file.path), NAME_INDEX_FILE_NAME)
+        stamp = _file_stamp(card_file.path)
+        try:
+            index = cls.load(path)
+            if index.card_file_stamp == stamp:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        index = cls.build(card_file)
+        index.card_file_stamp = stamp
+        index.save(path)
+        return index
+
+    def save(self, path: str):
+        # `np.savez` appends .npz to names without it, so write through a file object
+        with atomic_write(path, "wb") as f:
+            np.savez(
+                f,
+                version=NAME_INDEX_VERSION,
+                names=_join(self.names),
+                keys=_join(self._keys),
+                key_ids=self._key_ids,
+                key_is_face=self._key_is_face,
+                trigrams=_join(list(self._trigram_ids)),
+                postings_offsets=self._postings_offsets,
+                postings=self._postings,
+                card_file_stamp=np.array(self.card_file_stamp or [], dtype=np.int64),
+            )
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_NAME_INDEX) -> "CardNameIndex":
+        with np.load(path) as arrays:
+            version = int(arrays["version"])
+            if version != NAME_INDEX_VERSION:
+                raise ValueError(
+                    f"{path} is a version {version} name index, only version {NAME_INDEX_VERSION} is supported"
+                )
+            return cls(
+                _split(arrays["names"]),
+                _split(arrays["keys"]),
+                arrays["key_ids"],
+                arrays["key_is_face"],
+                _split(arrays["trigrams"]),
+                arrays["postings_offsets"],
+                arrays["postings"],
+                arrays["card_file_stamp"].tolist() or None,
+            )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self.exact(name) is not None
+
+    def exact(self, name: str) -> Optional[str]:
+        i = bisect_left(self.names, name)
+        return name if i < len(self.names) and self.names[i] == name else None
+
+    def _key_matches(self, key: str, is_face: bool) -> List[str]:
+        ids = [
+            self._key_ids[i]
+            for i in range(bisect_left(self._keys, key), bisect_right(self._keys, key))
+            if self._key_is_face[i] == is_face
+        ]
+        return [self.names[i] for i in dict.fromkeys(ids)]
+
+    def casefold(self, name: str) -> List[str]:
+        """The names equal to `name` but for case, accents and whitespace."""
+        return self._key_matches(fold(name), is_face=False)
+
+    def face(self, name: str) -> List[str]:
+        """The names of the multi-faced cards with a face called `name` (but for case and accents)."""
+        return self._key_matches(fold(name), is_face=True)
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """Up to `limit` names (or names of a face) starting with `prefix`, in alphabetical order."""
+        key = fold(prefix)
+        matches = []
+        for position in range(bisect_left(self._keys, key), len(self._keys)):
+            if len(matches) == limit or not self._keys[position].startswith(key):
+                break
+            name = self.names[self._key_ids[position]]
+            if name not in matches:
+                matches.append(name)
+        return matches
+
+    def fuzzy(
+        self, query: str, limit: int = 10, threshold: float = 0.3
+    ) -> List[NameMatch]:
+        """
+        Up to `limit` names with a trigram similarity (shared trigrams over distinct trigrams of both, like
+        pg_trgm) of at least `threshold` with `query`, most similar first.
+        """
+        query_trigrams = trigrams(fold(query))
+        ids = [self._trigram_ids[t] for t in query_trigrams if t in self._trigram_ids]
+        if not ids:
+            return []
+        offsets = self._postings_offsets
+        postings = np.concatenate(
+            [self._postings[offsets[i] : offsets[i + 1]] for i in ids]
+        )
+        shared = np.bincount(postings, minlength=len(self.names))
+        # a similarity of `threshold` needs at least `threshold` of the query's trigrams, which rules out
+        # most names before computing any similarity
+        min_shared = max(1, int(np.ceil(threshold * len(query_trigrams))))
+        candidates = np.flatnonzero(shared >= min_shared)
+        n_shared = shared[candidates]
+        scores = n_shared / (
+            len(query_trigrams) + self._n_trigrams[candidates] - n_shared
+        )
+        keep = scores >= threshold
+        candidates, scores = candidates[keep], scores[keep]
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        # ties in alphabetical order (names are sorted, so by id)
+        order = np.lexsort((candidates, -scores))
+        return [
+            NameMatch(self.names[candidates[i]], "fuzzy", float(scores[i]))
+            for i in order
+        ]
+
+    def resolve(self, query: str, limit: int = 10) -> List[NameMatch]:
+        """
+        The names `query` most likely refers to: its exact match if any, otherwise its case-insensitive or
+        face matches, otherwise the names it is a prefix of, otherwise its fuzzy matches.
+        """
+        if self.exact(query) is not None:
+            return [NameMatch(query, "exact")]
+        for kind, names in (
+            ("casefold", self.casefold(query)),
+            ("face", self.face(query)),
+            ("prefix", self.prefix(query, limit)),
+        ):
+            if names:
+                return [NameMatch(name, kind) for name in names[:limit]]
+        return self.fuzzy(query, limit)
+
+    def __repr__(self) -> str:
+        return f"CardNameIndex(num_names={len(self)})"
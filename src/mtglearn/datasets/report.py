@@ -0,0 +1,143 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from contextlib import contextmanager, nullcontext
+import os
+import sys
+import time
+
+import attrs
+from attrs import define
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+def peak_rss() -> Optional[int]:
+    """The peak resident set size of this process so far, in bytes (None if unknown)."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def file_size(path: str) -> int:
+    """The size of a file, or the total size of the files in a directory, in bytes."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, filename))
+        for root, _, filenames in os.walk(path)
+        for filename in filenames
+    )
+
+
+def files_size(paths: Iterable[str]) -> int:
+    return sum(file_size(path) for path in paths)
+
+
+@define
+class Stage:
+    """
+    What one stage of loading cards did. Unknown or irrelevant measurements are None, and `cache` is "hit" or
+    "miss" for stages that can be served from a cache. Stages that load 17lands stats record the
+    `unmatched_names` of the cards without any.
+
+    `peak_rss` is the process' high-water mark at the end of the stage, so a stage that raises it is the one
+    that allocated the memory.
+    """
+
+    name: str
+    seconds: float = 0.0
+    rows: Optional[int] = None
+    bytes_read: Optional[int] = None
+    bytes_written: Optional[int] = None
+    peak_rss: Optional[int] = None
+    cache: Optional[str] = None
+    unmatched_names: Optional[List[str]] = None
+
+
+@define
+class LoadReport:
+    """
+    A per-stage timing report of `load_cards` (pass one as its `report`, and query it after).
+
+    Each stage is passed to `callbacks` as it finishes. If `tracer` is set (e.g. an OpenTelemetry tracer,
+    or anything with a `start_as_current_span(name)` context manager), each stage also runs in a
+    `load_cards.<stage>` span, with the stage's measurements as `mtglearn.*` span attributes.
+    """
+
+    callbacks: List[Callable[[Stage], None]] = attrs.Factory(list)
+    tracer: Any = None
+    stages: List[Stage] = attrs.Factory(list)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[Stage]:
+        """Time a stage, yielding its `Stage` for the code in it to fill in."""
+        stage = Stage(name)
+        if self.tracer is not None:
+            span_context = self.tracer.start_as_current_span(f"load_cards.{name}")
+        else:
+            span_context = nullcontext()
+        start = time.perf_counter()
+        with span_context as span:
+            try:
+                yield stage
+            finally:
+                stage.seconds = time.perf_counter() - start
+                stage.peak_rss = peak_rss()
+                self.stages.append(stage)
+                if span is not None:
+                    for key, value in attrs.asdict(stage).items():
+                        if value is not None:
+                            span.set_attribute(f"mtglearn.{key}", value)
+                for callback in self.callbacks:
+                    callback(stage)
+
+    def __getitem__(self, name: str) -> Stage:
+        """The (last) stage called `name`."""
+        for stage in reversed(self.stages):
+            if stage.name == name:
+                return stage
+        raise KeyError(name)
+
+    def __contains__(self, name: str) -> bool:
+        return any(stage.name == name for stage in self.stages)
+
+    @property
+    def seconds(self) -> float:
+        return sum(stage.seconds for stage in self.stages)
+
+    @property
+    def cache(self) -> Dict[str, str]:
+        """Whether each cacheable stage was a cache "hit" or "miss"."""
+        return {stage.name: stage.cache for stage in self.stages if stage.cache}
+
+    @property
+    def unmatched_names(self) -> Optional[List[str]]:
+        """The names of the cards without 17lands stats, if stats were loaded."""
+        for stage in reversed(self.stages):
+            if stage.unmatched_names is not None:
+                return stage.unmatched_names
+        return None
+
+    def to_dicts(self) -> List[dict]:
+        return [attrs.asdict(stage) for stage in self.stages]
+
+    def __str__(self) -> str:
+        lines = [
+            f"{'stage':<16}{'seconds':>10}{'rows':>10}{'read MB':>10}{'written MB':>12}"
+            f"{'peak RSS MB':>13}  cache"
+        ]
+
+        def mb(n):
+            return "" if n is None else f"{n / 2**20:.1f}"
+
+        for s in self.stages:
+            lines.append(
+                f"{s.name:<16}{s.seconds:>10.3f}{'' if s.rows is None else s.rows:>10}"
+                f"{mb(s.bytes_read):>10}{mb(s.bytes_written):>12}{mb(s.peak_rss):>13}  {s.cache or ''}"
+            )
+        lines.append(f"{'total':<16}{self.seconds:>10.3f}")
+        return "\n".join(lines)
@@ -0,0 +1,72 @@
+from typing import Iterator, Optional
+from collections import OrderedDict
+from collections.abc import Sequence
+
+import cattrs
+from cattrs.gen import make_dict_structure_fn
+from datasets import Dataset
+
+from ..card import Card
+
+
+class CardSequence(Sequence):
+    """
+    A read-only sequence of attrs cards (`Card` by default) backed by an arrow dataset.
+
+    Cards are only built when they are indexed or iterated over, so creating the sequence is instant
+    regardless of the size of the dataset. Up to `cache_size` recently indexed cards are kept in an
+    LRU cache (None or 0 disables it).
+    """
+
+    def __init__(
+        self,
+        dataset: Dataset,
+        cls: type = Card,
+        cache_size: Optional[int] = 1024,
+        batch_size: int = 1000,
+    ):
+        self.dataset = dataset
+        self.cls = cls
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._fromdict = make_dict_structure_fn(cls, cattrs.Converter())
+        self._cache = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+            return CardSequence(
+                self.dataset.select(indices),
+                self.cls,
+                cache_size=self.cache_size,
+                batch_size=self.batch_size,
+            )
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("card index out of range")
+
+        if index in self._cache:
+            self._cache.move_to_end(index)
+            return self._cache[index]
+
+        card = self._fromdict(self.dataset[index])
+        if self.cache_size:
+            self._cache[index] = card
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return card
+
+    def __iter__(self) -> Iterator:
+        # read in batches rather than row by row, and don't pollute the cache
+        for start in range(0, len(self), self.batch_size):
+            batch = self.dataset[start : start + self.batch_size]
+            for values in zip(*batch.values()):
+                yield self._fromdict(dict(zip(batch, values)))
+
+    def __repr__(self) -> str:
+        return f"CardSequence(cls={self.cls.__name__}, num_cards={len(self)})"
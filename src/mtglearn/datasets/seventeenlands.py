@@ -0,0 +1,209 @@
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+import json
+import logging
+import os
+import time
+
+import attrs
+import cattrs
+import pyarrow as pa
+
+from ..card import CardStats
+from .files import atomic_write
+from .utils import ColumnarBuilder
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+
+SEVENTEENLANDS_URL = "https://www.17lands.com/card_ratings/data"
+DEFAULT_STATS_FORMATS = ("PremierDraft",)
+# how long (in seconds) a cached 17lands response is used before revalidating it
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def make_session(
+    max_connections: int = 8, retries: int = 3, backoff_factor: float = 0.5
+) -> "requests.Session":
+    """
+    A `requests.Session` with a connection pool of `max_connections`, that retries failed requests
+    (including 429s and 5xxs) with exponential backoff.
+    """
+    # only imported when stats are actually fetched
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=max_connections,
+        pool_maxsize=max_connections,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _read_cached_response(filename: str) -> Optional[dict]:
+    if os.path.exists(filename):
+        try:
+            with open(filename) as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"could not read cached 17lands response {filename}: {e}")
+    return None
+
+
+def _write_cached_response(filename: str, cached: dict):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with atomic_write(filename) as f:
+        json.dump(cached, f)
+
+
+def _get_raw_stats(
+    session: "requests.Session",
+    printing: str,
+    stats_format: str,
+    url: str,
+    timeout: float,
+    cache_dir: Optional[str],
+    ttl: float,
+) -> list:
+    cached = None
+    if cache_dir is not None:
+        filename = os.path.join(cache_dir, f"{printing}-{stats_format}.json")
+        cached = _read_cached_response(filename)
+
+    if cached is not None and time.time() - cached["fetched_at"] < ttl:
+        logger.debug(f"using cached 17lands stats for {printing} {stats_format}")
+        return cached["data"]
+
+    # if we have a stale response, ask 17lands to only send the data if it changed
+    headers = {}
+    if cached is not None:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    logger.info(f"getting 17lands stats for {printing} {stats_format}...")
+    response = session.get(
+        url,
+        params={"expansion": printing, "format": stats_format},
+        headers=headers,
+        timeout=timeout,
+    )
+    response.raise_for_status()
+
+    if response.status_code == 304:
+        logger.debug(f"cached 17lands stats for {printing} {stats_format} are current")
+        data = cached["data"]
+    else:
+        data = response.json()
+
+    # don't cache empty responses, so we ask again next time
+    if cache_dir is not None and data:
+        cached = {
+            "fetched_at": time.time(),
+            "etag": response.headers.get("ETag", headers.get("If-None-Match")),
+            "last_modified": response.headers.get(
+                "Last-Modified", headers.get("If-Modified-Since")
+            ),
+            "data": data,
+        }
+        _write_cached_response(filename, cached)
+
+    return data
+
+
+def fetch_stats(
+    session: "requests.Session",
+    printing: str,
+    stats_format: str = "PremierDraft",
+    url: str = SEVENTEENLANDS_URL,
+    timeout: float = 30,
+    cache_dir: Optional[str] = None,
+    ttl: float = DEFAULT_TTL,
+) -> Mapping[str, CardStats]:
+    """
+    Fetch 17lands stats for a single printing and format, keyed by (front face) card name.
+
+    If `cache_dir` is set, raw responses are cached there. A cached response younger than `ttl` seconds is
+    used as is, and an older one is revalidated with a conditional request (ETag/Last-Modified).
+    """
+    raw_seventeenlands_stats = _get_raw_stats(
+        session, printing, stats_format, url, timeout, cache_dir, ttl
+    )
+    if not raw_seventeenlands_stats:
+        raise ValueError(f"17lands returned no stats for {printing} {stats_format}")
+
+    seventeenlands_stats = cattrs.structure(raw_seventeenlands_stats, List[CardStats])
+    # mapping proxy type is immutable, since these may be shared
+    return MappingProxyType(
+        {
+            c.name: attrs.evolve(c, stats_format=stats_format)
+            for c in seventeenlands_stats
+        }
+    )
+
+
+def fetch_all_stats(
+    printings: Iterable[str],
+    stats_formats: Iterable[str] = DEFAULT_STATS_FORMATS,
+    max_workers: int = 8,
+    url: str = SEVENTEENLANDS_URL,
+    timeout: float = 30,
+    retries: int = 3,
+    backoff_factor: float = 0.5,
+    cache_dir: Optional[str] = None,
+    ttl: float = DEFAULT_TTL,
+) -> Dict[Tuple[str, str], Mapping[str, CardStats]]:
+    """
+    Concurrently fetch 17lands stats for every (printing, stats_format) pair, with at most
+    `max_workers` requests in flight over a shared connection pool.
+
+    See `fetch_stats` for `cache_dir` and `ttl`. Returns a dict keyed by (printing, stats_format).
+    """
+    keys = [(p, f) for p in sorted(printings) for f in stats_formats]
+    with make_session(max_workers, retries, backoff_factor) as session:
+        with ThreadPoolExecutor(max_workers) as executor:
+            futures = {
+                key: executor.submit(
+                    fetch_stats, session, *key, url, timeout, cache_dir, ttl
+                )
+                for key in keys
+            }
+            return {key: future.result() for key, future in futures.items()}
+
+
+def stats_to_table(
+    stats: Mapping[Tuple[str, str], Mapping[str, CardStats]],
+) -> pa.Table:
+    """
+    Flatten the output of `fetch_all_stats` into an arrow table with the columns of `type2features(CardStats)`,
+    plus the `printing` each row's stats are for.
+    """
+    builder = ColumnarBuilder(CardStats)
+    batches = []
+    printings = []
+    for (printing, _), printing_stats in stats.items():
+        for card_stats in printing_stats.values():
+            printings.append(printing)
+            batch = builder.append(attrs.asdict(card_stats))
+            if batch is not None:
+                batches.append(batch)
+    batch = builder.flush()
+    if batch is not None:
+        batches.append(batch)
+    table = pa.Table.from_batches(batches, schema=builder.schema)
+    return table.append_column("printing", pa.array(printings, pa.string()))
@@ -1,6 +1,7 @@
-from typing import List, Optional, Set
+from typing import Any, List, Mapping, Optional, Set
 from datasets import Features, Value, Sequence
 import attrs
+import pyarrow as pa
 
 
 def type2features(cls) -> Features:
@@ -33,3 +34,56 @@ def type2features(cls) -> Features:
         return Features(**features)
 
     raise NotImplementedError(str(types))
+
+
+class ColumnarBuilder:
+    """
+    Accumulates raw records for an attrs class directly into preallocated columns, and flushes them as
+    `pyarrow.RecordBatch`es of (at most) `batch_size` rows, following the schema given by `type2features(cls)`.
+
+    Each field is read from a record by its `alias` metadata (e.g. mtgjson's `manaCost`) if it has one,
+    otherwise by its name. No intermediate attrs objects are created.
+    """
+
+    def __init__(self, cls, batch_size: int = 10_000):
+        fields = attrs.fields(cls)
+        self.features = type2features(cls)
+        self.schema = self.features.arrow_schema
+        self.batch_size = batch_size
+        self._keys = [field.metadata.get("alias", field.name) for field in fields]
+        self._columns = [[None] * batch_size for _ in fields]
+        self._n_rows = 0
+
+    def __len__(self) -> int:
+        return self._n_rows
+
+    def append(self, record: Mapping[str, Any]) -> Optional[pa.RecordBatch]:
+        """Append a record, returning a full RecordBatch whenever `batch_size` rows have accumulated."""
+        i = self._n_rows
+        for key, column in zip(self._keys, self._columns):
+            column[i] = record.get(key)
+        self._n_rows += 1
+        if self._n_rows == self.batch_size:
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[pa.RecordBatch]:
+        """Return whatever rows have accumulated as a RecordBatch (or None if empty) and reset the builder."""
+        if not self._n_rows:
+            return None
+        arrays = [
+            _to_arrow(column[: self._n_rows], field.type)
+            for column, field in zip(self._columns, self.schema)
+        ]
+        for column in self._columns:
+            column[: self._n_rows] = [None] * self._n_rows
+        self._n_rows = 0
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+def _to_arrow(values: List[Any], type: pa.DataType) -> pa.Array:
+    try:
+        return pa.array(values, type=type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # e.g. mtgjson stores `manaValue` as a float; truncate it like `int()` would
+        return pa.array(values).cast(type, safe=False)
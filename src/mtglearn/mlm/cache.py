@@ -0,0 +1,122 @@
+from typing import Any, Callable, Dict, Optional, Union
+from importlib import metadata
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from datasets import Dataset, DatasetDict, load_from_disk
+
+logger = logging.getLogger(__name__)
+
+
+TokenizedDatasets = Union[Dataset, DatasetDict]
+
+# packages whose upgrades can change what a tokenizer outputs for the same text
+TOKENIZATION_PACKAGES = ("tokenizers", "transformers")
+
+
+def package_versions(packages=TOKENIZATION_PACKAGES) -> Dict[str, Optional[str]]:
+    """The installed version of each of `packages`, None for those that aren't installed."""
+    versions = {}
+    for package in packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def dataset_fingerprint(datasets: TokenizedDatasets) -> str:
+    """
+    The fingerprint of a dataset, or of every split of a dataset dict. It changes whenever the data (or any
+    transform applied to it) does.
+    """
+    if isinstance(datasets, DatasetDict):
+        return json.dumps(
+            {
+                split: dataset._fingerprint
+                for split, dataset in sorted(datasets.items())
+            },
+            sort_keys=True,
+        )
+    return datasets._fingerprint
+
+
+def tokenization_cache_key(
+    tokenizer_name: str,
+    tokenizer_revision: Optional[str],
+    max_seq_length: int,
+    line_by_line: bool,
+    fingerprint: str,
+    **extra: Any,
+) -> str:
+    """
+    The content address of a tokenized dataset: a hash of everything that determines the tokenizer's output,
+    including the installed versions of the tokenization packages. `extra` can add any other
+    (json-serializable) options that affect it, e.g. padding.
+    """
+    key = {
+        "package_versions": package_versions(),
+        "tokenizer_name": tokenizer_name,
+        "tokenizer_revision": tokenizer_revision,
+        "max_seq_length": max_seq_length,
+        "line_by_line": line_by_line,
+        "fingerprint": fingerprint,
+        **extra,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def load_tokenized(cache_dir: str, key: str) -> Optional[TokenizedDatasets]:
+    """Load the tokenized datasets cached under `key`, or None if there are none."""
+    path = os.path.join(cache_dir, key)
+    if not os.path.isdir(path):
+        return None
+    try:
+        datasets = load_from_disk(path)
+    except Exception as e:
+        logger.error(f"could not load tokenized datasets from {path}: {e}")
+        return None
+    logger.info(f"using tokenized datasets cached at {path}")
+    return datasets
+
+
+def save_tokenized(cache_dir: str, key: str, datasets: TokenizedDatasets) -> str:
+    """Cache tokenized datasets under `key`, and return where they were saved."""
+    path = os.path.join(cache_dir, key)
+    # save to a temporary directory first, so a crash (or a concurrent run) never leaves a partial entry behind
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    datasets.save_to_disk(tmp_path)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # another run cached the same key first, and it has the same content
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    logger.info(f"cached tokenized datasets at {path}")
+    return path
+
+
+def cached_tokenize(
+    cache_dir: Optional[str],
+    key: str,
+    tokenize: Callable[[], TokenizedDatasets],
+    overwrite: bool = False,
+    save: bool = True,
+) -> TokenizedDatasets:
+    """
+    Return the tokenized datasets cached under `key` in `cache_dir`, or call `tokenize()` and cache its output.
+    Caching is disabled if `cache_dir` is None.
+
+    With `overwrite`, the cache isn't read (but is still written), and without `save` it isn't written, e.g.
+    in all but one process of a distributed run.
+    """
+    if cache_dir is None:
+        return tokenize()
+    datasets = None if overwrite else load_tokenized(cache_dir, key)
+    if datasets is None:
+        datasets = tokenize()
+        if save:
+            save_tokenized(cache_dir, key, datasets)
+    return datasets
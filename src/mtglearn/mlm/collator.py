@@ -0,0 +1,196 @@
+from typing import Any, List, Mapping, Optional
+import os
+
+import numpy as np
+
+# label of the tokens the loss ignores
+IGNORE_INDEX = -100
+
+
+def _worker_key() -> tuple:
+    """
+    What tells the dataloader worker this runs in apart: its id, and the seed torch gives it (different on
+    every epoch, as workers are started again, but derived from torch's seed). (0,) in the main process.
+    """
+    try:
+        from torch.utils.data import get_worker_info
+    except ImportError:
+        return (0,)
+    info = get_worker_info()
+    if info is None:
+        return (0,)
+    return (info.id, info.seed)
+
+
+def separator_ids(tokenizer, field_separator: str = "|", key_separator: str = ":"):
+    """
+    The token ids of the separators in serialized cards, tokenized in context: the field separator follows a
+    space (`... | ...`) and the key separator directly follows the key (`mana cost: ...`).
+    """
+    encodings = tokenizer(
+        [f" {field_separator}", key_separator], add_special_tokens=False
+    )
+    ids = []
+    for separator, separator_tokens in zip(
+        (field_separator, key_separator), encodings["input_ids"]
+    ):
+        if len(separator_tokens) != 1:
+            raise ValueError(
+                f"{separator!r} is not a single token in serialized cards: {separator_tokens}"
+            )
+        ids.append(separator_tokens[0])
+    return tuple(ids)
+
+
+class CardMLMCollator:
+    """
+    A masked language modeling data collator for serialized cards (`name: ... | mana cost: ... | ...`).
+
+    A drop-in replacement for `transformers.DataCollatorForLanguageModeling`: tokens are masked with
+    probability `mlm_probability`, and masked tokens are replaced by the mask token 80% of the time, a random
+    token 10% of the time and left as is otherwise. But batches are written into preallocated buffers, and
+    all the random draws of a batch are made at once rather than building tensors from python lists.
+
+    With `whole_field_probability`, each field's value (the tokens between a `key_separator` and the next
+    `field_separator`, e.g. the whole `{1}{G}` of `mana cost: {1}{G}`) is also entirely masked with that
+    probability, so the model has to predict it from the rest of the card. Separators are looked up as they
+    are tokenized within cards, e.g. `Ġ|` rather than `|` for byte-level BPE tokenizers like RoBERTa's.
+
+    Sequences are padded to the longest in the batch (rounded up to `pad_to_multiple_of`), or to `max_length`
+    if `pad_to_max_length`. Returns torch tensors, or numpy arrays if `return_tensors="np"`.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        mlm_probability: float = 0.15,
+        whole_field_probability: float = 0.0,
+        field_separator: str = "|",
+        key_separator: str = ":",
+        max_length: int = 512,
+        pad_to_max_length: bool = False,
+        pad_to_multiple_of: Optional[int] = None,
+        return_tensors: str = "pt",
+        seed: Optional[int] = None,
+    ):
+        self.tokenizer = tokenizer
+        self.mlm_probability = mlm_probability
+        self.whole_field_probability = whole_field_probability
+        self.field_separator_id, self.key_separator_id = separator_ids(
+            tokenizer, field_separator, key_separator
+        )
+        self.max_length = max_length
+        self.pad_to_max_length = pad_to_max_length
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.return_tensors = return_tensors
+        self.seed = seed
+        self.vocab_size = len(tokenizer)
+        self.special_ids = np.array(sorted(tokenizer.all_special_ids), dtype=np.int64)
+
+        self._input_ids = np.empty((0, max_length), dtype=np.int64)
+        self._special = np.empty((0, max_length), dtype=bool)
+        self._rng = None
+        self._pid = None
+
+    @property
+    def rng(self) -> np.random.Generator:
+        # dataloader workers are forked with a copy of the collator, so each process (told apart by its pid)
+        # needs its own stream, but one that is the same from run to run for the same seed
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._rng = np.random.default_rng(
+                np.random.SeedSequence(self.seed, spawn_key=_worker_key())
+            )
+        return self._rng
+
+    def _buffers(self, n_rows: int):
+        if len(self._input_ids) < n_rows:
+            self._input_ids = np.empty((n_rows, self.max_length), dtype=np.int64)
+            self._special = np.empty((n_rows, self.max_length), dtype=bool)
+        return self._input_ids[:n_rows], self._special[:n_rows]
+
+    def _padded_length(self, lengths: np.ndarray) -> int:
+        if self.pad_to_max_length:
+            return self.max_length
+        length = int(lengths.max(initial=1))
+        if self.pad_to_multiple_of:
+            length = -(-length // self.pad_to_multiple_of) * self.pad_to_multiple_of
+        return min(length, self.max_length)
+
+    def _pad(self, features: List[Mapping[str, Any]]):
+        """Pad the features into the buffers, returning views of them and a mask of the real tokens."""
+        lengths = np.fromiter(
+            (len(f["input_ids"]) for f in features), np.int64, len(features)
+        )
+        if lengths.max(initial=0) > self.max_length:
+            raise ValueError(f"sequences must be at most {self.max_length} tokens")
+        input_ids, special = self._buffers(len(features))
+        input_ids = input_ids[:, : self._padded_length(lengths)]
+        special = special[:, : input_ids.shape[1]]
+
+        is_token = np.arange(input_ids.shape[1]) < lengths[:, None]
+        input_ids.fill(self.tokenizer.pad_token_id)
+        input_ids[is_token] = np.concatenate(
+            [np.asarray(f["input_ids"], dtype=np.int64) for f in features]
+        )
+        if features and "special_tokens_mask" in features[0]:
+            special.fill(True)
+            special[is_token] = np.concatenate(
+                [np.asarray(f["special_tokens_mask"], dtype=bool) for f in features]
+            )
+        else:
+            special[:] = ~is_token | np.isin(input_ids, self.special_ids)
+        return input_ids, special, is_token
+
+    def field_values(self, input_ids: np.ndarray, special: np.ndarray) -> tuple:
+        """
+        The tokens that are part of a field's value, and the index of the field each token is in (within its
+        row), for a padded batch.
+        """
+        is_field_separator = input_ids == self.field_separator_id
+        is_key_separator = input_ids == self.key_separator_id
+        field_index = np.cumsum(is_field_separator, axis=1)
+        # the number of key separators since the start of the field
+        n_key_separators = np.cumsum(is_key_separator, axis=1)
+        n_key_separators -= np.maximum.accumulate(
+            np.where(is_field_separator, n_key_separators, 0), axis=1
+        )
+        is_value = (
+            (n_key_separators > 0)
+            & ~(is_key_separator & (n_key_separators == 1))
+            & ~is_field_separator
+            & ~special
+        )
+        return is_value, field_index
+
+    def __call__(self, features: List[Mapping[str, Any]]) -> dict:
+        input_ids, special, is_token = self._pad(features)
+        n_rows, length = input_ids.shape
+
+        draws = self.rng.random((3, n_rows, length))
+        masked = (draws[0] < self.mlm_probability) & ~special
+        if self.whole_field_probability:
+            is_value, field_index = self.field_values(input_ids, special)
+            field_draws = self.rng.random((n_rows, length + 1))
+            masked_fields = field_draws < self.whole_field_probability
+            masked |= is_value & np.take_along_axis(masked_fields, field_index, axis=1)
+
+        labels = np.where(masked, input_ids, IGNORE_INDEX)
+        # 80% of the masked tokens become the mask token, 10% a random token and 10% stay the same
+        replaced = masked & (draws[1] < 0.8)
+        randomized = masked & ~replaced & (draws[2] < 0.5)
+        masked_ids = np.where(replaced, self.tokenizer.mask_token_id, input_ids)
+        masked_ids[randomized] = self.rng.integers(
+            self.vocab_size, size=int(randomized.sum())
+        )
+
+        batch = {
+            "input_ids": masked_ids,
+            "attention_mask": is_token.astype(np.int64),
+            "labels": labels,
+        }
+        if self.return_tensors == "np":
+            return batch
+        import torch
+
+        return {k: torch.from_numpy(v) for k, v in batch.items()}
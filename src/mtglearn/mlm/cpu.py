@@ -0,0 +1,91 @@
+from typing import Optional, Tuple
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+# cpuinfo flags of the instruction sets that make bf16 matmuls faster than fp32 ones
+BF16_CPU_FLAGS = frozenset({"avx512_bf16", "amx_bf16"})
+# compilers torch inductor's CPU code generation can use
+CXX_COMPILERS = ("c++", "g++", "clang++")
+
+
+def cpu_flags(cpuinfo: str = "/proc/cpuinfo") -> frozenset:
+    """The feature flags of the CPU (empty if they can't be read, e.g. not on linux)."""
+    try:
+        with open(cpuinfo) as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return frozenset(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return frozenset()
+
+
+def cpu_supports_bf16(cpuinfo: str = "/proc/cpuinfo") -> bool:
+    """
+    Whether the CPU has native bf16 instructions. Without them bf16 autocast still works, but is usually
+    slower than fp32.
+    """
+    return bool(BF16_CPU_FLAGS & cpu_flags(cpuinfo))
+
+
+def physical_cpu_count(cpuinfo: str = "/proc/cpuinfo") -> int:
+    """
+    The number of physical cores this process can run on: hyperthreads share a core's matmul units, so more
+    intra-op threads than cores only adds contention. Falls back to the number of logical CPUs if cpuinfo
+    has no core ids (e.g. not on linux, or some VMs).
+    """
+    logical = (
+        len(os.sched_getaffinity(0))
+        if hasattr(os, "sched_getaffinity")
+        else os.cpu_count() or 1
+    )
+    cores = set()
+    physical_id = None
+    try:
+        with open(cpuinfo) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    cores.add((physical_id, value.strip()))
+    except OSError:
+        pass
+    return min(len(cores), logical) if cores else logical
+
+
+def torch_compile_backend() -> str:
+    """
+    The `torch.compile` backend to train with: inductor, unless there is no C++ compiler for it to build its
+    CPU kernels with (as in slim images), then aot_eager, which still traces the graph but runs it eagerly.
+    """
+    if os.environ.get("CXX") or any(shutil.which(cxx) for cxx in CXX_COMPILERS):
+        return "inductor"
+    logger.warning("no C++ compiler found, compiling with the aot_eager backend")
+    return "aot_eager"
+
+
+def set_cpu_threads(
+    intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Set the number of threads torch uses within an op (e.g. a matmul) and to run independent ops in
+    parallel, leaving torch's defaults for those that are None. Returns the resulting (intra-op, inter-op)
+    numbers of threads.
+
+    The inter-op threads can only be set before torch runs any parallel work.
+    """
+    import torch
+
+    if intra_op_threads:
+        torch.set_num_threads(intra_op_threads)
+    if inter_op_threads:
+        try:
+            torch.set_num_interop_threads(inter_op_threads)
+        except RuntimeError as e:
+            logger.warning(f"could not set the number of inter-op threads: {e}")
+    return torch.get_num_threads(), torch.get_num_interop_threads()
@@ -0,0 +1,110 @@
+from typing import Dict, Iterator, Optional
+import logging
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from datasets import Dataset
+from datasets.table import InMemoryTable
+
+logger = logging.getLogger(__name__)
+
+
+def _blocks(values: pa.Array, max_seq_length: int, n_blocks: int) -> pa.ListArray:
+    offsets = pa.array(np.arange(n_blocks + 1) * max_seq_length, pa.int32())
+    return pa.ListArray.from_arrays(offsets, values.slice(0, n_blocks * max_seq_length))
+
+
+def _flat_values(column) -> pa.Array:
+    values = pc.list_flatten(column)
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    return values
+
+
+def group_texts(batch: pa.Table, max_seq_length: int) -> pa.Table:
+    """
+    Concatenate all the sequences of every (list) column of `batch` and split them into blocks of
+    `max_seq_length`, dropping the remainder. The arrow equivalent of the `group_texts` of the
+    transformers MLM example, without any per-token python object: the flat values buffer of each column
+    is sliced, and the blocks are just new offsets over it.
+
+    For use with `Dataset.with_format("arrow").map(..., batched=True)`. See `TextGrouper` to carry the
+    remainder over to the next batch instead.
+    """
+    columns = {}
+    for name in batch.column_names:
+        values = _flat_values(batch[name])
+        columns[name] = _blocks(values, max_seq_length, len(values) // max_seq_length)
+    return pa.table(columns)
+
+
+class TextGrouper:
+    """
+    `group_texts` over a stream of batches, where the tokens that don't fill a block are carried over to the
+    next batch rather than dropped. `flush` returns what is left at the end, as a last shorter block.
+    """
+
+    def __init__(self, max_seq_length: int):
+        self.max_seq_length = max_seq_length
+        self.remainders: Dict[str, pa.Array] = {}
+
+    def __call__(self, batch: pa.Table) -> pa.Table:
+        columns = {}
+        for name in batch.column_names:
+            values = _flat_values(batch[name])
+            if name in self.remainders:
+                values = pa.concat_arrays([self.remainders[name], values])
+            n_blocks = len(values) // self.max_seq_length
+            columns[name] = _blocks(values, self.max_seq_length, n_blocks)
+            self.remainders[name] = values.slice(n_blocks * self.max_seq_length)
+        return pa.table(columns)
+
+    def flush(self) -> Optional[pa.Table]:
+        """The remaining tokens as a single block, or None if there are none."""
+        remainders, self.remainders = self.remainders, {}
+        if not remainders or not len(next(iter(remainders.values()))):
+            return None
+        return pa.table(
+            {
+                name: pa.ListArray.from_arrays(
+                    pa.array([0, len(values)], pa.int32()), values
+                )
+                for name, values in remainders.items()
+            }
+        )
+
+
+def iter_grouped(
+    dataset: Dataset,
+    max_seq_length: int,
+    batch_size: int = 1000,
+    drop_last: bool = False,
+) -> Iterator[pa.Table]:
+    """Stream a tokenized dataset through a `TextGrouper`, yielding tables of blocks."""
+    grouper = TextGrouper(max_seq_length)
+    for batch in dataset.with_format("arrow").iter(batch_size):
+        blocks = grouper(batch)
+        if len(blocks):
+            yield blocks
+    last = grouper.flush()
+    if last is not None and not drop_last:
+        yield last
+
+
+def group_dataset(
+    dataset: Dataset,
+    max_seq_length: int,
+    batch_size: int = 1000,
+    drop_last: bool = False,
+) -> Dataset:
+    """
+    Group a tokenized dataset's texts into blocks of `max_seq_length` with `TextGrouper`, so only the tokens
+    at the very end of the dataset can be left over. They make up a last shorter block, unless `drop_last`.
+    """
+    tables = list(iter_grouped(dataset, max_seq_length, batch_size, drop_last))
+    if not tables:
+        return Dataset(InMemoryTable(group_texts(dataset.with_format("arrow")[:0], 1)))
+    table = pa.concat_tables(tables)
+    logger.debug(f"grouped {len(dataset)} texts into {len(table)} blocks")
+    return Dataset(InMemoryTable(table))
@@ -0,0 +1,174 @@
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+from bisect import bisect_left, insort
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from datasets import Dataset
+from datasets.table import InMemoryTable
+
+PACKED_COLUMNS = ("input_ids", "special_tokens_mask")
+
+# model types whose positions count from 0, and those (from RoBERTa) whose positions start after the padding
+# index, since the position of padding is the padding index (and its embedding never trained)
+ZERO_BASED_POSITION_MODELS = ("bert", "albert", "electra", "megatron-bert")
+PADDING_OFFSET_POSITION_MODELS = (
+    "roberta",
+    "roberta-prelayernorm",
+    "xlm-roberta",
+    "xlm-roberta-xl",
+    "camembert",
+    "data2vec-text",
+    "longformer",
+    "xmod",
+)
+
+
+def pack_lengths(lengths: Sequence[int], max_seq_length: int) -> List[List[int]]:
+    """
+    Bin-pack sequences of the given `lengths` into as few bins of `max_seq_length` as possible (best fit
+    decreasing), and return the indices of the sequences in each bin.
+
+    Every sequence ends up in exactly one bin, so no data is dropped.
+    """
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if lengths.max(initial=0) > max_seq_length:
+        raise ValueError(f"sequences must be at most {max_seq_length} tokens")
+
+    bins: List[List[int]] = []
+    # the open bins by their remaining capacity, and the sorted capacities that have open bins
+    by_remaining: Dict[int, List[int]] = {}
+    capacities: List[int] = []
+    for index in np.argsort(-lengths, kind="stable").tolist():
+        length = int(lengths[index])
+        # the fullest open bin the sequence fits in
+        i = bisect_left(capacities, length)
+        if i < len(capacities):
+            remaining = capacities[i]
+            b = by_remaining[remaining].pop()
+            if not by_remaining[remaining]:
+                del by_remaining[remaining]
+                capacities.pop(i)
+        else:
+            remaining = max_seq_length
+            b = len(bins)
+            bins.append([])
+        bins[b].append(index)
+        remaining -= length
+        if remaining not in by_remaining:
+            by_remaining[remaining] = []
+            insort(capacities, remaining)
+        by_remaining[remaining].append(b)
+    return bins
+
+
+def pack_dataset(
+    dataset: Dataset, max_seq_length: int, columns: Sequence[str] = PACKED_COLUMNS
+) -> Dataset:
+    """
+    Pack the whole tokenized sequences of a dataset (each with its own special tokens, as the tokenizer adds
+    them) into rows of at most `max_seq_length` tokens, with `pack_lengths`.
+
+    Besides the packed `columns`, rows have a `length` and `sequence_ids`: the index within the row of the
+    sequence each token comes from, for block-diagonal attention masks (see `PackedCollator`).
+    """
+    table = dataset.with_format("arrow")[:]
+    lengths = pc.list_value_length(table[columns[0]]).to_numpy(zero_copy_only=False)
+    bins = pack_lengths(lengths, max_seq_length)
+
+    bin_sizes = np.fromiter(map(len, bins), np.int64, len(bins))
+    order = np.fromiter((i for b in bins for i in b), np.int64, len(lengths))
+    bin_starts = np.cumsum(bin_sizes) - bin_sizes
+    packed_lengths = (
+        np.add.reduceat(lengths[order], bin_starts) if len(bins) else bin_sizes
+    )
+    offsets = pa.array(np.concatenate([[0], np.cumsum(packed_lengths)]), pa.int32())
+
+    # tokens of the sequences in bin order are the tokens of the packed rows
+    table = table.select(list(columns)).take(pa.array(order))
+    packed = {
+        column: pa.ListArray.from_arrays(
+            offsets, pc.list_flatten(table[column]).combine_chunks()
+        )
+        for column in columns
+    }
+    positions = np.arange(len(order)) - np.repeat(bin_starts, bin_sizes)
+    packed["sequence_ids"] = pa.ListArray.from_arrays(
+        offsets, pa.array(np.repeat(positions, lengths[order]), pa.int16())
+    )
+    packed["length"] = pa.array(packed_lengths, pa.int32())
+    return Dataset(InMemoryTable(pa.table(packed)))
+
+
+def block_diagonal_attention_mask(sequence_ids: np.ndarray) -> np.ndarray:
+    """
+    Attention masks of shape (batch, length, length) from padded `sequence_ids` of shape (batch, length),
+    so that tokens only attend to tokens of the same sequence. Padding (-1) only attends to padding.
+    """
+    return sequence_ids[:, :, None] == sequence_ids[:, None, :]
+
+
+def position_offset(config) -> Optional[int]:
+    """
+    The first position id of a sequence for models with the `transformers` config `config`: 0 for BERT-like
+    models, and the padding index + 1 for RoBERTa-like ones. None for models whose convention isn't known.
+    """
+    if config.model_type in ZERO_BASED_POSITION_MODELS:
+        return 0
+    if config.model_type in PADDING_OFFSET_POSITION_MODELS:
+        return config.pad_token_id + 1
+    return None
+
+
+def packed_position_ids(sequence_ids: np.ndarray, offset: int = 0) -> np.ndarray:
+    """
+    Position ids that restart at `offset` at the start of each packed sequence (and of the padding). See
+    `position_offset` for the offset a model expects.
+    """
+    n_rows, length = sequence_ids.shape
+    positions = np.broadcast_to(np.arange(length), (n_rows, length))
+    starts = np.ones(sequence_ids.shape, dtype=bool)
+    starts[:, 1:] = sequence_ids[:, 1:] != sequence_ids[:, :-1]
+    # the position of the most recent sequence start, for each token
+    last_start = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    return positions - last_start + offset
+
+
+class PackedCollator:
+    """
+    Wraps an MLM data collator (e.g. `transformers.DataCollatorForLanguageModeling`) for packed rows: the
+    wrapped collator pads and masks the packed columns, and this adds block-diagonal `attention_mask`s and
+    per-sequence `position_ids`, so packed cards don't attend to each other.
+
+    Position ids start at `position_offset` (see `position_offset(config)`), and aren't added at all if it
+    is None, leaving the model to its own positions.
+
+    Rows need their `sequence_ids`, so the trainer must not drop unused columns.
+    """
+
+    def __init__(
+        self,
+        collator: Callable,
+        columns: Sequence[str] = PACKED_COLUMNS,
+        position_offset: Optional[int] = 0,
+    ):
+        self.collator = collator
+        self.columns = tuple(columns)
+        self.position_offset = position_offset
+
+    def __call__(self, features: List[Mapping[str, Any]]) -> dict:
+        import torch
+
+        batch = self.collator([{c: f[c] for c in self.columns} for f in features])
+        length = batch["input_ids"].shape[1]
+        sequence_ids = np.full((len(features), length), -1, dtype=np.int64)
+        for row, f in zip(sequence_ids, features):
+            row[: len(f["sequence_ids"])] = f["sequence_ids"]
+        batch["attention_mask"] = torch.as_tensor(
+            block_diagonal_attention_mask(sequence_ids), dtype=torch.long
+        )
+        if self.position_offset is not None:
+            batch["position_ids"] = torch.as_tensor(
+                packed_position_ids(sequence_ids, self.position_offset)
+            )
+        return batch
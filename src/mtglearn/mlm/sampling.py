@@ -0,0 +1,173 @@
+from typing import Iterator, List, Optional, Sequence
+import numpy as np
+import pyarrow.compute as pc
+
+BATCHING_STRATEGIES = ("random", "length_grouped", "token_budget")
+
+
+def sequence_lengths(dataset) -> np.ndarray:
+    """
+    The length of each row of a `datasets.Dataset` of tokenized sequences, from its `length` column if it has
+    one, or else from the offsets of its `input_ids` lists, read from arrow without a python object per row.
+    """
+    if "length" in dataset.column_names:
+        lengths = dataset.data.column("length")
+    else:
+        lengths = pc.list_value_length(dataset.data.column("input_ids"))
+    if dataset._indices is not None:
+        # the rows of e.g. `select`, gathered from the lengths alone rather than every column
+        lengths = lengths.take(dataset._indices.column(0))
+    return lengths.to_numpy().astype(np.int64)
+
+
+def padding_efficiency(
+    lengths: Sequence[int], batches: Sequence[Sequence[int]]
+) -> float:
+    """
+    The fraction of the tokens in padded `batches` (lists of indices into `lengths`) that aren't padding,
+    when each batch is padded to its longest sequence.
+    """
+    lengths = np.asarray(lengths)
+    real = padded = 0
+    for batch in batches:
+        batch_lengths = lengths[np.asarray(batch, dtype=np.int64)]
+        real += int(batch_lengths.sum())
+        padded += int(batch_lengths.max(initial=0)) * len(batch_lengths)
+    return real / padded if padded else 1.0
+
+
+def random_batches(n: int, batch_size: int, seed: int) -> List[np.ndarray]:
+    """Shuffle `n` rows into batches of `batch_size` rows (the last one may be smaller)."""
+    order = np.random.default_rng(seed).permutation(n)
+    return np.array_split(order, range(batch_size, n, batch_size))
+
+
+def length_grouped_batches(
+    lengths: Sequence[int], batch_size: int, seed: int, mega_batch_mult: int = 50
+) -> List[np.ndarray]:
+    """
+    Batches of `batch_size` rows of similar lengths: rows are shuffled, split into mega-batches of
+    `mega_batch_mult` batches that are sorted by length and split into batches, and the batches are shuffled.
+
+    Batch composition stays random from one seed to the next, only the padding within a batch is reduced.
+    """
+    lengths = np.asarray(lengths)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(lengths))
+    mega_batch_size = batch_size * mega_batch_mult
+    batches = []
+    for start in range(0, len(order), mega_batch_size):
+        mega_batch = order[start : start + mega_batch_size]
+        mega_batch = mega_batch[np.argsort(-lengths[mega_batch], kind="stable")]
+        batches.extend(
+            np.array_split(mega_batch, range(batch_size, len(mega_batch), batch_size))
+        )
+    return [batches[i] for i in rng.permutation(len(batches))]
+
+
+def token_budget_batches(
+    lengths: Sequence[int],
+    max_tokens: int,
+    seed: int,
+    max_batch_size: Optional[int] = None,
+) -> List[np.ndarray]:
+    """
+    Batches of rows of similar lengths, each capped at `max_tokens` tokens after padding (and at
+    `max_batch_size` rows), rather than at a fixed number of rows. Short cards make for large batches and
+    long cards for small ones. Rows of equal length are shuffled, and so are the batches.
+
+    A row longer than `max_tokens` gets a batch of its own.
+    """
+    lengths = np.asarray(lengths)
+    rng = np.random.default_rng(seed)
+    # shuffle before a stable sort, so ties are broken at random
+    order = rng.permutation(len(lengths))
+    order = order[np.argsort(lengths[order], kind="stable")]
+
+    batches = []
+    start = 0
+    for end, index in enumerate(order):
+        # the rows are sorted, so the current row is the longest in its batch
+        n_rows = end - start + 1
+        if end > start and (
+            lengths[index] * n_rows > max_tokens
+            or (max_batch_size is not None and n_rows > max_batch_size)
+        ):
+            batches.append(order[start:end])
+            start = end
+    if start < len(order):
+        batches.append(order[start:])
+    return [batches[i] for i in rng.permutation(len(batches))]
+
+
+class BatchSampler:
+    """
+    A batch sampler (to pass as a `torch.utils.data.DataLoader`'s `batch_sampler`) for one of the
+    `BATCHING_STRATEGIES`. Every iteration is a new epoch, with batches drawn from `seed` + the epoch.
+
+    `length_grouped` and `random` batches have `batch_size` rows, `token_budget` batches at most `max_tokens`
+    tokens (and at most `batch_size` rows, if it is set).
+    """
+
+    def __init__(
+        self,
+        lengths: Sequence[int],
+        strategy: str = "random",
+        batch_size: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        seed: int = 0,
+    ):
+        if strategy not in BATCHING_STRATEGIES:
+            raise ValueError(
+                f"batching strategy must be one of {BATCHING_STRATEGIES}, got {strategy!r}"
+            )
+        if strategy == "token_budget" and max_tokens is None:
+            raise ValueError("token_budget batching requires max_tokens")
+        if strategy != "token_budget" and batch_size is None:
+            raise ValueError(f"{strategy} batching requires batch_size")
+        self.lengths = np.asarray(lengths)
+        self.strategy = strategy
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.seed = seed
+        self.epoch = 0
+        self._num_batches = None
+
+    def batches(self, epoch: Optional[int] = None) -> List[np.ndarray]:
+        seed = self.seed + (self.epoch if epoch is None else epoch)
+        if self.strategy == "length_grouped":
+            return length_grouped_batches(self.lengths, self.batch_size, seed)
+        if self.strategy == "token_budget":
+            return token_budget_batches(
+                self.lengths, self.max_tokens, seed, self.batch_size
+            )
+        return random_batches(len(self.lengths), self.batch_size, seed)
+
+    def __iter__(self) -> Iterator[List[int]]:
+        batches = self.batches()
+        self.epoch += 1
+        for batch in batches:
+            yield batch.tolist()
+
+    def __len__(self) -> int:
+        # the number of batches doesn't depend on the seed
+        if self._num_batches is None:
+            self._num_batches = len(self.batches(epoch=0))
+        return self._num_batches
+
+    def padding_metrics(self, batch_size: Optional[int] = None) -> dict:
+        """
+        The padding efficiency of this sampler's batches, and of random batches of `batch_size` rows
+        (this sampler's `batch_size` by default) for comparison.
+        """
+        batch_size = batch_size or self.batch_size
+        metrics = {
+            "padding_efficiency": padding_efficiency(
+                self.lengths, self.batches(epoch=0)
+            )
+        }
+        if batch_size is not None:
+            metrics["random_padding_efficiency"] = padding_efficiency(
+                self.lengths, random_batches(len(self.lengths), batch_size, self.seed)
+            )
+        return metrics
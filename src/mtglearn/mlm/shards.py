@@ -0,0 +1,188 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+import json
+import os
+import logging
+
+import numpy as np
+from datasets import (
+    Dataset,
+    Features,
+    Sequence as SequenceFeature,
+    Value,
+    concatenate_datasets,
+)
+from datasets.arrow_writer import ArrowWriter
+
+logger = logging.getLogger(__name__)
+
+
+SHARDS_MANIFEST = "shards.json"
+DEFAULT_BUCKETS = (16, 32, 64, 128, 256, 512)
+
+SHARD_FEATURES = Features(
+    {
+        "input_ids": SequenceFeature(Value("int32")),
+        "special_tokens_mask": SequenceFeature(Value("int8")),
+        "length": Value("int32"),
+    }
+)
+
+
+def is_shards(path: str) -> bool:
+    return os.path.exists(os.path.join(path, SHARDS_MANIFEST))
+
+
+class ShardWriter:
+    """
+    Writes tokenized sequences into one (memory-mappable) arrow file per length bucket, where a sequence
+    goes into the smallest bucket at least as long as it is.
+
+    Buckets longer than `max_seq_length` are dropped, and `max_seq_length` is always the last bucket.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_seq_length: int,
+        buckets: Sequence[int] = DEFAULT_BUCKETS,
+        metadata: Optional[Mapping[str, Any]] = None,
+    ):
+        self.path = path
+        self.buckets = sorted({b for b in buckets if b < max_seq_length}) + [
+            max_seq_length
+        ]
+        self.max_seq_length = max_seq_length
+        self.metadata = dict(metadata or {})
+        self._writers: Dict[int, ArrowWriter] = {}
+        self._num_rows = {bucket: 0 for bucket in self.buckets}
+        os.makedirs(path, exist_ok=True)
+
+    def _filename(self, bucket: int) -> str:
+        return f"bucket-{bucket:05d}.arrow"
+
+    def write(self, encodings: Mapping[str, List[List[int]]]):
+        """Write a batch of tokenizer output (`input_ids` and `special_tokens_mask`)."""
+        lengths = np.fromiter(
+            (len(ids) for ids in encodings["input_ids"]),
+            np.int64,
+            len(encodings["input_ids"]),
+        )
+        if lengths.max(initial=0) > self.max_seq_length:
+            raise ValueError(f"sequences must be at most {self.max_seq_length} tokens")
+        bucket_indices = np.searchsorted(self.buckets, lengths)
+        for bucket_index in np.unique(bucket_indices):
+            bucket = self.buckets[bucket_index]
+            rows = np.flatnonzero(bucket_indices == bucket_index).tolist()
+            if bucket not in self._writers:
+                self._writers[bucket] = ArrowWriter(
+                    features=SHARD_FEATURES,
+                    path=os.path.join(self.path, self._filename(bucket)),
+                )
+            self._writers[bucket].write_batch(
+                {
+                    "input_ids": [encodings["input_ids"][i] for i in rows],
+                    "special_tokens_mask": [
+                        encodings["special_tokens_mask"][i] for i in rows
+                    ],
+                    "length": lengths[rows].tolist(),
+                }
+            )
+            self._num_rows[bucket] += len(rows)
+
+    def close(self) -> dict:
+        """Finalize the shards and write their manifest, which is returned."""
+        for writer in self._writers.values():
+            writer.finalize()
+        manifest = {
+            "max_seq_length": self.max_seq_length,
+            "buckets": [
+                {
+                    "max_length": bucket,
+                    "filename": self._filename(bucket),
+                    "num_rows": self._num_rows[bucket],
+                }
+                for bucket in self.buckets
+                if self._num_rows[bucket]
+            ],
+            "metadata": self.metadata,
+        }
+        with open(os.path.join(self.path, SHARDS_MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+
+def write_tokenized_shards(
+    texts: Iterable[List[str]],
+    tokenizer: Callable,
+    path: str,
+    max_seq_length: int,
+    buckets: Sequence[int] = DEFAULT_BUCKETS,
+    metadata: Optional[Mapping[str, Any]] = None,
+) -> dict:
+    """
+    Tokenize batches of texts as they are produced, and stream them into length-bucketed shards at `path`.
+
+    `tokenizer` is called like a `transformers` tokenizer. Returns the shards' manifest.
+    """
+    writer = ShardWriter(path, max_seq_length, buckets=buckets, metadata=metadata)
+    n_texts = 0
+    for batch in texts:
+        encodings = tokenizer(
+            batch,
+            truncation=True,
+            max_length=max_seq_length,
+            return_special_tokens_mask=True,
+        )
+        writer.write(encodings)
+        n_texts += len(batch)
+    logger.info(f"wrote {n_texts} tokenized texts to {path}")
+    return writer.close()
+
+
+def load_shards(
+    path: str,
+    tokenizer_name: Optional[str] = None,
+    max_seq_length: Optional[int] = None,
+) -> Tuple[Dataset, dict]:
+    """
+    Load (memory-mapped) all the shards written to `path`, in order of their length bucket, and their manifest.
+
+    If `tokenizer_name` is set, the shards must have been written with that tokenizer (if their metadata
+    says which), and if `max_seq_length` is set, their sequences must be no longer. Otherwise a ValueError is
+    raised, rather than training on ids from another vocabulary or past the model's positions.
+    """
+    with open(os.path.join(path, SHARDS_MANIFEST)) as f:
+        manifest = json.load(f)
+
+    shards_tokenizer = manifest["metadata"].get("tokenizer_name")
+    if tokenizer_name is not None and shards_tokenizer not in (None, tokenizer_name):
+        raise ValueError(
+            f"shards at {path} were tokenized with {shards_tokenizer}, not {tokenizer_name}"
+        )
+    if max_seq_length is not None and manifest["max_seq_length"] > max_seq_length:
+        raise ValueError(
+            f"shards at {path} have sequences of up to {manifest['max_seq_length']} tokens, "
+            f"more than max_seq_length={max_seq_length}"
+        )
+
+    shards = [
+        Dataset.from_file(os.path.join(path, bucket["filename"]))
+        for bucket in manifest["buckets"]
+    ]
+    if not shards:
+        dataset = Dataset.from_dict(
+            {k: [] for k in SHARD_FEATURES}, features=SHARD_FEATURES
+        )
+    else:
+        dataset = concatenate_datasets(shards)
+    return dataset, manifest
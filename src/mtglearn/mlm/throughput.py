@@ -0,0 +1,52 @@
+from typing import Callable, Dict
+import time
+
+
+class TokenThroughput:
+    """
+    Counts the tokens trained on, to report tokens per second, both overall and since the last report.
+
+    `padded_tokens` counts every position of the batches (what the model computes on), `tokens` only the
+    ones that aren't padding (what it learns from).
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.start = self.last_report = clock()
+        self.tokens = self.padded_tokens = 0
+        self._reported_tokens = self._reported_padded_tokens = 0
+
+    def update(self, tokens: int, padded_tokens: int):
+        self.tokens += tokens
+        self.padded_tokens += padded_tokens
+
+    @staticmethod
+    def _rates(tokens: int, padded_tokens: int, seconds: float) -> Dict[str, float]:
+        seconds = max(seconds, 1e-9)
+        return {
+            "tokens_per_second": round(tokens / seconds, 1),
+            "padded_tokens_per_second": round(padded_tokens / seconds, 1),
+        }
+
+    def interval(self) -> Dict[str, float]:
+        """The rates since the last call (or since the start)."""
+        now = self.clock()
+        rates = self._rates(
+            self.tokens - self._reported_tokens,
+            self.padded_tokens - self._reported_padded_tokens,
+            now - self.last_report,
+        )
+        self.last_report = now
+        self._reported_tokens, self._reported_padded_tokens = (
+            self.tokens,
+            self.padded_tokens,
+        )
+        return rates
+
+    def total(self) -> Dict[str, float]:
+        """The rates since the start, and the total numbers of tokens."""
+        return {
+            **self._rates(self.tokens, self.padded_tokens, self.clock() - self.start),
+            "tokens": self.tokens,
+            "padded_tokens": self.padded_tokens,
+        }
@@ -0,0 +1,226 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import hashlib
+import json
+import os
+import re
+import threading
+
+import pytest
+
+RAW_CARDS = {
+    "AAA": [
+        {
+            "name": "Grizzly Bears",
+            "manaCost": "{1}{G}",
+            "manaValue": 2,
+            "types": ["Creature"],
+            "rarity": "common",
+            "text": "",
+            "power": "2",
+            "toughness": "2",
+            "artist": "Jeff A. Menges",
+        },
+        {
+            "name": "Giant Growth",
+            "manaCost": "{G}",
+            "manaValue": 1,
+            "types": ["Instant"],
+            "rarity": "common",
+            "text": "Target creature gets +3/+3 until end of turn.",
+        },
+        {"name": "Forest", "types": ["Land"], "rarity": "common"},
+    ],
+    "BBB": [
+        {
+            "name": "Delver of Secrets // Insectile Aberration",
+            "manaCost": "{U}",
+            "manaValue": 1,
+            "types": ["Creature"],
+            "rarity": "uncommon",
+            "text": "At the beginning of your upkeep, look at the top card of your library.",
+            "power": "1",
+            "toughness": "1",
+        },
+        {
+            "name": "Tarmogoyf",
+            "manaCost": "{1}{G}",
+            "manaValue": 2,
+            "types": ["Creature"],
+            "rarity": "mythic",
+            "text": "Tarmogoyf's power is equal to the number of card types among cards in all graveyards.",
+            "power": "*",
+            "toughness": "1+*",
+        },
+    ],
+    "EMPTY": [],
+}
+
+
+def write_all_printings(path, raw_cards=RAW_CARDS, **json_kwargs):
+    data = {
+        printing: {"name": printing, "code": printing, "cards": cards}
+        for printing, cards in raw_cards.items()
+    }
+    with open(path, "w") as f:
+        json.dump({"meta": {"version": "test"}, "data": data}, f, **json_kwargs)
+    return path
+
+
+@pytest.fixture
+def all_printings_path(tmp_path):
+    return write_all_printings(str(tmp_path / "AllPrintings.json"), indent=2)
+
+
+@pytest.fixture
+def cache_home(tmp_path, monkeypatch):
+    from mtglearn.datasets import cards
+
+    cache_home = str(tmp_path / "mtglearn")
+    monkeypatch.setattr(cards, "MTGLEARN_CACHE_HOME", cache_home)
+    monkeypatch.setattr(cards, "CARDS_DATASET_CACHE", os.path.join(cache_home, "cards"))
+    monkeypatch.setattr(
+        cards, "CARD_STATS_DATASET_CACHE", os.path.join(cache_home, "card_stats")
+    )
+    monkeypatch.setattr(
+        cards, "SEVENTEENLANDS_CACHE", os.path.join(cache_home, "seventeenlands")
+    )
+    return cache_home
+
+
+RAW_STATS = {
+    "BBB": [
+        {
+            "name": "Delver of Secrets",
+            "color": "U",
+            "rarity": "uncommon",
+            "seen_count": 100,
+            "avg_seen": 3.5,
+            "pick_count": 50,
+            "avg_pick": 2.5,
+            "game_count": 1000,
+            "win_rate": 0.55,
+        },
+        {"name": "Tarmogoyf", "seen_count": 10, "win_rate": 0.6},
+    ]
+}
+
+
+class SeventeenlandsStub(ThreadingHTTPServer):
+    """A local stand-in for the 17lands card_ratings endpoint."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SeventeenlandsHandler)
+        self.stats = RAW_STATS
+        self.requests = []
+        self.headers = []
+        self.n_failures = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/card_ratings/data"
+
+
+class _SeventeenlandsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        self.server.requests.append((query["expansion"][0], query["format"][0]))
+        self.server.headers.append(self.headers)
+
+        if self.server.n_failures:
+            self.server.n_failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        body = json.dumps(self.server.stats.get(query["expansion"][0], [])).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def seventeenlands():
+    server = SeventeenlandsStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class WhitespaceTokenizer:
+    """Tokenizes on whitespace, called like a `transformers` tokenizer."""
+
+    cls_token_id, sep_token_id, pad_token_id, mask_token_id = 0, 1, 2, 3
+
+    all_special_ids = [cls_token_id, sep_token_id, pad_token_id, mask_token_id]
+
+    def __init__(self):
+        self.vocab = {}
+
+    def __len__(self):
+        return len(self.vocab) + 4
+
+    def tokenize(self, text):
+        return text.split()
+
+    def convert_tokens_to_ids(self, token):
+        return self.vocab.setdefault(token, len(self.vocab) + 4)
+
+    def __call__(
+        self,
+        texts,
+        add_special_tokens=True,
+        truncation=False,
+        max_length=None,
+        return_special_tokens_mask=False,
+    ):
+        encodings = {"input_ids": [], "special_tokens_mask": []}
+        for text in texts:
+            ids = [self.convert_tokens_to_ids(t) for t in self.tokenize(text)]
+            if truncation and max_length is not None:
+                ids = ids[: max_length - 2]
+            if add_special_tokens:
+                encodings["input_ids"].append(
+                    [self.cls_token_id] + ids + [self.sep_token_id]
+                )
+                encodings["special_tokens_mask"].append([1] + [0] * len(ids) + [1])
+            else:
+                encodings["input_ids"].append(ids)
+                encodings["special_tokens_mask"].append([0] * len(ids))
+        return encodings
+
+
+class ByteLevelTokenizer(WhitespaceTokenizer):
+    """
+    Splits like GPT-2/RoBERTa's byte-level BPE before merges: words, numbers and runs of punctuation, keeping
+    the space before them as a `Ġ`, so e.g. the `|` between card fields is `Ġ|`.
+    """
+
+    PATTERN = re.compile(r" ?[^\W\d_]+| ?\d+| ?[^\s\w]+|\s+(?!\S)|\s+")
+
+    def tokenize(self, text):
+        return [t.replace(" ", "\u0120") for t in self.PATTERN.findall(text)]
+
+
+@pytest.fixture
+def tokenizer():
+    return WhitespaceTokenizer()
+
+
+@pytest.fixture
+def byte_level_tokenizer():
+    return ByteLevelTokenizer()
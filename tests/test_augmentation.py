@@ -0,0 +1,72 @@
+import attrs
+import numpy as np
+from datasets import Dataset
+
+from mtglearn.augmentation import (
+    CANDIDATE_FIELDS,
+    augment_batch,
+    count_fields,
+    draw_field_masks,
+)
+from mtglearn.card import Card
+
+
+def make_batch():
+    cards = [
+        Card(name="Forest", types=["Land"]),
+        Card(name="Grizzly Bears", mana_cost="{1}{G}", mana_value=2, power="2"),
+        Card(name="Ornithopter", mana_value=0, types=[], text="Flying"),
+    ]
+    return {f.name: [getattr(c, f.name) for c in cards] for f in attrs.fields(Card)}
+
+
+def test_count_fields():
+
+    assert count_fields(make_batch()).tolist() == [2, 4, 2]
+
+
+def test_draw_field_masks():
+
+    n_fields = np.array([1, 2, 9] * 100)
+    masks = draw_field_masks(n_fields, 4, 0, range(300))
+
+    assert masks.shape == (300, 4, len(CANDIDATE_FIELDS))
+    n_kept = masks.sum(-1)
+    assert (n_kept < n_fields[:, None]).all()
+    assert (n_kept[2::3] == 8).any() and (n_kept[2::3] == 0).any()
+
+
+def test_augment_batch():
+
+    batch = make_batch()
+    augmented = augment_batch(batch, 3, 0, [0, 1, 2])
+
+    assert len(augmented) == 9
+    assert augmented[::3] == Card.serialize_batch(batch)
+    for i, card in enumerate(augmented):
+        assert card.startswith(f"name: {batch['name'][i // 3]}")
+
+    assert augment_batch(batch, 3, 0, [0, 1, 2]) == augmented
+    assert augment_batch(batch, 3, 1, [0, 1, 2]) != augmented
+    assert augment_batch(batch, 1, 0, [0, 1, 2]) == augmented[::3]
+
+
+def test_augment_batch_deterministic():
+
+    batch = make_batch()
+    cards = Dataset.from_dict({k: v * 20 for k, v in batch.items()})
+
+    def augment(batch_size, num_proc):
+        return cards.map(
+            lambda batch, indices: {"card": augment_batch(batch, 4, 1234, indices)},
+            batched=True,
+            batch_size=batch_size,
+            with_indices=True,
+            num_proc=num_proc,
+            remove_columns=cards.column_names,
+        )["card"]
+
+    augmented = augment(1000, None)
+    assert len(augmented) == 4 * 60
+    assert augment(7, None) == augmented
+    assert augment(7, 3) == augmented
@@ -0,0 +1,62 @@
+import random
+import re
+
+import attrs
+import pyarrow as pa
+
+from mtglearn.card import Card, CardWithStats, _normalize
+
+
+def reference_str(card):
+    # the original, uncompiled implementation of Card.__str__
+    fields = []
+    for f in attrs.fields(Card):
+        if f.repr:
+            value = getattr(card, f.name)
+            if isinstance(value, list):
+                value = " ".join(value)
+            if value:
+                fields.append((f.name, value))
+    return re.sub(r"\s+|_+", " ", " | ".join(f"{k}: {v}" for k, v in fields))
+
+
+CARDS = [
+    Card(),
+    Card(name="Forest", types=["Basic", "Land"]),
+    Card(name="Grizzly Bears", mana_cost="{1}{G}", mana_value=2, power="2"),
+    Card(name="Ornithopter", mana_value=0, types=[], text=""),
+    Card(name=" _weird__ name ", text="draw\n\na card _ now\t", toughness="1+*"),
+    Card(name="Null\x00Byte", rarity="rare "),
+]
+
+
+def test_str():
+
+    for card in CARDS:
+        assert str(card) == reference_str(card)
+
+    card = CardWithStats(name="Delver of Secrets", win_rate=0.5)
+    assert str(card) == reference_str(card) == "name: Delver of Secrets"
+
+
+def test_serialize_batch():
+
+    expected = [reference_str(card) for card in CARDS]
+    columns = {f.name: [getattr(c, f.name) for c in CARDS] for f in attrs.fields(Card)}
+
+    assert Card.serialize_batch(columns) == expected
+    assert Card.serialize_batch(pa.table(columns)) == expected
+    assert Card.serialize_batch({**columns, "win_rate": [0.5] * len(CARDS)}) == expected
+    assert Card.serialize_batch({"name": ["Forest"], "text": [None]}) == [
+        "name: Forest"
+    ]
+    assert Card.serialize_batch({"name": []}) == []
+
+
+def test_normalize():
+
+    rng = random.Random(0)
+    pieces = [" ", "  ", "\t", "\n", "_", "__", "a", "b", " _ ", "\x0b", "　", "\x85"]
+    for _ in range(10000):
+        s = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 10)))
+        assert _normalize(s) == re.sub(r"\s+|_+", " ", s)
@@ -0,0 +1,151 @@
+import os
+import struct
+import subprocess
+import sys
+
+import pyarrow as pa
+import pytest
+
+from mtglearn.card import Card, CompactCard
+from mtglearn.datasets import CardFile, LoadReport, cards
+from mtglearn.datasets.cardfile import CARD_FILE_NAME, MAGIC, write_card_file
+from mtglearn.datasets.cards import _process_raw_cards
+
+from conftest import RAW_CARDS, write_all_printings
+
+
+@pytest.fixture
+def card_file(all_printings_path, cache_home):
+    _process_raw_cards(all_printings_path)
+    return os.path.join(cards.CARDS_DATASET_CACHE, CARD_FILE_NAME)
+
+
+def test_card_file_lookup(card_file):
+    with CardFile(card_file) as card_file:
+        assert len(card_file) == 5
+        assert card_file.n_cards == 5
+
+        assert card_file.get_card("Tarmogoyf") == Card(
+            name="Tarmogoyf",
+            mana_cost="{1}{G}",
+            mana_value=2,
+            types=["Creature"],
+            printing="BBB",
+            rarity="mythic",
+            text="Tarmogoyf's power is equal to the number of card types among cards in all graveyards.",
+            power="*",
+            toughness="1+*",
+        )
+        forest = card_file["Forest"]
+        assert forest == [
+            Card(name="Forest", types=["Land"], printing="AAA", rarity="common")
+        ]
+
+        assert "Delver of Secrets // Insectile Aberration" in card_file
+        assert "Delver of Secrets" not in card_file
+        assert card_file.get_card("Black Lotus") is None
+        with pytest.raises(KeyError):
+            card_file["Black Lotus"]
+
+        assert list(card_file) == sorted(card_file)
+        assert sorted(card.name for card in card_file.iter_cards()) == list(card_file)
+
+
+def test_card_file_printings(tmp_path):
+    path = str(tmp_path / CARD_FILE_NAME)
+    columns = {
+        "name": ["Shock", "Shock", "Opt", "Ærathi Berserker"],
+        "mana_value": [1, 1, None, 5],
+        "types": [["Instant"], ["Instant"], [], None],
+        "printing": ["M19", "AKH", "XLN", "LEG"],
+    }
+    assert write_card_file(path, columns) == 4
+
+    card_file = CardFile(path, cls=CompactCard)
+    assert [card.printing for card in card_file["Shock"]] == ["AKH", "M19"]
+    assert card_file.get_card("Shock", printing="M19").printing == "M19"
+    assert card_file.get_card("Shock", printing="DOM") is None
+
+    opt = card_file.get_card("Opt")
+    assert isinstance(opt, CompactCard)
+    assert opt.mana_value is None and opt.types == [] and opt.text is None
+    assert card_file.get_card("Ærathi Berserker").mana_value == 5
+    card_file.close()
+
+
+def test_card_file_from_arrow_chunks(tmp_path):
+    columns = {
+        "name": ["Shock", "Opt", None, "Shock", "Ærathi Berserker", "Opt"],
+        "mana_value": [1, None, 3, 1, 5, 1],
+        "types": [["Instant"], [], None, ["Instant"], ["Creature", "Human"], None],
+        "printing": ["M19", "XLN", "AAA", "AKH", "LEG", None],
+        "text": ["Shock deals 2 damage.", None, "", "Shock deals 2 damage.", "", None],
+    }
+    table = pa.table(columns)
+    # chunks as in a dataset of partitions, some of them slices of larger arrays
+    chunked = pa.concat_tables([table.slice(0, 1), table.slice(1, 3), table.slice(4)])
+    write_card_file(str(tmp_path / "dict"), columns)
+    write_card_file(str(tmp_path / "arrow"), chunked)
+
+    with CardFile(str(tmp_path / "dict")) as expected, CardFile(
+        str(tmp_path / "arrow")
+    ) as card_file:
+        assert (
+            list(card_file)
+            == list(expected)
+            == ["", "Opt", "Shock", "Ærathi Berserker"]
+        )
+        assert list(card_file.iter_cards()) == list(expected.iter_cards())
+        assert [card.printing for card in card_file["Opt"]] == [None, "XLN"]
+        assert card_file.get_card("Ærathi Berserker").types == ["Creature", "Human"]
+
+
+def test_card_file_version(tmp_path):
+    path = str(tmp_path / CARD_FILE_NAME)
+    write_card_file(path, {"name": ["Opt"]})
+
+    with open(path, "r+b") as f:
+        f.seek(len(MAGIC))
+        f.write(struct.pack("<I", 99))
+    with pytest.raises(ValueError, match="version 99"):
+        CardFile(path)
+
+    with open(path, "wb") as f:
+        f.write(b"\0" * 64)
+    with pytest.raises(ValueError, match="not a card file"):
+        CardFile(path)
+
+
+def test_card_file_is_rewritten_on_changes(all_printings_path, cache_home):
+    report = LoadReport()
+    _process_raw_cards(all_printings_path, report=report)
+    assert report["card_file"].cache == "miss"
+    assert report["card_file"].rows == 5
+
+    report = LoadReport()
+    _process_raw_cards(all_printings_path, report=report)
+    assert report["card_file"].cache == "hit"
+
+    # removing a printing converts nothing, but still changes the cards
+    raw_cards = {k: v for k, v in RAW_CARDS.items() if k != "BBB"}
+    report = LoadReport()
+    _process_raw_cards(
+        write_all_printings(all_printings_path, raw_cards, indent=2), report=report
+    )
+    assert report["convert"].rows == 0
+    assert report["card_file"].cache == "miss"
+    with CardFile(os.path.join(cards.CARDS_DATASET_CACHE, CARD_FILE_NAME)) as f:
+        assert "Tarmogoyf" not in f
+        assert len(f) == 3
+
+
+def test_card_file_does_not_import_datasets(card_file):
+    code = (
+        "import sys; from mtglearn.datasets import CardFile; "
+        f"print(CardFile({card_file!r}).get_card('Forest').name); "
+        "print('datasets' in sys.modules, 'pyarrow' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["Forest", "False", "False"]
@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+from mtglearn.card import Card
+from mtglearn.mlm import collator as collator_module
+from mtglearn.mlm.collator import IGNORE_INDEX, CardMLMCollator
+
+CARDS = [
+    "name : Grizzly Bears | mana cost : {1}{G} | types : Creature | power : 2",
+    "name : Forest | types : Land",
+    "name : Llanowar Elves | text : {T} : Add {G} .",
+]
+
+
+def _features(tokenizer, texts=CARDS):
+    encodings = tokenizer(texts, return_special_tokens_mask=True)
+    return [
+        {"input_ids": ids, "special_tokens_mask": mask}
+        for ids, mask in zip(encodings["input_ids"], encodings["special_tokens_mask"])
+    ]
+
+
+def test_collator_pads_and_masks(tokenizer):
+    features = _features(tokenizer)
+    collator = CardMLMCollator(
+        tokenizer,
+        mlm_probability=0.5,
+        pad_to_multiple_of=8,
+        return_tensors="np",
+        seed=0,
+    )
+
+    batch = collator(features)
+
+    longest = max(len(f["input_ids"]) for f in features)
+    assert batch["input_ids"].shape == (3, -(-longest // 8) * 8)
+    for row, f in enumerate(features):
+        n = len(f["input_ids"])
+        assert batch["attention_mask"][row].tolist() == [1] * n + [0] * (
+            batch["input_ids"].shape[1] - n
+        )
+        labels = batch["labels"][row]
+        # only non-special tokens are masked, and labels are the original tokens
+        masked = labels != IGNORE_INDEX
+        assert not masked[n:].any()
+        assert not (masked[:n] & np.array(f["special_tokens_mask"], bool)).any()
+        assert (labels[masked] == np.array(f["input_ids"])[masked[:n]]).all()
+        unmasked = ~masked[:n]
+        assert (
+            batch["input_ids"][row, :n][unmasked] == np.array(f["input_ids"])[unmasked]
+        ).all()
+        assert (batch["input_ids"][row, n:] == tokenizer.pad_token_id).all()
+
+
+def test_collator_mask_rates(tokenizer):
+    features = _features(tokenizer) * 500
+    collator = CardMLMCollator(tokenizer, return_tensors="np", seed=0)
+
+    batch = collator(features)
+
+    masked = batch["labels"] != IGNORE_INDEX
+    n_maskable = sum(np.sum(np.array(f["special_tokens_mask"]) == 0) for f in features)
+    assert masked.sum() / n_maskable == pytest.approx(0.15, abs=0.01)
+    replaced = batch["input_ids"][masked] == tokenizer.mask_token_id
+    assert replaced.mean() == pytest.approx(0.8, abs=0.02)
+    # the buffers are reused, but batches don't share memory
+    assert not np.shares_memory(batch["input_ids"], collator(features)["input_ids"])
+
+
+def test_collator_whole_field_masking(tokenizer):
+    features = _features(tokenizer)
+    collator = CardMLMCollator(
+        tokenizer,
+        mlm_probability=0.0,
+        whole_field_probability=1.0,
+        return_tensors="np",
+        seed=0,
+    )
+
+    batch = collator(features)
+
+    vocab = {i: t for t, i in tokenizer.vocab.items()}
+    masked_tokens = [
+        [vocab[i] for i in row[row != IGNORE_INDEX]] for row in batch["labels"]
+    ]
+    assert masked_tokens == [
+        ["Grizzly", "Bears", "{1}{G}", "Creature", "2"],
+        ["Forest", "Land"],
+        # only the first `:` of a field separates its key and value
+        ["Llanowar", "Elves", "{T}", ":", "Add", "{G}", "."],
+    ]
+
+
+def test_collator_whole_field_masking_byte_level(byte_level_tokenizer):
+    # the spaced separators of real cards are their own tokens (`Ġ|`) for byte-level BPE
+    tokenizer = byte_level_tokenizer
+    cards = [
+        Card(name="Grizzly Bears", mana_cost="{1}{G}", types=["Creature"], power="2"),
+        Card(name="Llanowar Elves", text="{T}: Add {G}."),
+    ]
+    features = _features(tokenizer, [str(card) for card in cards])
+    collator = CardMLMCollator(
+        tokenizer,
+        mlm_probability=0.0,
+        whole_field_probability=1.0,
+        return_tensors="np",
+        seed=0,
+    )
+
+    batch = collator(features)
+
+    vocab = {i: t for t, i in tokenizer.vocab.items()}
+    masked_values = [
+        "".join(vocab[i] for i in row[row != IGNORE_INDEX]).replace("\u0120", " ")
+        for row in batch["labels"]
+    ]
+    assert masked_values == [
+        " Grizzly Bears {1}{G} Creature 2",
+        " Llanowar Elves {T}: Add {G}.",
+    ]
+
+
+def test_collator_is_seeded(tokenizer):
+    features = _features(tokenizer)
+
+    def collate(seed):
+        collator = CardMLMCollator(
+            tokenizer, whole_field_probability=0.3, return_tensors="np", seed=seed
+        )
+        return collator(features)["labels"].tolist()
+
+    assert collate(0) == collate(0)
+    assert collate(0) != collate(1)
+
+
+def test_collator_is_seeded_across_processes(tokenizer, monkeypatch):
+    features = _features(tokenizer)
+
+    def collate(pid, worker_key=(0,)):
+        monkeypatch.setattr(collator_module.os, "getpid", lambda: pid)
+        monkeypatch.setattr(collator_module, "_worker_key", lambda: worker_key)
+        collator = CardMLMCollator(tokenizer, return_tensors="np", seed=0)
+        return collator(features)["labels"].tolist()
+
+    # the same in every run, whatever the pid
+    assert collate(100) == collate(200)
+    # but each dataloader worker has its own stream
+    assert collate(100, (1, 1234)) != collate(100, (2, 1235))
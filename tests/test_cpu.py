@@ -0,0 +1,71 @@
+import os
+
+from mtglearn.mlm import cpu
+from mtglearn.mlm.cpu import (
+    cpu_flags,
+    cpu_supports_bf16,
+    physical_cpu_count,
+    torch_compile_backend,
+)
+from mtglearn.mlm.throughput import TokenThroughput
+
+
+def test_cpu_supports_bf16(tmp_path):
+    cpuinfo = tmp_path / "cpuinfo"
+    cpuinfo.write_text("processor\t: 0\nflags\t\t: fpu sse avx2 avx512f\n")
+    assert cpu_flags(str(cpuinfo)) == {"fpu", "sse", "avx2", "avx512f"}
+    assert not cpu_supports_bf16(str(cpuinfo))
+
+    cpuinfo.write_text("processor\t: 0\nflags\t\t: fpu avx512f avx512_bf16\n")
+    assert cpu_supports_bf16(str(cpuinfo))
+
+    assert cpu_flags(str(tmp_path / "missing")) == frozenset()
+
+
+def test_physical_cpu_count(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(4)))
+    cpuinfo = tmp_path / "cpuinfo"
+    # 2 sockets of 2 hyperthreaded cores
+    cpuinfo.write_text(
+        "".join(
+            f"processor\t: {i}\nphysical id\t: {i // 4}\ncore id\t\t: {i % 2}\n\n"
+            for i in range(8)
+        )
+    )
+    assert physical_cpu_count(str(cpuinfo)) == 4
+    # never more than the CPUs the process can run on
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: {0, 1})
+    assert physical_cpu_count(str(cpuinfo)) == 2
+
+    assert physical_cpu_count(str(tmp_path / "missing")) == 2
+
+
+def test_torch_compile_backend(monkeypatch):
+    monkeypatch.delenv("CXX", raising=False)
+    monkeypatch.setattr(cpu.shutil, "which", lambda cmd: None)
+    assert torch_compile_backend() == "aot_eager"
+
+    monkeypatch.setattr(cpu.shutil, "which", lambda cmd: f"/usr/bin/{cmd}")
+    assert torch_compile_backend() == "inductor"
+
+
+def test_token_throughput():
+    now = [0.0]
+    throughput = TokenThroughput(clock=lambda: now[0])
+
+    throughput.update(80, 100)
+    now[0] = 2.0
+    assert throughput.interval() == {
+        "tokens_per_second": 40.0,
+        "padded_tokens_per_second": 50.0,
+    }
+
+    throughput.update(300, 300)
+    now[0] = 3.0
+    assert throughput.interval()["tokens_per_second"] == 300.0
+    assert throughput.total() == {
+        "tokens_per_second": 126.7,
+        "padded_tokens_per_second": 133.3,
+        "tokens": 380,
+        "padded_tokens": 400,
+    }
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from mtglearn.datasets.files import atomic_path, atomic_write
+
+
+def test_atomic_write(tmp_path):
+    path = str(tmp_path / "file.json")
+
+    with atomic_write(path) as f:
+        f.write("first")
+        # nothing at `path` until the file is written
+        assert not os.path.exists(path)
+    with open(path) as f:
+        assert f.read() == "first"
+
+    # a failed write leaves the previous file, and no temporary file
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as f:
+            f.write("second")
+            raise RuntimeError
+    with open(path) as f:
+        assert f.read() == "first"
+    assert os.listdir(tmp_path) == ["file.json"]
+
+
+def test_atomic_path_is_unique(tmp_path):
+    path = str(tmp_path / "file.bin")
+
+    # e.g. two processes writing the same file at once
+    with atomic_path(path) as first, atomic_path(path) as second:
+        assert first != second
+        for tmp_path_, content in ((first, b"1"), (second, b"2")):
+            with open(tmp_path_, "wb") as f:
+                f.write(content)
+    with open(path, "rb") as f:
+        assert f.read() == b"1"
@@ -0,0 +1,68 @@
+from itertools import chain
+
+import numpy as np
+from datasets import Dataset
+
+from mtglearn.mlm.grouping import TextGrouper, group_dataset, group_texts
+
+
+def _tokenized(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    input_ids = [rng.integers(4, 100, rng.integers(2, 30)).tolist() for _ in range(n)]
+    special_tokens_mask = [[1] + [0] * (len(ids) - 2) + [1] for ids in input_ids]
+    return {"input_ids": input_ids, "special_tokens_mask": special_tokens_mask}
+
+
+def _reference_group_texts(examples, max_seq_length):
+    # the python implementation of the transformers MLM example
+    concatenated = {k: list(chain(*examples[k])) for k in examples.keys()}
+    total_length = len(concatenated[list(examples.keys())[0]])
+    total_length = (total_length // max_seq_length) * max_seq_length
+    return {
+        k: [t[i : i + max_seq_length] for i in range(0, total_length, max_seq_length)]
+        for k, t in concatenated.items()
+    }
+
+
+def test_group_texts():
+    tokenized = Dataset.from_dict(_tokenized())
+
+    grouped = tokenized.with_format("arrow").map(
+        lambda batch: group_texts(batch, 16), batched=True, batch_size=50
+    )
+
+    expected = tokenized.map(
+        lambda batch: _reference_group_texts(batch, 16), batched=True, batch_size=50
+    )
+    assert grouped.with_format(None).to_dict() == expected.to_dict()
+
+
+def test_text_grouper_carries_over():
+    tokenized = _tokenized()
+    flat = list(chain(*tokenized["input_ids"]))
+    grouper = TextGrouper(16)
+
+    blocks = []
+    for start in range(0, 200, 30):
+        batch = Dataset.from_dict(
+            {k: v[start : start + 30] for k, v in tokenized.items()}
+        )
+        blocks.extend(grouper(batch.with_format("arrow")[:])["input_ids"].to_pylist())
+    blocks.extend(grouper.flush()["input_ids"].to_pylist())
+
+    assert list(chain(*blocks)) == flat
+    assert all(len(b) == 16 for b in blocks[:-1])
+    assert 0 < len(blocks[-1]) <= 16
+    assert grouper.flush() is None
+
+
+def test_group_dataset():
+    tokenized = Dataset.from_dict(_tokenized()).shuffle(seed=0)
+    n_tokens = sum(map(len, tokenized["input_ids"]))
+
+    grouped = group_dataset(tokenized, 16, batch_size=7)
+
+    assert list(chain(*grouped["input_ids"])) == list(chain(*tokenized["input_ids"]))
+    assert len(grouped) == -(-n_tokens // 16)
+    assert len(group_dataset(tokenized, 16, drop_last=True)) == n_tokens // 16
+    assert len(group_dataset(tokenized.select([]), 16)) == 0
@@ -0,0 +1,60 @@
+import subprocess
+import sys
+
+import pytest
+
+# modules that must not be imported until they are used
+HEAVY_MODULES = ("datasets", "requests", "pandas", "pyarrow", "torch", "transformers")
+# generous, so this only fails when something heavy gets imported, not on a slow machine
+IMPORT_TIME_BUDGET = 0.5
+
+
+def _import_time(module: str) -> float:
+    """The cumulative import time of `module` in seconds, in a fresh interpreter (`python -X importtime`)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        _, cumulative, package = line.split("|")
+        if package.strip() == module:
+            return int(cumulative) / 1e6
+    raise ValueError(f"{module} was not imported")
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "mtglearn",
+        "mtglearn.card",
+        "mtglearn.config",
+        "mtglearn.datasets",
+        "mtglearn.datasets.cardfile",
+    ],
+)
+def test_import_is_lazy(module):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, {module}; print(' '.join(sorted(sys.modules)))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported = set(result.stdout.split())
+    assert not imported & set(HEAVY_MODULES)
+
+    assert _import_time(module) < IMPORT_TIME_BUDGET
+
+
+def test_load_cards_is_imported_on_first_use():
+    import mtglearn.datasets
+
+    assert callable(mtglearn.datasets.load_cards)
+    with pytest.raises(AttributeError):
+        mtglearn.datasets.no_such_thing
@@ -0,0 +1,114 @@
+import os
+
+import pandas as pd
+import pytest
+
+from mtglearn.card import CompactCard
+from mtglearn.datasets import LoadReport, cards, load_cards
+from mtglearn.datasets.cards import _process_raw_cards
+from mtglearn.datasets.cache import partition_path
+from mtglearn.datasets.sequence import CardSequence
+
+
+@pytest.fixture
+def cached_cards(all_printings_path, cache_home):
+    _process_raw_cards(all_printings_path)
+
+
+def test_load_cards_printings(cached_cards):
+
+    # only the partitions of the selected printings are read
+    os.remove(partition_path(cards.CARDS_DATASET_CACHE, "AAA"))
+
+    dataset = load_cards(as_dataset=True, printings=["BBB"])
+
+    assert dataset["name"] == ["Delver of Secrets // Insectile Aberration", "Tarmogoyf"]
+
+
+def test_load_cards_filters(cached_cards):
+
+    dataset = load_cards(as_dataset=True, exclude_names=["Forest"], types="Creature")
+    assert dataset["name"] == [
+        "Grizzly Bears",
+        "Delver of Secrets // Insectile Aberration",
+        "Tarmogoyf",
+    ]
+
+    dataset = load_cards(as_dataset=True, types=["Land", "Instant"], rarity="common")
+    assert dataset["name"] == ["Giant Growth", "Forest"]
+
+    dataset = load_cards(as_dataset=True, printings="AAA", rarity=["mythic"])
+    assert len(dataset) == 0
+
+
+def test_load_cards_zero_copy(cached_cards):
+
+    cards = load_cards(zero_copy=True)
+
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in cards.dtypes)
+    assert cards["name"].tolist() == load_cards()["name"].tolist()
+    assert cards["types"][0] == ["Creature"]
+
+    cards = load_cards(zero_copy=True, printings="BBB")
+    assert cards["name"].tolist() == [
+        "Delver of Secrets // Insectile Aberration",
+        "Tarmogoyf",
+    ]
+
+
+def test_load_cards_lazy(cached_cards):
+
+    cards = load_cards(as_attrs=True, lazy=True, cache_size=2)
+
+    assert isinstance(cards, CardSequence)
+    assert len(cards) == 5
+    assert list(cards) == load_cards(as_attrs=True)
+    assert cards[-1].name == "Tarmogoyf"
+    assert cards[0] is cards[0]
+    assert [card.name for card in cards[1:3]] == ["Giant Growth", "Forest"]
+    with pytest.raises(IndexError):
+        cards[5]
+
+
+def test_load_cards_compact(cached_cards):
+
+    cards = load_cards(as_attrs=True, compact=True)
+
+    assert isinstance(cards[0], CompactCard)
+    assert not hasattr(cards[0], "__dict__")
+    assert [str(card) for card in cards] == [
+        str(card) for card in load_cards(as_attrs=True)
+    ]
+
+
+def test_load_cards_report(all_printings_path, cache_home):
+
+    cold = LoadReport()
+    _process_raw_cards(all_printings_path, report=cold)
+    assert cold["convert"].cache == "miss"
+    assert cold["convert"].rows == 5
+    assert cold["convert"].bytes_read == os.path.getsize(all_printings_path)
+    assert cold["convert"].bytes_written > 0
+
+    warm = LoadReport()
+    _process_raw_cards(all_printings_path, report=warm)
+    assert warm["convert"].cache == "hit"
+    assert warm["convert"].rows == 0
+
+    finished = []
+    report = LoadReport(callbacks=[finished.append])
+    df = load_cards(types="Creature", report=report)
+
+    assert [s.name for s in report.stages] == [
+        "load_partitions",
+        "filter",
+        "to_pandas",
+    ]
+    assert finished == report.stages
+    assert report.cache == {"load_partitions": "hit"}
+    assert report["load_partitions"].rows == 5
+    assert report["load_partitions"].bytes_read > 0
+    assert report["filter"].rows == report["to_pandas"].rows == len(df) == 3
+    assert all(s.seconds >= 0 and s.peak_rss > 0 for s in report.stages)
+    assert report.seconds == sum(s.seconds for s in report.stages)
+    assert "load_partitions" in str(report)
@@ -0,0 +1,179 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from mtglearn.datasets.mtgjson import _ChunkedReader, iter_printings
+from mtglearn.datasets import LoadReport, cards
+from mtglearn.datasets.cards import _process_raw_cards
+from mtglearn.datasets.cache import partition_path
+from conftest import RAW_CARDS, write_all_printings
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_printings(tmp_path, chunk_size, indent):
+
+    path = write_all_printings(str(tmp_path / "AllPrintings.json"), indent=indent)
+
+    printings = list(iter_printings(path, chunk_size=chunk_size))
+
+    assert [name for name, _ in printings] == list(RAW_CARDS)
+    for name, data in printings:
+        assert data["cards"] == RAW_CARDS[name]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_printings_raw(tmp_path, chunk_size, indent):
+
+    # brackets and escaped quotes in strings, and deeper nesting than is skipped in one match
+    raw_cards = dict(
+        RAW_CARDS,
+        CCC=[
+            {"name": 'The "[Brackets]" \\', "text": '{T}: Add {G}{{."]}'},
+            {"name": "Nested", "nested": [[[[[[[[{"a": ["]"]}]]]]]]]]},
+        ],
+    )
+    path = write_all_printings(
+        str(tmp_path / "AllPrintings.json"), raw_cards, indent=indent
+    )
+
+    decoded = list(iter_printings(path, with_digests=True))
+    printings = list(
+        iter_printings(path, chunk_size=chunk_size, with_digests=True, raw=True)
+    )
+
+    assert [name for name, _, _ in printings] == list(raw_cards)
+    for (name, raw_text, digest), (_, data, decoded_digest) in zip(printings, decoded):
+        assert json.loads(raw_text) == data
+        assert data["cards"] == raw_cards[name]
+        assert digest == decoded_digest
+
+
+def test_iter_printings_on_oldest_python(tmp_path):
+    # the oldest python the package supports (see runtime.txt), for syntax of newer ones, e.g. regexes with
+    # possessive quantifiers (3.11+). mtgjson only needs the standard library, so it can run without deps
+    root = os.path.join(os.path.dirname(__file__), "..")
+    with open(os.path.join(root, "runtime.txt")) as f:
+        version = f.read().strip()
+    python = shutil.which(f"python{version}")
+    if (
+        python is None
+        or subprocess.run([python, "-c", ""], capture_output=True).returncode
+    ):
+        pytest.skip(f"python {version} is not installed")
+
+    path = write_all_printings(str(tmp_path / "AllPrintings.json"), indent=2)
+    code = (
+        "import importlib.util, json, sys; "
+        "spec = importlib.util.spec_from_file_location('mtgjson', sys.argv[1]); "
+        "mtgjson = importlib.util.module_from_spec(spec); spec.loader.exec_module(mtgjson); "
+        "print(json.dumps([[name, json.loads(raw)] for name, raw in "
+        "mtgjson.iter_printings(sys.argv[2], chunk_size=7, raw=True)]))"
+    )
+    result = subprocess.run(
+        [
+            python,
+            "-c",
+            code,
+            os.path.join(root, "src/mtglearn/datasets/mtgjson.py"),
+            path,
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(result.stdout) == [
+        [name, {"name": name, "code": name, "cards": cards}]
+        for name, cards in RAW_CARDS.items()
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4, 7])
+def test_chunked_reader_scalars(chunk_size):
+    # numbers that would decode (wrongly) from what a chunk boundary leaves of them
+    reader = _ChunkedReader(io.StringIO("12.5 -1e-3 1E+10 true null 7"), chunk_size)
+
+    assert [reader.value() for _ in range(6)] == [12.5, -1e-3, 1e10, True, None, 7]
+
+
+def test_iter_printings_data_before_meta(tmp_path):
+
+    path = str(tmp_path / "AllPrintings.json")
+    with open(path, "w") as f:
+        json.dump({"data": {"AAA": {"cards": []}}, "meta": {"version": "test"}}, f)
+
+    assert list(iter_printings(path, chunk_size=3)) == [("AAA", {"cards": []})]
+
+
+def test_iter_printings_truncated(tmp_path):
+
+    path = str(tmp_path / "AllPrintings.json")
+    with open(path, "w") as f:
+        f.write('{"data": {"AAA": {"cards": [')
+
+    with pytest.raises(ValueError):
+        list(iter_printings(path, chunk_size=4))
+    with pytest.raises(ValueError):
+        list(iter_printings(path, chunk_size=4, raw=True))
+
+
+def test_process_raw_cards(all_printings_path, cache_home):
+
+    dataset = _process_raw_cards(all_printings_path)
+
+    assert len(dataset) == sum(len(cards) for cards in RAW_CARDS.values())
+    assert dataset["printing"] == ["AAA", "AAA", "AAA", "BBB", "BBB"]
+    assert dataset[0]["mana_cost"] == "{1}{G}"
+    assert dataset[0]["mana_value"] == 2
+    assert dataset[0]["types"] == ["Creature"]
+
+
+def test_process_raw_cards_num_proc(all_printings_path, cache_home):
+
+    serial = _process_raw_cards(all_printings_path).to_dict()
+
+    # from an empty cache, so that every printing goes through the process pool
+    shutil.rmtree(cards.CARDS_DATASET_CACHE)
+    report = LoadReport()
+    parallel = _process_raw_cards(all_printings_path, num_proc=2, report=report)
+
+    assert report["convert"].cache == "miss"
+    assert report["convert"].rows == len(serial["name"])
+    assert parallel.to_dict() == serial
+
+
+def test_process_raw_cards_incremental(tmp_path, cache_home, monkeypatch):
+
+    path = write_all_printings(str(tmp_path / "AllPrintings.json"))
+    _process_raw_cards(path)
+
+    converted = []
+    convert_printing = cards._convert_printing
+
+    def _convert_printing(printing_name, raw_cards):
+        converted.append(printing_name)
+        return convert_printing(printing_name, raw_cards)
+
+    monkeypatch.setattr(cards, "_convert_printing", _convert_printing)
+
+    raw_cards = {
+        "AAA": RAW_CARDS["AAA"],
+        "BBB": RAW_CARDS["BBB"][:1],
+        "CCC": [{"name": "Llanowar Elves", "manaValue": 1}],
+    }
+    path = write_all_printings(str(tmp_path / "AllPrintings.json"), raw_cards)
+    dataset = _process_raw_cards(path)
+
+    assert converted == ["BBB", "CCC"]
+    assert dataset["printing"] == ["AAA", "AAA", "AAA", "BBB", "CCC"]
+    assert not os.path.exists(partition_path(cards.CARDS_DATASET_CACHE, "EMPTY"))
+
+    converted.clear()
+    assert _process_raw_cards(path).to_dict() == dataset.to_dict()
+    assert converted == []
@@ -0,0 +1,151 @@
+import os
+
+import pytest
+
+from mtglearn.datasets import CardFile, CardNameIndex, LoadReport, NameMatch, cards
+from mtglearn.datasets import names
+from mtglearn.datasets.cardfile import CARD_FILE_NAME
+from mtglearn.datasets.cards import _process_raw_cards
+from mtglearn.datasets.names import NAME_INDEX_FILE_NAME, fold, trigrams
+
+from conftest import RAW_CARDS, write_all_printings
+
+NAMES = [
+    "Delver of Secrets // Insectile Aberration",
+    "Fire // Ice",
+    "Fireball",
+    "Firebolt",
+    "Ice Cauldron",
+    "Jötun Grunt",
+    "Lightning Bolt",
+    "Lightning Helix",
+    "Tarmogoyf",
+]
+
+
+@pytest.fixture
+def index():
+    # duplicates (other printings) are indexed once
+    return CardNameIndex.build(NAMES + ["Tarmogoyf", None])
+
+
+def test_fold():
+    assert fold("  Jötun   GRUNT ") == "jotun grunt"
+    assert trigrams("ab") == ["  a", " ab", "ab "]
+
+
+def test_exact_casefold_and_face(index):
+    assert len(index) == len(NAMES)
+    assert "Tarmogoyf" in index
+    assert index.exact("tarmogoyf") is None
+
+    assert index.casefold("tarmogoyf") == ["Tarmogoyf"]
+    assert index.casefold("jotun grunt") == ["Jötun Grunt"]
+    assert index.face("delver of secrets") == [
+        "Delver of Secrets // Insectile Aberration"
+    ]
+    assert index.face("Insectile Aberration") == [
+        "Delver of Secrets // Insectile Aberration"
+    ]
+    assert index.face("Tarmogoyf") == []
+
+
+def test_prefix(index):
+    assert index.prefix("fire") == ["Fire // Ice", "Fireball", "Firebolt"]
+    assert index.prefix("fire", limit=2) == ["Fire // Ice", "Fireball"]
+    # faces are prefixes too
+    assert index.prefix("ice") == ["Fire // Ice", "Ice Cauldron"]
+    assert index.prefix("zzz") == []
+
+
+def test_fuzzy(index):
+    matches = index.fuzzy("Lightnig Bolt")
+    assert matches[0].name == "Lightning Bolt"
+    assert matches[0].kind == "fuzzy"
+    assert 0.3 <= matches[0].score < 1
+    assert [m.score for m in matches] == sorted(
+        (m.score for m in matches), reverse=True
+    )
+
+    assert index.fuzzy("Lightning Bolt", limit=1) == [
+        NameMatch("Lightning Bolt", "fuzzy", 1.0)
+    ]
+    assert index.fuzzy("qqqq") == []
+
+
+def test_resolve(index):
+    assert index.resolve("Fireball") == [NameMatch("Fireball", "exact")]
+    assert index.resolve("FIREBALL") == [NameMatch("Fireball", "casefold")]
+    assert index.resolve("Delver of Secrets") == [
+        NameMatch("Delver of Secrets // Insectile Aberration", "face")
+    ]
+    assert index.resolve("Lightning") == [
+        NameMatch("Lightning Bolt", "prefix"),
+        NameMatch("Lightning Helix", "prefix"),
+    ]
+    assert index.resolve("Tarmogoiff")[0].name == "Tarmogoyf"
+
+
+def test_save_load(index, tmp_path):
+    path = str(tmp_path / NAME_INDEX_FILE_NAME)
+    index.save(path)
+    loaded = CardNameIndex.load(path)
+
+    assert loaded.names == index.names
+    for query in ("Lightnig Bolt", "fire", "delver of secrets", "Tarmogoyf"):
+        assert loaded.resolve(query) == index.resolve(query)
+
+    CardNameIndex.build([]).save(path)
+    assert len(CardNameIndex.load(path)) == 0
+
+
+def test_load_reads_folded_keys(index, tmp_path, monkeypatch):
+    path = str(tmp_path / NAME_INDEX_FILE_NAME)
+    index.save(path)
+
+    # loading doesn't fold the names again
+    def fold_fails(name):
+        raise AssertionError(f"{name!r} folded on load")
+
+    monkeypatch.setattr(names, "fold", fold_fails)
+    loaded = CardNameIndex.load(path)
+    monkeypatch.undo()
+    assert loaded.face("Fire") == ["Fire // Ice"]
+
+
+def test_name_index_is_built_on_first_lookup(all_printings_path, cache_home):
+    report = LoadReport()
+    _process_raw_cards(all_printings_path, report=report)
+    assert "name_index" not in report
+    card_file_path = os.path.join(cards.CARDS_DATASET_CACHE, CARD_FILE_NAME)
+    index_path = os.path.join(cards.CARDS_DATASET_CACHE, NAME_INDEX_FILE_NAME)
+    assert not os.path.exists(index_path)
+
+    with CardFile(card_file_path) as card_file:
+        assert card_file.resolve("delver of secrets")[0].name == (
+            "Delver of Secrets // Insectile Aberration"
+        )
+        assert len(card_file.name_index) == 5
+    assert os.path.exists(index_path)
+
+    # then loaded
+    def build_fails(cls, card_names):
+        raise AssertionError("name index built again")
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(CardNameIndex, "build", classmethod(build_fails))
+        with CardFile(card_file_path) as card_file:
+            assert card_file.resolve("Tarmogoyf") == [NameMatch("Tarmogoyf", "exact")]
+
+    # and built again once the card file is rewritten: removing a printing converts nothing, but removes
+    # its names
+    raw_cards = {k: v for k, v in RAW_CARDS.items() if k != "BBB"}
+    report = LoadReport()
+    _process_raw_cards(
+        write_all_printings(all_printings_path, raw_cards, indent=2), report=report
+    )
+    assert report["convert"].rows == 0
+    with CardFile(card_file_path) as card_file:
+        assert "Tarmogoyf" not in card_file.name_index
+        assert len(card_file.name_index) == 3
+    assert len(CardNameIndex.load(index_path)) == 3
@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from datasets import Dataset
+
+from mtglearn.mlm.packing import (
+    block_diagonal_attention_mask,
+    pack_dataset,
+    pack_lengths,
+    packed_position_ids,
+    position_offset,
+)
+
+
+def test_pack_lengths():
+    # mostly short cards, as serialized cards are
+    lengths = np.random.default_rng(0).integers(2, 40, 1000)
+
+    bins = pack_lengths(lengths, 64)
+
+    assert sorted(i for b in bins for i in b) == list(range(len(lengths)))
+    assert all(lengths[b].sum() <= 64 for b in bins)
+    # near 100% token utilization
+    assert lengths.sum() / (len(bins) * 64) > 0.99
+
+    assert pack_lengths([], 64) == []
+    with pytest.raises(ValueError):
+        pack_lengths([65], 64)
+
+
+def test_pack_dataset(tokenizer):
+    texts = ["a b c", "d", "e f g h i j", "k l", "m"]
+    encodings = tokenizer(texts, return_special_tokens_mask=True)
+    # an indices mapping, as after a shuffle or split
+    dataset = Dataset.from_dict(dict(encodings)).select([4, 3, 2, 1, 0])
+
+    packed = pack_dataset(dataset, 10)
+
+    assert packed.column_names == [
+        "input_ids",
+        "special_tokens_mask",
+        "sequence_ids",
+        "length",
+    ]
+    # nothing is dropped, and every card keeps its separators
+    assert sorted(t for ids in packed["input_ids"] for t in ids) == sorted(
+        t for ids in encodings["input_ids"] for t in ids
+    )
+    assert sum(packed["length"]) == sum(map(len, encodings["input_ids"]))
+    for row in packed:
+        assert len(row["input_ids"]) == row["length"] <= 10
+        assert len(row["sequence_ids"]) == row["length"]
+        for seq in set(row["sequence_ids"]):
+            tokens = [
+                t for t, s in zip(row["input_ids"], row["sequence_ids"]) if s == seq
+            ]
+            assert tokens[0] == tokenizer.cls_token_id
+            assert tokens[-1] == tokenizer.sep_token_id
+
+    assert len(pack_dataset(dataset.select([]), 10)) == 0
+
+
+def test_block_diagonal_attention():
+    sequence_ids = np.array([[0, 0, 1, 1, 1, -1], [0, 0, 0, 0, 0, 0]])
+
+    mask = block_diagonal_attention_mask(sequence_ids)
+
+    assert mask.shape == (2, 6, 6)
+    assert mask[0, 0].tolist() == [True, True, False, False, False, False]
+    assert mask[0, 3].tolist() == [False, False, True, True, True, False]
+    assert mask[0, 5].tolist() == [False] * 5 + [True]
+    assert mask[1].all()
+
+    assert packed_position_ids(sequence_ids).tolist() == [
+        [0, 1, 0, 1, 2, 0],
+        [0, 1, 2, 3, 4, 5],
+    ]
+    # e.g. RoBERTa's, which start after its padding index (1)
+    assert packed_position_ids(sequence_ids, offset=2).tolist() == [
+        [2, 3, 2, 3, 4, 2],
+        [2, 3, 4, 5, 6, 7],
+    ]
+
+
+@pytest.mark.parametrize(
+    "model_type, pad_token_id, offset",
+    [("bert", 0, 0), ("roberta", 1, 2), ("xlm-roberta", 1, 2), ("gpt2", None, None)],
+)
+def test_position_offset(model_type, pad_token_id, offset):
+    config = SimpleNamespace(model_type=model_type, pad_token_id=pad_token_id)
+    assert position_offset(config) == offset
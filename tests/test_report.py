@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+
+import pytest
+
+from mtglearn.datasets import LoadReport
+
+
+class FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name):
+        span = FakeSpan(name)
+        self.spans.append(span)
+        yield span
+
+
+class FakeSpan:
+    def __init__(self, name):
+        self.name = name
+        self.attributes = {}
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+def test_load_report():
+    tracer = FakeTracer()
+    finished = []
+    report = LoadReport(callbacks=[finished.append], tracer=tracer)
+
+    with report.stage("download") as stage:
+        stage.cache = "miss"
+        stage.bytes_written = 2**20
+    with pytest.raises(ValueError):
+        with report.stage("convert") as stage:
+            stage.rows = 10
+            raise ValueError
+
+    # failed stages are still recorded
+    assert [s.name for s in finished] == ["download", "convert"]
+    assert report["convert"].rows == 10
+    assert "convert" in report and "join_stats" not in report
+    with pytest.raises(KeyError):
+        report["join_stats"]
+    assert report.cache == {"download": "miss"}
+    assert report.to_dicts()[0]["bytes_written"] == 2**20
+
+    assert [s.name for s in tracer.spans] == [
+        "load_cards.download",
+        "load_cards.convert",
+    ]
+    assert tracer.spans[0].attributes["mtglearn.cache"] == "miss"
+    assert tracer.spans[1].attributes["mtglearn.rows"] == 10
+    assert "mtglearn.bytes_read" not in tracer.spans[1].attributes
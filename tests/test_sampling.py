@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from datasets import Dataset
+
+from mtglearn.mlm.sampling import (
+    BatchSampler,
+    length_grouped_batches,
+    padding_efficiency,
+    random_batches,
+    sequence_lengths,
+    token_budget_batches,
+)
+
+# card lengths are long-tailed: mostly short, a few with long rules text
+LENGTHS = np.random.default_rng(0).lognormal(3, 0.8, 1000).astype(int) + 3
+
+
+def _check_partition(batches, n):
+    indices = np.concatenate(batches)
+    assert sorted(indices.tolist()) == list(range(n))
+
+
+def test_padding_efficiency():
+    assert padding_efficiency([2, 4, 4], [[0, 1], [2]]) == 10 / 12
+    assert padding_efficiency([], []) == 1.0
+
+
+def test_length_grouped_batches():
+    batches = length_grouped_batches(LENGTHS, 32, seed=0)
+
+    _check_partition(batches, len(LENGTHS))
+    assert all(len(b) <= 32 for b in batches)
+    assert padding_efficiency(LENGTHS, batches) > padding_efficiency(
+        LENGTHS, random_batches(len(LENGTHS), 32, seed=0)
+    )
+
+
+def test_token_budget_batches():
+    batches = token_budget_batches(LENGTHS, 1024, seed=0)
+
+    _check_partition(batches, len(LENGTHS))
+    for batch in batches:
+        assert len(batch) == 1 or LENGTHS[batch].max() * len(batch) <= 1024
+    assert padding_efficiency(LENGTHS, batches) > 0.9
+
+    capped = token_budget_batches(LENGTHS, 1024, seed=0, max_batch_size=8)
+    assert max(len(b) for b in capped) == 8
+
+
+@pytest.mark.parametrize("strategy", ["random", "length_grouped", "token_budget"])
+def test_batch_sampler(strategy):
+    sampler = BatchSampler(LENGTHS, strategy, batch_size=32, max_tokens=2048, seed=0)
+
+    first, second = list(sampler), list(sampler)
+
+    assert len(first) == len(second) == len(sampler)
+    _check_partition([np.array(b) for b in first], len(LENGTHS))
+    # every iteration is a new epoch
+    assert first != second
+    assert list(BatchSampler(LENGTHS, strategy, 32, 2048, seed=0)) == first
+
+    metrics = sampler.padding_metrics()
+    assert set(metrics) == {"padding_efficiency", "random_padding_efficiency"}
+
+
+def test_batch_sampler_requires_budget():
+    with pytest.raises(ValueError):
+        BatchSampler(LENGTHS, "token_budget", batch_size=32)
+    with pytest.raises(ValueError):
+        BatchSampler(LENGTHS, "length_grouped")
+    with pytest.raises(ValueError):
+        BatchSampler(LENGTHS, "sorted", batch_size=32)
+
+
+def test_sequence_lengths():
+    input_ids = [[0] * n for n in [3, 1, 4, 1, 5]]
+    dataset = Dataset.from_dict({"input_ids": input_ids})
+
+    assert sequence_lengths(dataset).tolist() == [3, 1, 4, 1, 5]
+    assert sequence_lengths(dataset.select([4, 0])).tolist() == [5, 3]
+
+    # the length column is used if there is one
+    dataset = dataset.add_column("length", [30, 10, 40, 10, 50])
+    assert sequence_lengths(dataset.select([2, 1])).tolist() == [40, 10]
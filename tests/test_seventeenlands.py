@@ -0,0 +1,183 @@
+from functools import partial
+
+import pytest
+import requests
+
+from mtglearn.card import CardStats, CardWithStats
+from mtglearn.datasets import LoadReport, cards, load_cards
+from mtglearn.datasets.cards import _join_cards_with_stats, _process_raw_cards
+from mtglearn.datasets.utils import type2features
+from mtglearn.datasets.seventeenlands import fetch_all_stats
+from conftest import RAW_STATS
+
+
+def test_fetch_all_stats(seventeenlands):
+
+    stats = fetch_all_stats(
+        ["BBB"], ["PremierDraft", "QuickDraft"], max_workers=2, url=seventeenlands.url
+    )
+
+    assert set(stats) == {("BBB", "PremierDraft"), ("BBB", "QuickDraft")}
+    assert sorted(seventeenlands.requests) == [
+        ("BBB", "PremierDraft"),
+        ("BBB", "QuickDraft"),
+    ]
+    delver = stats["BBB", "QuickDraft"]["Delver of Secrets"]
+    assert isinstance(delver, CardStats)
+    assert delver.stats_format == "QuickDraft"
+    assert delver.seen_count == 100
+
+
+def test_fetch_all_stats_retries(seventeenlands):
+
+    seventeenlands.n_failures = 2
+
+    stats = fetch_all_stats(["BBB"], url=seventeenlands.url, backoff_factor=0)
+
+    assert "Tarmogoyf" in stats["BBB", "PremierDraft"]
+    assert len(seventeenlands.requests) == 3
+
+
+def test_fetch_all_stats_gives_up(seventeenlands):
+
+    seventeenlands.n_failures = 10
+
+    with pytest.raises(requests.RequestException):
+        fetch_all_stats(["BBB"], url=seventeenlands.url, retries=1, backoff_factor=0)
+
+
+def test_fetch_all_stats_empty(seventeenlands):
+
+    with pytest.raises(ValueError):
+        fetch_all_stats(["ZZZ"], url=seventeenlands.url)
+
+
+def test_load_cards_with_stats(
+    all_printings_path, cache_home, seventeenlands, monkeypatch
+):
+
+    _process_raw_cards(all_printings_path)
+    monkeypatch.setattr(cards, "PRINTINGS_WITH_STATS", {"BBB"})
+    monkeypatch.setattr(
+        cards, "fetch_all_stats", partial(fetch_all_stats, url=seventeenlands.url)
+    )
+
+    card_stats = load_cards(as_dataset=True, with_stats=True)
+
+    assert card_stats["name"] == [
+        "Delver of Secrets // Insectile Aberration",
+        "Tarmogoyf",
+    ]
+    assert card_stats["stats_format"] == ["PremierDraft", "PremierDraft"]
+    assert card_stats["seen_count"] == [100, 10]
+
+    # cached
+    assert (
+        load_cards(as_dataset=True, with_stats=True).to_dict() == card_stats.to_dict()
+    )
+    assert len(seventeenlands.requests) == 1
+
+
+def test_load_cards_with_stats_join(
+    all_printings_path, cache_home, seventeenlands, monkeypatch
+):
+
+    _process_raw_cards(all_printings_path)
+    monkeypatch.setattr(cards, "PRINTINGS_WITH_STATS", {"BBB"})
+    monkeypatch.setattr(
+        cards, "fetch_all_stats", partial(fetch_all_stats, url=seventeenlands.url)
+    )
+    # no stats for Tarmogoyf
+    seventeenlands.stats = {"BBB": RAW_STATS["BBB"][:1]}
+
+    report = LoadReport()
+    card_stats = load_cards(as_dataset=True, with_stats=True, report=report)
+    assert card_stats["seen_count"] == [100, None]
+    assert report.unmatched_names == ["Tarmogoyf"]
+    assert report["join_stats"].unmatched_names == ["Tarmogoyf"]
+
+    # the left-joined cache doesn't serve an inner join
+    report = LoadReport()
+    card_stats = load_cards(
+        as_dataset=True, with_stats=True, stats_join="inner", report=report
+    )
+    assert report.cache["stats_cache"] == "miss"
+    assert card_stats["name"] == ["Delver of Secrets // Insectile Aberration"]
+    assert report.unmatched_names == ["Tarmogoyf"]
+
+    # but the inner-joined one does, unmatched names included
+    report = LoadReport()
+    load_cards(as_dataset=True, with_stats=True, stats_join="inner", report=report)
+    assert report.cache["stats_cache"] == "hit"
+    assert report.unmatched_names == ["Tarmogoyf"]
+
+    # a single format, as a string, is the same as the default
+    assert seventeenlands.requests == [("BBB", "PremierDraft")]
+    report = LoadReport()
+    load_cards(
+        as_dataset=True,
+        with_stats=True,
+        stats_join="inner",
+        stats_formats="PremierDraft",
+        report=report,
+    )
+    assert report.cache["stats_cache"] == "hit"
+
+
+def test_fetch_all_stats_cache(seventeenlands, tmp_path):
+
+    cache_dir = str(tmp_path / "seventeenlands")
+    fetch = partial(
+        fetch_all_stats, ["BBB"], url=seventeenlands.url, cache_dir=cache_dir
+    )
+
+    stats = fetch()
+    assert len(seventeenlands.requests) == 1
+
+    # fresh, so no request at all
+    assert fetch() == stats
+    assert len(seventeenlands.requests) == 1
+
+    # stale, so revalidated but unchanged
+    assert fetch(ttl=0) == stats
+    assert len(seventeenlands.requests) == 2
+    assert seventeenlands.headers[-1]["If-None-Match"]
+
+    # stale and changed
+    seventeenlands.stats = {"BBB": RAW_STATS["BBB"][:1]}
+    stats = fetch(ttl=0)
+    assert list(stats["BBB", "PremierDraft"]) == ["Delver of Secrets"]
+    assert fetch()["BBB", "PremierDraft"] == stats["BBB", "PremierDraft"]
+    assert len(seventeenlands.requests) == 3
+
+
+def test_join_cards_with_stats(all_printings_path, cache_home):
+
+    dataset = _process_raw_cards(all_printings_path)
+    delver = CardStats(name="Delver of Secrets", win_rate=0.5)
+    stats = {
+        ("BBB", "PremierDraft"): {"Delver of Secrets": delver},
+        ("BBB", "QuickDraft"): {"Delver of Secrets": delver},
+        # same name, different printing
+        ("AAA", "PremierDraft"): {"Tarmogoyf": CardStats(name="Tarmogoyf")},
+    }
+
+    joined, unmatched = _join_cards_with_stats(dataset, stats)
+
+    assert unmatched == ["Forest", "Giant Growth", "Grizzly Bears", "Tarmogoyf"]
+    assert joined["name"] == [
+        "Grizzly Bears",
+        "Giant Growth",
+        "Forest",
+        "Delver of Secrets // Insectile Aberration",
+        "Delver of Secrets // Insectile Aberration",
+        "Tarmogoyf",
+    ]
+    assert joined["stats_format"] == [None, None, None, None, None, None]
+    assert joined["win_rate"] == [None, None, None, 0.5, 0.5, None]
+    assert joined.features == type2features(CardWithStats)
+
+    joined, unmatched = _join_cards_with_stats(dataset, stats, how="inner")
+
+    assert unmatched == ["Forest", "Giant Growth", "Grizzly Bears", "Tarmogoyf"]
+    assert joined["name"] == ["Delver of Secrets // Insectile Aberration"] * 2
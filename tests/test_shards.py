@@ -0,0 +1,90 @@
+import pytest
+from datasets import Dataset
+
+from mtglearn.augmentation import iter_augmented
+from mtglearn.mlm.packing import pack_dataset
+from mtglearn.mlm.shards import is_shards, load_shards, write_tokenized_shards
+
+
+def test_write_tokenized_shards(tmp_path, tokenizer):
+
+    texts = [["a b c", "a"], ["a " * 20, "b " * 100], []]
+    path = str(tmp_path / "shards")
+
+    manifest = write_tokenized_shards(
+        texts,
+        tokenizer,
+        path,
+        max_seq_length=64,
+        buckets=[4, 16, 128],
+        metadata={"tokenizer_name": "whitespace"},
+    )
+
+    assert is_shards(path)
+    assert [b["max_length"] for b in manifest["buckets"]] == [4, 16, 64]
+    assert [b["num_rows"] for b in manifest["buckets"]] == [1, 1, 2]
+
+    shards, loaded_manifest = load_shards(path, "whitespace", max_seq_length=64)
+    assert loaded_manifest == manifest
+    assert shards["length"] == [3, 5, 22, 64]
+    assert shards[0]["input_ids"] == [0, 4, 1]
+    assert shards[0]["special_tokens_mask"] == [1, 0, 1]
+    assert all(len(ids) == n for ids, n in zip(shards["input_ids"], shards["length"]))
+
+
+def test_pack_shards(tmp_path, tokenizer):
+    # shards of whole lines pack like freshly tokenized lines (with --packing)
+    texts = [["a b c", "a", "b c", "a " * 10]]
+    path = str(tmp_path / "shards")
+    write_tokenized_shards(texts, tokenizer, path, max_seq_length=16, buckets=[4])
+    shards, _ = load_shards(path, max_seq_length=16)
+
+    train = shards.train_test_split(test_size=1, seed=0)["train"]
+    packed = pack_dataset(train, 16)
+
+    assert sum(packed["length"]) == sum(train["length"])
+    assert len(packed) < len(train)
+    for row in packed:
+        assert len(row["input_ids"]) == len(row["sequence_ids"]) == row["length"] <= 16
+        assert row["special_tokens_mask"].count(1) == 2 * len(set(row["sequence_ids"]))
+
+
+def test_write_augmented_shards(tmp_path, tokenizer):
+
+    cards = Dataset.from_dict(
+        {
+            "name": ["Forest", "Grizzly Bears"],
+            "mana_cost": [None, "{1}{G}"],
+            "mana_value": [None, 2],
+            "types": [["Land"], ["Creature"]],
+            "printing": ["AAA", "AAA"],
+            "rarity": ["common", "common"],
+            "text": [None, None],
+            "power": [None, "2"],
+            "toughness": [None, "2"],
+        }
+    )
+    path = str(tmp_path / "shards")
+
+    write_tokenized_shards(
+        iter_augmented(cards, 3, seed=0, batch_size=1), tokenizer, path, 32
+    )
+
+    shards, _ = load_shards(path)
+    assert len(shards) == 6
+
+
+def test_load_shards_mismatch(tmp_path, tokenizer):
+
+    path = str(tmp_path / "shards")
+    write_tokenized_shards(
+        [["a b c"]], tokenizer, path, 64, metadata={"tokenizer_name": "whitespace"}
+    )
+
+    # shorter sequences are fine
+    load_shards(path, "whitespace", max_seq_length=128)
+
+    with pytest.raises(ValueError, match="tokenized with whitespace"):
+        load_shards(path, "roberta-base")
+    with pytest.raises(ValueError, match="max_seq_length=32"):
+        load_shards(path, max_seq_length=32)
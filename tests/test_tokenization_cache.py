@@ -0,0 +1,100 @@
+from datasets import Dataset, DatasetDict
+
+from mtglearn.mlm import cache
+from mtglearn.mlm.cache import (
+    cached_tokenize,
+    dataset_fingerprint,
+    tokenization_cache_key,
+)
+
+
+def _raw_datasets(texts):
+    return DatasetDict({"train": Dataset.from_dict({"text": texts})})
+
+
+def test_tokenization_cache_key():
+    fingerprint = dataset_fingerprint(_raw_datasets(["a b", "c"]))
+    key = tokenization_cache_key("bert-base-uncased", "main", 128, True, fingerprint)
+
+    assert key == tokenization_cache_key(
+        "bert-base-uncased", "main", 128, True, fingerprint
+    )
+    assert key != tokenization_cache_key(
+        "bert-base-uncased", "main", 64, True, fingerprint
+    )
+    assert key != tokenization_cache_key(
+        "bert-base-uncased", "main", 128, False, fingerprint
+    )
+    assert key != tokenization_cache_key(
+        "bert-base-uncased", "v2", 128, True, fingerprint
+    )
+    assert key != tokenization_cache_key(
+        "bert-base-uncased",
+        "main",
+        128,
+        True,
+        dataset_fingerprint(_raw_datasets(["a b", "d"])),
+    )
+    assert key != tokenization_cache_key(
+        "bert-base-uncased", "main", 128, True, fingerprint, pad_to_max_length=True
+    )
+
+
+def test_tokenization_cache_key_package_versions(monkeypatch):
+    key = tokenization_cache_key("bert-base-uncased", "main", 128, True, "fingerprint")
+
+    # e.g. after upgrading tokenizers
+    versions = dict(cache.package_versions(), tokenizers="999.0.0")
+    monkeypatch.setattr(cache, "package_versions", lambda: versions)
+
+    assert key != tokenization_cache_key(
+        "bert-base-uncased", "main", 128, True, "fingerprint"
+    )
+
+
+def test_cached_tokenize(tmp_path, tokenizer):
+    raw_datasets = _raw_datasets(["a b", "c", "a c b"])
+    key = tokenization_cache_key(
+        "test", None, 8, True, dataset_fingerprint(raw_datasets)
+    )
+    calls = []
+
+    def tokenize():
+        calls.append(key)
+        return raw_datasets.map(
+            lambda batch: tokenizer(batch["text"], return_special_tokens_mask=True),
+            batched=True,
+            remove_columns=["text"],
+        )
+
+    tokenized = cached_tokenize(str(tmp_path), key, tokenize)
+    cached = cached_tokenize(str(tmp_path), key, tokenize)
+
+    assert len(calls) == 1
+    assert cached["train"]["input_ids"] == tokenized["train"]["input_ids"]
+    assert not [p for p in tmp_path.iterdir() if ".tmp" in p.name]
+
+    cached_tokenize(None, key, tokenize)
+    assert len(calls) == 2
+
+
+def test_cached_tokenize_overwrite_and_save(tmp_path):
+    raw_datasets = _raw_datasets(["a b"])
+    key = tokenization_cache_key(
+        "test", None, 8, True, dataset_fingerprint(raw_datasets)
+    )
+    calls = []
+
+    def tokenize():
+        calls.append(key)
+        return raw_datasets
+
+    # e.g. a process that isn't the main one doesn't write the cache
+    cached_tokenize(str(tmp_path), key, tokenize, save=False)
+    assert not list(tmp_path.iterdir())
+
+    cached_tokenize(str(tmp_path), key, tokenize)
+    cached_tokenize(str(tmp_path), key, tokenize, overwrite=True)
+    assert len(calls) == 3
+    cached_tokenize(str(tmp_path), key, tokenize)
+    assert len(calls) == 3
@@ -0,0 +1,22 @@
+from mtglearn.card import Card
+from mtglearn.datasets.utils import ColumnarBuilder, type2features
+
+
+def test_columnar_builder():
+
+    builder = ColumnarBuilder(Card, batch_size=2)
+
+    assert builder.append({"name": "Forest", "printing": "AAA"}) is None
+    batch = builder.append(
+        {"name": "Bears", "manaCost": "{1}{G}", "manaValue": 2.0, "types": ["Creature"]}
+    )
+    assert batch.num_rows == 2
+    assert len(builder) == 0
+    assert batch.schema == type2features(Card).arrow_schema
+    assert batch.to_pydict()["mana_cost"] == [None, "{1}{G}"]
+    assert batch.to_pydict()["mana_value"] == [None, 2]
+    assert batch.to_pydict()["types"] == [None, ["Creature"]]
+
+    assert builder.flush() is None
+    builder.append({"name": "Little Girl", "manaValue": 0.5})
+    assert builder.flush().to_pydict()["mana_value"] == [0]